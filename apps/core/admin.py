@@ -8,6 +8,8 @@ from django import forms
 from django.contrib import admin
 
 from .models import (
+    ArchivedDepositTransaction,
+    ArchivedWithdrawalTransaction,
     DepositTransaction,
     GatewaySettings,
     Page,
@@ -20,6 +22,8 @@ admin.site.site_header = 'Administration of Dash Ripple Gateway'
 admin.register(GatewaySettings)(SingletonModelAdmin)
 admin.site.register(DepositTransaction)
 admin.site.register(WithdrawalTransaction)
+admin.site.register(ArchivedDepositTransaction)
+admin.site.register(ArchivedWithdrawalTransaction)
 
 
 class RippleWalletAdminForm(forms.ModelForm):
@@ -0,0 +1,74 @@
+from django.db import transaction as db_transaction
+
+from apps.core import models
+
+
+class TransactionArchiver(object):
+    """
+    Moves finished transactions with their state changes from tables of
+    active transactions to archive tables in batches.
+
+    Statuses of archived transactions are rendered on archiving, so they
+    are served without joins and gateway settings.
+    """
+    batch_size = 500
+
+    def __init__(self, archive_model):
+        self.archive_model = archive_model
+        self.transaction_model = archive_model.transaction_model
+        self.state_change_model = self.transaction_model._meta.get_field(
+            'state_changes',
+        ).related_model
+
+    def archive(self, finished_before):
+        """
+        Archives transactions which were finished (changed their state last
+        time) before `finished_before`. Returns a number of archived
+        transactions.
+        """
+        gateway_settings = models.GatewaySettings.get_solo()
+        ripple_wallet_credentials = models.RippleWalletCredentials.get_solo()
+        archived_number = 0
+        while True:
+            # A short DB transaction per batch keeps locks of the table of
+            # active transactions short.
+            with db_transaction.atomic():
+                batch_number = self._archive_batch(
+                    finished_before,
+                    gateway_settings,
+                    ripple_wallet_credentials,
+                )
+            archived_number += batch_number
+            if batch_number < self.batch_size:
+                return archived_number
+
+    def _archive_batch(
+        self,
+        finished_before,
+        gateway_settings,
+        ripple_wallet_credentials,
+    ):
+        transactions = list(
+            self.transaction_model.objects.filter(
+                state__in=self.transaction_model.FINISHED_STATES,
+                # A transaction is created before its state changes.
+                timestamp__lt=finished_before,
+            ).exclude(
+                state_changes__datetime__gte=finished_before,
+            ).select_for_update()[:self.batch_size],
+        )
+        if not transactions:
+            return 0
+        self.archive_model.objects.bulk_create(
+            self.archive_model.from_transaction(
+                transaction,
+                gateway_settings,
+                ripple_wallet_credentials,
+            ) for transaction in transactions
+        )
+        transaction_ids = [transaction.id for transaction in transactions]
+        self.state_change_model.objects.filter(
+            transaction_id__in=transaction_ids,
+        ).delete()
+        self.transaction_model.objects.filter(id__in=transaction_ids).delete()
+        return len(transactions)
@@ -0,0 +1,133 @@
+"""
+Micro-benchmarks of hot paths. They are Django tests which are discovered
+only with the `benchmark_*.py` pattern (see `make benchmark`).
+
+A run logs its results and, with `BENCHMARK_RESULTS`, appends them to a
+JSON file as samples. A single run is too noisy to be compared with
+another one, so `make benchmark-against-base` (run by CI) interleaves runs
+of `BENCHMARK_BASE` and the working tree on the same machine and compares
+medians of their samples (see `compare_results`).
+"""
+import gc
+import json
+import logging
+import os
+import timeit
+
+from django.test import TestCase
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2. Only time is measured.
+    tracemalloc = None
+
+RESULTS_PATH = os.environ.get('BENCHMARK_RESULTS')
+THRESHOLD = float(os.environ.get('BENCHMARK_THRESHOLD', 0.25))
+
+logger = logging.getLogger('gateway')
+
+
+def load_results(path):
+    """
+    Returns samples of benchmarks, `{name: {measure: [value, ...]}}`.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as results_file:
+        return json.load(results_file)
+
+
+def get_median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def compare_results(base_results, head_results, threshold=THRESHOLD):
+    """
+    Returns descriptions of regressions of `head_results` against
+    `base_results`. A measure regresses if its median is greater than the
+    base median by `threshold` (a fraction) and all of its samples are
+    greater than all base samples, so noise of single runs is ignored.
+    """
+    regressions = []
+    for name, head_samples in sorted(head_results.items()):
+        for measure, values in sorted(head_samples.items()):
+            base_values = base_results.get(name, {}).get(measure)
+            if not base_values:
+                continue
+            base_median = get_median(base_values)
+            median = get_median(values)
+            if (
+                median > base_median * (1 + threshold) and
+                min(values) > max(base_values)
+            ):
+                regressions.append(
+                    '{} regressed: {} {} (base {})'.format(
+                        name,
+                        median,
+                        measure,
+                        base_median,
+                    ),
+                )
+    return regressions
+
+
+class BenchmarkTestCase(TestCase):
+    # Minimal duration (seconds) of a timed run.
+    run_duration = 0.2
+    runs_number = 5
+
+    results = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        super(BenchmarkTestCase, cls).tearDownClass()
+        if RESULTS_PATH and cls.results:
+            results = load_results(RESULTS_PATH)
+            for name, result in cls.results.items():
+                samples = results.setdefault(name, {})
+                for measure, value in result.items():
+                    samples.setdefault(measure, []).append(value)
+            with open(RESULTS_PATH, 'w') as results_file:
+                json.dump(results, results_file, indent=2, sort_keys=True)
+        cls.results.clear()
+
+    def measure_time(self, function):
+        """
+        Returns the best time (seconds) of a call, like `timeit`.
+        """
+        timer = timeit.Timer(function)
+        calls_number = 1
+        while timer.timeit(calls_number) < self.run_duration:
+            calls_number *= 2
+        return min(timer.repeat(self.runs_number, calls_number)) / calls_number
+
+    @staticmethod
+    def measure_allocations(function):
+        """
+        Returns a peak of memory (bytes) allocated by a call.
+        """
+        tracemalloc.start()
+        try:
+            function()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def benchmark(self, name, function):
+        # Warm up caches, e.g. of singletons.
+        function()
+        gc.collect()
+        result = {'seconds': self.measure_time(function)}
+        if tracemalloc is not None:
+            result['bytes'] = self.measure_allocations(function)
+        logger.info('Benchmark {}. {:.2f} us{}'.format(
+            name,
+            result['seconds'] * 10 ** 6,
+            ', {} bytes'.format(result['bytes']) if 'bytes' in result else '',
+        ))
+        self.results[name] = result
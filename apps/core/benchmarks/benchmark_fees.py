@@ -0,0 +1,49 @@
+from decimal import Decimal
+from functools import partial
+
+from django.test import RequestFactory
+
+from apps.core import utils
+from apps.core.benchmarks import BenchmarkTestCase
+from apps.core.models import GatewaySettings
+from apps.core.views import GetReceivedAmountApiView
+
+
+class FeesBenchmark(BenchmarkTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        GatewaySettings(
+            gateway_fee_percent=Decimal('0.5'),
+            max_dash_miner_fee=Decimal('0.001'),
+        ).save()
+
+    def test_get_received_amount(self):
+        for transaction_type in ('deposit', 'withdrawal'):
+            self.benchmark(
+                'get_received_amount.{}'.format(transaction_type),
+                partial(
+                    utils.get_received_amount,
+                    '12.345678901',
+                    transaction_type,
+                ),
+            )
+
+    def test_get_minimal_transaction_amount(self):
+        for transaction_type in ('deposit', 'withdrawal'):
+            self.benchmark(
+                'get_minimal_transaction_amount.{}'.format(transaction_type),
+                partial(
+                    utils.get_minimal_transaction_amount,
+                    transaction_type,
+                ),
+            )
+
+    def test_get_received_amount_view(self):
+        request = RequestFactory().get(
+            '/get-received-amount/',
+            {'amount': '12.345678901', 'transaction_type': 'withdrawal'},
+        )
+        self.benchmark(
+            'GetReceivedAmountApiView',
+            partial(GetReceivedAmountApiView.as_view(), request),
+        )
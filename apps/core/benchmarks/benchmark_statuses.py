@@ -0,0 +1,53 @@
+from decimal import Decimal
+
+from apps.core.benchmarks import BenchmarkTestCase
+from apps.core.models import (
+    DepositTransaction,
+    GatewaySettings,
+    RippleWalletCredentials,
+    WithdrawalTransaction,
+)
+
+
+class StatusesBenchmark(BenchmarkTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        GatewaySettings(
+            gateway_fee_percent=Decimal('0.5'),
+            max_dash_miner_fee=Decimal('0.001'),
+        ).save()
+        RippleWalletCredentials(
+            address='rp2PaYDxVwDvaZVLEQv7bHhoFQEyX1mEx7',
+        ).save()
+        cls.deposit = DepositTransaction.objects.create(
+            ripple_address='rp2PaYDxVwDvaZVLEQv7bHhoFQEyX1mEx7',
+            dash_address='yBVKPLuULvioorP8d1Zu8hpeYE7HzVUtB9',
+            dash_to_transfer=Decimal('12.34500000'),
+        )
+        cls.withdrawal = WithdrawalTransaction.objects.create(
+            dash_address='yBVKPLuULvioorP8d1Zu8hpeYE7HzVUtB9',
+            dash_to_transfer=Decimal('12.34500000'),
+        )
+
+    def test_get_normalized_dash_to_transfer(self):
+        for transaction in (self.deposit, self.withdrawal):
+            self.benchmark(
+                '{}.get_normalized_dash_to_transfer'.format(
+                    transaction._meta.model_name,
+                ),
+                transaction.get_normalized_dash_to_transfer,
+            )
+
+    def test_get_current_state(self):
+        for transaction in (self.deposit, self.withdrawal):
+            self.benchmark(
+                '{}.get_current_state'.format(transaction._meta.model_name),
+                transaction.get_current_state,
+            )
+
+    def test_cache_status(self):
+        for transaction in (self.deposit, self.withdrawal):
+            self.benchmark(
+                '{}.cache_status'.format(transaction._meta.model_name),
+                transaction.cache_status,
+            )
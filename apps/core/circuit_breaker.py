@@ -0,0 +1,102 @@
+import logging
+import socket
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger('gateway')
+
+
+class CircuitBreakerOpenError(socket.error):
+    """
+    Raised instead of calling a server which is considered down. It is a
+    socket error, so callers handle it as a failed connection.
+    """
+
+
+class CircuitBreaker(object):
+    """
+    Stops calls to a server after `failure_threshold` consecutive failures.
+
+    The state is kept in the shared cache, so all processes stop calling the
+    server together. After `reset_timeout` seconds a single call is let
+    through to probe the server. A successful call closes the breaker.
+    """
+
+    def __init__(
+        self,
+        name,
+        is_failure,
+        failure_threshold=None,
+        reset_timeout=None,
+    ):
+        self.name = name
+        self.is_failure = is_failure
+        self.failure_threshold = (
+            failure_threshold or settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD
+        )
+        self.reset_timeout = (
+            reset_timeout or settings.CIRCUIT_BREAKER_RESET_TIMEOUT
+        )
+        self.failures_key = 'circuit-breaker:{}:failures'.format(name)
+        self.opened_at_key = 'circuit-breaker:{}:opened-at'.format(name)
+        self.probe_key = 'circuit-breaker:{}:probe'.format(name)
+
+    def _check(self, state):
+        opened_at = state.get(self.opened_at_key)
+        if opened_at is None:
+            return
+        if (
+            time.time() - opened_at >= self.reset_timeout and
+            # Only one process probes the server.
+            cache.add(self.probe_key, True, self.reset_timeout)
+        ):
+            return
+        raise CircuitBreakerOpenError(
+            'Calls to {} are stopped after failures'.format(self.name),
+        )
+
+    def _record_failure(self):
+        cache.add(self.failures_key, 0, None)
+        failures = cache.incr(self.failures_key)
+        if failures >= self.failure_threshold:
+            # A failed probe opens the breaker again.
+            cache.set(self.opened_at_key, time.time(), None)
+            cache.delete(self.probe_key)
+            logger.warning(
+                'Circuit breaker {}. Opened after {} failures'.format(
+                    self.name,
+                    failures,
+                ),
+            )
+
+    def _record_success(self, state):
+        if not state:
+            return
+        cache.delete_many(
+            [self.failures_key, self.opened_at_key, self.probe_key],
+        )
+        if self.opened_at_key in state:
+            logger.info('Circuit breaker {}. Closed'.format(self.name))
+
+    @contextmanager
+    def guard(self):
+        state = cache.get_many([self.failures_key, self.opened_at_key])
+        self._check(state)
+        try:
+            yield
+        except Exception as e:
+            if self.is_failure(e):
+                self._record_failure()
+            else:
+                # The server responded with an error, so it is up.
+                self._record_success(state)
+            raise
+        self._record_success(state)
+
+    def reset(self):
+        cache.delete_many(
+            [self.failures_key, self.opened_at_key, self.probe_key],
+        )
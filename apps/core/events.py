@@ -0,0 +1,52 @@
+import logging
+
+import redis
+
+from django.conf import settings
+
+logger = logging.getLogger('gateway')
+
+_redis_clients = {}
+
+
+def _get_redis_client():
+    url = settings.STATUS_EVENTS_REDIS_URL
+    if url not in _redis_clients:
+        _redis_clients[url] = redis.StrictRedis.from_url(
+            url,
+            decode_responses=True,
+        )
+    return _redis_clients[url]
+
+
+def publish_status(channel, status):
+    """
+    Publishes a tuple `(etag, content)` of a transaction status to
+    subscribers of the channel. Does nothing if status events are disabled.
+    """
+    if not settings.STATUS_EVENTS_REDIS_URL:
+        return
+    try:
+        _get_redis_client().publish(channel, '{} {}'.format(*status))
+    except redis.RedisError:
+        # Subscribers get the status with the next one.
+        logger.exception('Cannot publish a status to {}'.format(channel))
+
+
+def subscribe(channel):
+    """
+    Returns a subscription to statuses published to the channel or `None`
+    if status events are disabled.
+    """
+    if not settings.STATUS_EVENTS_REDIS_URL:
+        return
+    pubsub = _get_redis_client().pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(channel)
+    return pubsub
+
+
+def get_status(message):
+    """
+    Returns a tuple `(etag, content)` from a published message.
+    """
+    return tuple(message['data'].split(' ', 1))
@@ -0,0 +1,299 @@
+import json
+import logging
+import socket
+import struct
+import time
+from datetime import timedelta
+
+import websocket
+import zmq
+from ripple_api.management.transaction_processors import (
+    _store_transaction as store_ripple_transaction,
+)
+
+from django.db import (
+    IntegrityError,
+    close_old_connections,
+    transaction as db_transaction,
+)
+from django.utils.timezone import now
+
+from apps.core import models, tasks, utils, wallet
+
+logger = logging.getLogger('gateway')
+
+p2pkh_script_prefix = bytearray(b'\x76\xa9\x14')
+p2pkh_script_suffix = bytearray(b'\x88\xac')
+p2sh_script_prefix = bytearray(b'\xa9\x14')
+p2sh_script_suffix = bytearray(b'\x87')
+
+
+def _read_varint(data, offset):
+    prefix = data[offset]
+    offset += 1
+    if prefix < 0xfd:
+        return prefix, offset
+    value_format, value_size = {
+        0xfd: ('<H', 2),
+        0xfe: ('<I', 4),
+        0xff: ('<Q', 8),
+    }[prefix]
+    value = struct.unpack_from(value_format, bytes(data), offset)[0]
+    return value, offset + value_size
+
+
+def _get_script_hash(script):
+    if (
+        len(script) == 25 and
+        script[:3] == p2pkh_script_prefix and
+        script[23:] == p2pkh_script_suffix
+    ):
+        return bytes(script[3:23])
+    if (
+        len(script) == 23 and
+        script[:2] == p2sh_script_prefix and
+        script[22:] == p2sh_script_suffix
+    ):
+        return bytes(script[2:22])
+
+
+def get_output_script_hashes(raw_transaction):
+    """
+    Returns hashes of P2PKH and P2SH outputs of a serialized Dash
+    transaction.
+    """
+    data = bytearray(raw_transaction)
+    # Skip the version.
+    offset = 4
+
+    inputs_number, offset = _read_varint(data, offset)
+    for _ in range(inputs_number):
+        # Skip an outpoint, a script and a sequence number.
+        script_length, offset = _read_varint(data, offset + 36)
+        offset += script_length + 4
+
+    script_hashes = []
+    outputs_number, offset = _read_varint(data, offset)
+    for _ in range(outputs_number):
+        # Skip an amount.
+        script_length, offset = _read_varint(data, offset + 8)
+        script_hash = _get_script_hash(data[offset:offset + script_length])
+        if script_hash is not None:
+            script_hashes.append(script_hash)
+        offset += script_length
+    return script_hashes
+
+
+def get_address_hash(address):
+    return bytes(utils.base58check_decode(address)[1:])
+
+
+class DashListener(object):
+    """
+    Listens to notifications that a Dash server publishes over ZeroMQ
+    (`zmqpubrawtx` and `zmqpubhashblock`) and marks deposits as unconfirmed
+    as soon as their transactions appear.
+
+    Outputs of transactions are matched with addresses of initiated deposits
+    through an in-memory index, so only transactions of deposits touch the DB
+    and the Dash server.
+    """
+    # New deposits are added to the index with this interval.
+    index_update_interval = timedelta(seconds=2)
+    # The index is built from scratch with this interval to forget deposits
+    # that are not initiated anymore.
+    index_rebuild_interval = timedelta(minutes=10)
+    # Deposits created this time before an update are indexed again, because
+    # they could be committed after the previous update.
+    index_update_margin = timedelta(minutes=1)
+
+    def __init__(self, url, context=None):
+        context = context or zmq.Context.instance()
+        self.socket = context.socket(zmq.SUB)
+        self.socket.connect(url)
+        self.handlers = {
+            b'rawtx': self.on_transaction,
+            b'hashblock': self.on_block,
+        }
+        for topic in self.handlers:
+            self.socket.setsockopt(zmq.SUBSCRIBE, topic)
+
+        self.deposit_ids = {}
+        self.index_updated_at = None
+        self.index_rebuilt_at = None
+
+    def run(self):
+        while True:
+            self.receive(timeout=1000)
+
+    def receive(self, timeout=None):
+        # Connections, which are broken or too old, are reopened like after
+        # a request.
+        close_old_connections()
+        try:
+            self.update_index()
+        except Exception:
+            # The index is updated again with the next call.
+            logger.exception('Dash listener. Cannot update the index')
+        if not self.socket.poll(timeout):
+            return
+        topic, body = self.socket.recv_multipart()[:2]
+        try:
+            self.handlers[topic](body)
+        except Exception:
+            logger.exception(
+                'Dash listener. Cannot handle a {} notification'.format(topic),
+            )
+
+    def update_index(self):
+        current_time = now()
+        transactions = models.DepositTransaction.objects.filter(
+            state=models.DepositTransaction.INITIATED,
+        )
+        is_rebuilt = (
+            self.index_rebuilt_at is None or
+            current_time - self.index_rebuilt_at > self.index_rebuild_interval
+        )
+        if not is_rebuilt:
+            if (
+                current_time - self.index_updated_at <
+                self.index_update_interval
+            ):
+                return
+            updated_after = self.index_updated_at - self.index_update_margin
+            transactions = transactions.filter(timestamp__gte=updated_after)
+
+        # The index is changed only if the query succeeds.
+        deposit_ids = {
+            get_address_hash(dash_address): transaction_id
+            for transaction_id, dash_address in transactions.values_list(
+                'id',
+                'dash_address',
+            )
+        }
+        if is_rebuilt:
+            self.deposit_ids = deposit_ids
+            self.index_rebuilt_at = current_time
+        else:
+            self.deposit_ids.update(deposit_ids)
+        self.index_updated_at = current_time
+
+    def on_transaction(self, raw_transaction):
+        transaction_ids = {
+            self.deposit_ids[script_hash]
+            for script_hash in get_output_script_hashes(raw_transaction)
+            if script_hash in self.deposit_ids
+        }
+        if not transaction_ids:
+            return
+        transactions = models.DepositTransaction.objects.filter(
+            id__in=transaction_ids,
+            state=models.DepositTransaction.INITIATED,
+        )
+        dash_wallet = wallet.DashWallet()
+        balances = {
+            transaction.dash_address: dash_wallet.get_address_balance(
+                transaction.dash_address,
+                0,
+            ) for transaction in transactions
+        }
+        tasks.mark_deposits_as_unconfirmed(transactions, balances)
+
+    def on_block(self, block_hash):
+        # Transactions could be included in the block without being relayed
+        # to the mempool of the node, so all deposits are checked.
+        tasks.monitor_dash_to_ripple_transactions.delay()
+        tasks.monitor_deposits_confirmations.delay()
+
+
+class RippleListener(object):
+    """
+    Subscribes to transactions of the gateway Ripple account over a
+    WebSocket connection to rippled, stores payments as soon as they are
+    validated and confirms withdrawals which received them.
+
+    Payments validated while the listener is disconnected are loaded
+    starting from the last stored ledger after each (re)connection.
+    """
+    reconnect_delay = 5
+    # Idle connections are checked with a ping after this time (seconds).
+    ping_interval = 30
+
+    def __init__(self, url):
+        self.url = url
+        self.connection = None
+        self.ripple_address = None
+
+    def run(self):
+        while True:
+            try:
+                self.connect()
+                while True:
+                    self.receive()
+            except (websocket.WebSocketException, socket.error):
+                logger.exception('Ripple listener. Connection is lost')
+            time.sleep(self.reconnect_delay)
+
+    def connect(self):
+        self.ripple_address = models.RippleWalletCredentials.get_solo().address
+        self.connection = websocket.create_connection(
+            self.url,
+            timeout=self.ping_interval,
+        )
+        self.connection.send(
+            json.dumps(
+                {
+                    'command': 'subscribe',
+                    'accounts': [self.ripple_address],
+                },
+            ),
+        )
+        # Subscribe first, so no payment is missed between loading and
+        # streaming.
+        tasks.monitor_transactions_task()
+
+    def receive(self):
+        try:
+            message = self.connection.recv()
+        except websocket.WebSocketTimeoutException:
+            self.connection.ping()
+            return
+        # Connections, which are broken or too old, are reopened like after
+        # a request.
+        close_old_connections()
+        try:
+            self.on_message(json.loads(message))
+        except Exception:
+            logger.exception('Ripple listener. Cannot handle a message')
+
+    def on_message(self, message):
+        if message.get('type') != 'transaction' or not message['validated']:
+            return
+        last_ripple_transaction_id = tasks.get_last_ripple_transaction_id()
+        # A payment stored concurrently by `monitor_transactions_task`
+        # violates the unique index. The received balance is incremented
+        # by a signal of the insert, so it is rolled back together.
+        try:
+            with db_transaction.atomic():
+                store_ripple_transaction(
+                    self.ripple_address,
+                    {
+                        # Unlike `account_tx`, the stream sends a ledger
+                        # index of a transaction separately.
+                        'tx': dict(
+                            message['transaction'],
+                            ledger_index=message['ledger_index'],
+                        ),
+                        'meta': message['meta'],
+                    },
+                )
+        except IntegrityError:
+            logger.info(
+                'Ripple listener. Payment {} is stored already'.format(
+                    message['transaction']['hash'],
+                ),
+            )
+        tasks.confirm_paid_withdrawals(
+            self.ripple_address,
+            last_ripple_transaction_id,
+        )
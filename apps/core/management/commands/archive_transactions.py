@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from apps.core import models
+from apps.core.archive import TransactionArchiver
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves transactions finished (processed, overdue and failed) more '
+        'than a number of days ago to archive tables'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.TRANSACTION_ARCHIVE_DAYS,
+            help='Days since transactions to archive were finished',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=TransactionArchiver.batch_size,
+            help='Number of transactions moved in one DB transaction',
+        )
+
+    def handle(self, *args, **options):
+        finished_before = now() - timedelta(days=options['days'])
+        for archive_model in (
+            models.ArchivedDepositTransaction,
+            models.ArchivedWithdrawalTransaction,
+        ):
+            archiver = TransactionArchiver(archive_model)
+            archiver.batch_size = options['batch_size']
+            archived_number = archiver.archive(finished_before)
+            self.stdout.write(
+                'Archived {} {}'.format(
+                    archived_number,
+                    archive_model.transaction_model._meta.verbose_name_plural,
+                ),
+            )
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.benchmarks import (
+    THRESHOLD,
+    compare_results,
+    get_median,
+    load_results,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares medians of benchmark samples of the working tree with '
+        'samples of a base revision (see apps/core/benchmarks)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('base_results', help='JSON file of a base')
+        parser.add_argument('head_results', help='JSON file to compare')
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=THRESHOLD,
+            help='Allowed growth of a median (a fraction)',
+        )
+
+    def handle(self, *args, **options):
+        base_results = load_results(options['base_results'])
+        head_results = load_results(options['head_results'])
+        for name, samples in sorted(head_results.items()):
+            for measure, values in sorted(samples.items()):
+                base_values = base_results.get(name, {}).get(measure)
+                self.stdout.write(
+                    '{} {}: {} (base {})'.format(
+                        name,
+                        measure,
+                        get_median(values),
+                        get_median(base_values) if base_values else None,
+                    ),
+                )
+        regressions = compare_results(
+            base_results,
+            head_results,
+            options['threshold'],
+        )
+        if regressions:
+            raise CommandError('\n'.join(regressions))
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.core.listeners import DashListener
+
+
+class Command(BaseCommand):
+    help = (
+        'Listens to transactions and blocks published by a Dash server over '
+        'ZeroMQ and advances deposits'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default=settings.DASHD_ZMQ_URL,
+            help='Address of the ZeroMQ publisher of a Dash server',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Listening to {}'.format(options['url']))
+        DashListener(options['url']).run()
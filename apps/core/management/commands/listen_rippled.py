@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.core.listeners import RippleListener
+
+
+class Command(BaseCommand):
+    help = (
+        'Listens to transactions of the gateway Ripple account over a '
+        'WebSocket connection to rippled and advances withdrawals'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default=settings.RIPPLED_WEBSOCKET_URL,
+            help='WebSocket URL of a Ripple server',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Listening to {}'.format(options['url']))
+        RippleListener(options['url']).run()
@@ -0,0 +1,175 @@
+import glob
+import logging
+import os
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import (
+    MultiProcessCollector,
+    mark_process_dead,
+)
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Count
+from django.utils.timezone import now
+
+from gateway import celery_app
+
+logger = logging.getLogger('gateway')
+
+STATE_NAMES = {
+    1: 'initiated',
+    2: 'unconfirmed',
+    3: 'confirmed',
+    4: 'processed',
+    5: 'overdue',
+    6: 'failed',
+    7: 'no_ripple_trust',
+}
+
+dashd_rpc_duration = Histogram(
+    'gateway_dashd_rpc_duration_seconds',
+    'Duration of calls to dashd',
+    ['method'],
+)
+monitor_transactions_duration = Histogram(
+    'gateway_monitor_transactions_duration_seconds',
+    'Duration of loading Ripple payments by monitor_transactions_task',
+)
+transaction_state_duration = Histogram(
+    'gateway_transaction_state_duration_seconds',
+    'Time transactions spend in a state before leaving it',
+    ['transaction_type', 'state'],
+    buckets=(
+        1, 10, 60, 5 * 60, 15 * 60, 30 * 60, 60 * 60, 3 * 60 * 60,
+        6 * 60 * 60, 24 * 60 * 60, float('inf'),
+    ),
+)
+
+
+def observe_state_duration(transaction_model, state, entered_at):
+    transaction_state_duration.labels(
+        transaction_model._meta.model_name,
+        STATE_NAMES[state],
+    ).observe((now() - entered_at).total_seconds())
+
+
+class GatewayCollector(object):
+    """
+    Collects metrics which are read from the DB and the broker on every
+    scrape, so they are the same in every process.
+    """
+
+    def collect(self):
+        yield self.collect_active_transactions()
+        yield self.collect_queue_messages()
+
+    @staticmethod
+    def collect_active_transactions():
+        metric = GaugeMetricFamily(
+            'gateway_active_transactions',
+            'Number of transactions which are monitored',
+            labels=['transaction_type', 'state'],
+        )
+        for model_name in ('DepositTransaction', 'WithdrawalTransaction'):
+            transaction_model = apps.get_model('core', model_name)
+            counts = dict(
+                transaction_model.objects.filter(
+                    state__in=transaction_model.ACTIVE_STATES,
+                ).values_list('state').annotate(Count('id')),
+            )
+            for state, _ in transaction_model.STATE_CHOICES:
+                if state not in transaction_model.ACTIVE_STATES:
+                    continue
+                metric.add_metric(
+                    [transaction_model._meta.model_name, STATE_NAMES[state]],
+                    counts.get(state, 0),
+                )
+        return metric
+
+    @staticmethod
+    def collect_queue_messages():
+        metric = GaugeMetricFamily(
+            'gateway_celery_queue_messages',
+            'Number of tasks waiting in a Celery queue',
+            labels=['queue'],
+        )
+        try:
+            with celery_app.connection_or_acquire() as connection:
+                channel = connection.default_channel
+                for queue in settings.CELERY_QUEUES:
+                    metric.add_metric(
+                        [queue.name],
+                        channel.queue_declare(
+                            queue=queue.name,
+                            passive=True,
+                        ).message_count,
+                    )
+        except Exception:
+            logger.exception('Metrics. Cannot get sizes of Celery queues')
+        return metric
+
+
+class ProcessCollector(object):
+    """
+    Collects metrics of the current process when they are not shared.
+    """
+
+    def collect(self):
+        return REGISTRY.collect()
+
+
+class ContainersCollector(MultiProcessCollector):
+    """
+    Collects metrics of processes of all containers. Every container writes
+    them to its own subdirectory of `METRICS_DIR`.
+    """
+
+    def __init__(self, registry):
+        super(ContainersCollector, self).__init__(
+            registry,
+            path=settings.METRICS_DIR,
+        )
+        # Files of all subdirectories are merged like files of one
+        # directory, so counters of containers are summed.
+        self._path = os.path.join(settings.METRICS_DIR, '*')
+
+
+def clear_process_metrics():
+    """
+    Removes metrics of processes of a previous run of the container (see
+    `METRICS_DIR`). Should be called on start before processes are forked.
+    """
+    if not settings.METRICS_DIR:
+        return
+    for path in glob.glob(
+        os.path.join(os.environ['prometheus_multiproc_dir'], '*.db'),
+    ):
+        os.remove(path)
+
+
+def remove_process_metrics(pid):
+    """
+    Removes live gauges of a finished process (see `METRICS_DIR`).
+    """
+    if settings.METRICS_DIR:
+        mark_process_dead(pid)
+
+
+def render_metrics():
+    """
+    Renders metrics of all processes in the Prometheus text format.
+    """
+    registry = CollectorRegistry()
+    if settings.METRICS_DIR:
+        ContainersCollector(registry)
+    else:
+        registry.register(ProcessCollector())
+    registry.register(GatewayCollector())
+    return generate_latest(registry)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def fill_ripple_received_balances(apps, schema_editor):
+    RippleTransaction = apps.get_model('ripple_api', 'Transaction')
+    RippleReceivedBalance = apps.get_model('core', 'RippleReceivedBalance')
+    balances = {}
+    for destination_tag, currency, issuer, value in (
+        RippleTransaction.objects.filter(
+            status=0,  # Received
+            destination_tag__isnull=False,
+        ).values_list('destination_tag', 'currency', 'issuer', 'value')
+    ):
+        key = (destination_tag, currency, issuer)
+        balances[key] = balances.get(key, 0) + Decimal(value)
+    RippleReceivedBalance.objects.bulk_create(
+        RippleReceivedBalance(
+            destination_tag=destination_tag,
+            currency=currency,
+            issuer=issuer,
+            received=received,
+        ) for (destination_tag, currency, issuer), received in balances.items()
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('core', '0002_dashaddresspool'),
+        ('ripple_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RippleReceivedBalance',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destination_tag', models.BigIntegerField()),
+                ('currency', models.CharField(max_length=3)),
+                ('issuer', models.CharField(max_length=100)),
+                ('received', models.DecimalField(decimal_places=96, default=0, max_digits=182)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='ripplereceivedbalance',
+            unique_together=set([('destination_tag', 'currency', 'issuer')]),
+        ),
+        # Statements are split manually, so sqlparse is not required.
+        migrations.RunSQL(
+            [
+                'CREATE INDEX core_ripple_transaction_destination_tag_idx '
+                'ON ripple_api_transaction '
+                '(destination_tag, currency, issuer, status)',
+            ],
+            ['DROP INDEX core_ripple_transaction_destination_tag_idx'],
+        ),
+        migrations.RunPython(
+            fill_ripple_received_balances,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+
+from django.db import migrations, models
+from django.utils import formats
+
+
+def fill_state_histories(apps, schema_editor):
+    for transaction_model_name, state_change_model_name in (
+        ('DepositTransaction', 'DepositTransactionStateChange'),
+        ('WithdrawalTransaction', 'WithdrawalTransactionStateChange'),
+    ):
+        transaction_model = apps.get_model('core', transaction_model_name)
+        state_change_model = apps.get_model('core', state_change_model_name)
+        state_histories = {}
+        for transaction_id, current_state, datetime in (
+            state_change_model.objects.order_by('datetime').values_list(
+                'transaction_id',
+                'current_state',
+                'datetime',
+            ).iterator()
+        ):
+            state_histories.setdefault(transaction_id, []).append(
+                {
+                    'state': current_state,
+                    'timestamp': formats.date_format(
+                        datetime,
+                        'DATETIME_FORMAT',
+                    ),
+                },
+            )
+        for transaction_id, state_history in state_histories.items():
+            transaction_model.objects.filter(id=transaction_id).update(
+                state_history=json.dumps(
+                    state_history,
+                    separators=(',', ':'),
+                ),
+            )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('core', '0003_ripplereceivedbalance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deposittransaction',
+            name='state_history',
+            field=models.TextField(default='[]', editable=False),
+        ),
+        migrations.AddField(
+            model_name='withdrawaltransaction',
+            name='state_history',
+            field=models.TextField(default='[]', editable=False),
+        ),
+        migrations.RunPython(fill_state_histories, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_state_history'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deposittransaction',
+            index=models.Index(
+                fields=['state', 'timestamp'],
+                name='core_deposit_state_time_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='withdrawaltransaction',
+            index=models.Index(
+                fields=['state', 'timestamp'],
+                name='core_withdrawal_state_time_idx',
+            ),
+        ),
+    ]
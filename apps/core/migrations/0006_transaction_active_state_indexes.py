@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+import apps.core.validators
+
+# Initiated, unconfirmed, confirmed and no Ripple trust.
+ACTIVE_STATES_CONDITION = 'WHERE state IN (1, 2, 3, 7)'
+
+TRANSACTION_TABLES = (
+    ('core_deposit_active_state_idx', 'core_deposittransaction'),
+    ('core_withdrawal_active_state_idx', 'core_withdrawaltransaction'),
+)
+
+
+def create_active_state_indexes(apps, schema_editor):
+    # SQLite, which runs tests, cannot match a partial index with a query
+    # that passes states as parameters, so it gets full indexes.
+    condition = (
+        ACTIVE_STATES_CONDITION
+        if schema_editor.connection.vendor == 'postgresql' else ''
+    )
+    for index_name, table_name in TRANSACTION_TABLES:
+        schema_editor.execute(
+            'CREATE INDEX {} ON {} (state, timestamp) {}'.format(
+                index_name,
+                table_name,
+                condition,
+            ),
+        )
+
+
+def drop_active_state_indexes(apps, schema_editor):
+    for index_name, _ in TRANSACTION_TABLES:
+        schema_editor.execute('DROP INDEX {}'.format(index_name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_transaction_state_timestamp_indexes'),
+    ]
+
+    operations = [
+        # Terminal transactions make most of the tables, so the full
+        # indexes are replaced with partial ones.
+        migrations.RemoveIndex(
+            model_name='deposittransaction',
+            name='core_deposit_state_time_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='withdrawaltransaction',
+            name='core_withdrawal_state_time_idx',
+        ),
+        # SQLite remakes a table to alter it, which drops indexes unknown
+        # to the model, so they are created last.
+        migrations.AlterField(
+            model_name='deposittransaction',
+            name='dash_address',
+            field=models.CharField(max_length=35, unique=True, validators=[apps.core.validators.dash_address_validator]),
+        ),
+        migrations.RunPython(
+            create_active_state_indexes,
+            drop_active_state_indexes,
+        ),
+    ]
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_transaction_active_state_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedDepositTransaction',
+            fields=[
+                ('timestamp', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('dash_address', models.CharField(max_length=35)),
+                ('dash_to_transfer', models.DecimalField(decimal_places=8, max_digits=16)),
+                ('state', models.PositiveSmallIntegerField()),
+                ('current_state', models.CharField(max_length=500)),
+                ('state_history', models.TextField(default='[]')),
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedWithdrawalTransaction',
+            fields=[
+                ('timestamp', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('dash_address', models.CharField(max_length=35)),
+                ('dash_to_transfer', models.DecimalField(decimal_places=8, max_digits=16)),
+                ('state', models.PositiveSmallIntegerField()),
+                ('current_state', models.CharField(max_length=500)),
+                ('state_history', models.TextField(default='[]')),
+                ('id', models.BigIntegerField(editable=False, primary_key=True, serialize=False)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_archived_transactions'),
+        ('ripple_api', '0001_initial'),
+    ]
+
+    operations = [
+        # The Ripple listener and `monitor_transactions_task` store the same
+        # payments, so a payment stored twice would be counted twice.
+        # Transactions are created without a hash before they are signed.
+        # The model belongs to `ripple_api`, so the index is created here.
+        migrations.RunSQL(
+            [
+                'CREATE UNIQUE INDEX core_ripple_transaction_hash_uniq '
+                'ON ripple_api_transaction (hash, account) '
+                'WHERE hash != \'\'',
+            ],
+            ['DROP INDEX core_ripple_transaction_hash_uniq'],
+        ),
+    ]
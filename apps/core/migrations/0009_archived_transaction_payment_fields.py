@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_ripple_transaction_hash_uniq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archiveddeposittransaction',
+            name='outgoing_ripple_transaction_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='archiveddeposittransaction',
+            name='ripple_address',
+            field=models.CharField(default='', max_length=35),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='archivedwithdrawaltransaction',
+            name='outgoing_dash_transaction_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
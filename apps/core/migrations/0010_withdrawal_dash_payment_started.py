@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def create_active_state_index(apps, schema_editor):
+    # SQLite remakes a table to add a field, which drops the index created
+    # by `0006_transaction_active_state_indexes`.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS core_withdrawal_active_state_idx '
+        'ON core_withdrawaltransaction (state, timestamp)',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_archived_transaction_payment_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='withdrawaltransaction',
+            name='is_dash_payment_started',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(
+            create_active_state_index,
+            migrations.RunPython.noop,
+        ),
+    ]
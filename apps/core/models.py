@@ -1,19 +1,30 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import hashlib
+import json
+import logging
+import time
 import uuid
 from datetime import timedelta
 from decimal import Decimal
 
 from encrypted_fields import EncryptedCharField
+from ripple_api.models import Transaction as RippleTransaction
 from solo.models import SingletonModel
 
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction as db_transaction
+from django.db.models import F
 from django.db.models.signals import post_save
 from django.utils import formats
 from django.utils.translation import ugettext as _
 
+from apps.core import events
+from apps.core.metrics import observe_state_duration
 from apps.core.validators import (
     dash_address_validator,
     ripple_address_validator,
@@ -21,8 +32,56 @@ from apps.core.validators import (
 )
 from apps.core.wallet import DashWallet
 
+logger = logging.getLogger('gateway')
 
-class GatewaySettings(SingletonModel):
+
+class LocallyCachedSingletonModel(SingletonModel):
+    """
+    Singleton which is also kept in memory of each process.
+
+    A copy is used without any lookup for `SOLO_LOCAL_CACHE_TIMEOUT`
+    seconds. Then it is reused only if its version in `SOLO_CACHE` is not
+    changed. Saving an instance changes the version. The copy is shared
+    within a process, so it must not be modified.
+    """
+    # Maps classes to tuples `(instance, version, checked_at)`.
+    _local_copies = {}
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        super(LocallyCachedSingletonModel, self).save(*args, **kwargs)
+        self._local_copies.pop(type(self), None)
+        caches[settings.SOLO_CACHE].set(
+            self.get_version_cache_key(),
+            uuid.uuid4().hex,
+            None,
+        )
+
+    @classmethod
+    def get_version_cache_key(cls):
+        return '{}:version'.format(cls.get_cache_key())
+
+    @classmethod
+    def get_solo(cls):
+        current_time = time.time()
+        local_copy = cls._local_copies.get(cls)
+        if local_copy is not None:
+            instance, version, checked_at = local_copy
+            if current_time - checked_at < settings.SOLO_LOCAL_CACHE_TIMEOUT:
+                return instance
+
+        cache = caches[settings.SOLO_CACHE]
+        cache.add(cls.get_version_cache_key(), uuid.uuid4().hex, None)
+        current_version = cache.get(cls.get_version_cache_key())
+        if local_copy is None or version != current_version:
+            instance = super(LocallyCachedSingletonModel, cls).get_solo()
+        cls._local_copies[cls] = (instance, current_version, current_time)
+        return instance
+
+
+class GatewaySettings(LocallyCachedSingletonModel):
     gateway_fee_percent = models.DecimalField(
         max_digits=5,
         decimal_places=2,
@@ -58,7 +117,7 @@ class GatewaySettings(SingletonModel):
         verbose_name = 'Gateway Settings'
 
 
-class RippleWalletCredentials(SingletonModel):
+class RippleWalletCredentials(LocallyCachedSingletonModel):
     address = models.CharField(
         max_length=35,
         validators=[ripple_address_validator],
@@ -85,6 +144,100 @@ class Page(models.Model):
         return self.title
 
 
+class DashAddressPool(models.Model):
+    """
+    Dash addresses generated in advance to be assigned to new deposits
+    """
+    address = models.CharField(max_length=35, unique=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Pooled Dash address'
+
+    def __str__(self):
+        return self.address
+
+    @classmethod
+    def claim_address(cls):
+        """
+        Removes the oldest address from the pool and returns it. Addresses
+        locked by concurrent transactions are skipped. Returns `None` if the
+        pool is empty.
+        """
+        with db_transaction.atomic():
+            pooled_address = cls.objects.select_for_update(
+                skip_locked=True,
+            ).order_by('id').first()
+            if pooled_address is None:
+                return
+            pooled_address.delete()
+        return pooled_address.address
+
+
+class RippleReceivedBalance(models.Model):
+    """
+    Running total of Ripple payments received with a destination tag
+    """
+    destination_tag = models.BigIntegerField()
+    currency = models.CharField(max_length=3)
+    issuer = models.CharField(max_length=100)
+    # Big enough to store a sum of any Ripple amounts exactly.
+    received = models.DecimalField(
+        max_digits=182,
+        decimal_places=96,
+        default=0,
+    )
+
+    class Meta:
+        unique_together = ('destination_tag', 'currency', 'issuer')
+
+    def __str__(self):
+        return '{} {} (destination tag {})'.format(
+            self.received.normalize(),
+            self.currency,
+            self.destination_tag,
+        )
+
+    @classmethod
+    def get_received_by_destination_tags(
+        cls,
+        destination_tags,
+        currency,
+        issuer,
+    ):
+        """
+        Returns normalized totals of destination tags, which received
+        something, in a single query.
+        """
+        return {
+            destination_tag: received.normalize()
+            for destination_tag, received in cls.objects.filter(
+                destination_tag__in=destination_tags,
+                currency=currency,
+                issuer=issuer,
+            ).values_list('destination_tag', 'received')
+        }
+
+    @staticmethod
+    def post_save_signal_handler(instance, created, **kwargs):
+        if (
+            not created or
+            instance.status != RippleTransaction.RECEIVED or
+            instance.destination_tag is None
+        ):
+            return
+        balance, _ = RippleReceivedBalance.objects.get_or_create(
+            destination_tag=instance.destination_tag,
+            currency=instance.currency,
+            issuer=instance.issuer,
+        )
+        # The total is incremented in the DB, so concurrent payments are
+        # not lost.
+        RippleReceivedBalance.objects.filter(id=balance.id).update(
+            received=F('received') + Decimal(instance.value),
+        )
+
+
 class TransactionStates(object):
     INITIATED = 1
     UNCONFIRMED = 2
@@ -94,8 +247,60 @@ class TransactionStates(object):
     FAILED = 6
     NO_RIPPLE_TRUST = 7
 
+    # Transactions in these states are moved to archive tables.
+    FINISHED_STATES = (PROCESSED, OVERDUE, FAILED)
+
+    # Transactions in these states are monitored. They are covered by
+    # partial indexes (see the `0006_transaction_active_state_indexes`
+    # migration).
+    ACTIVE_STATES = (INITIATED, UNCONFIRMED, CONFIRMED, NO_RIPPLE_TRUST)
+
+
+class TransactionStatusMixin(object):
+    """
+    Renders statuses of transactions for the status API.
+    """
+
+    def get_state_history(self):
+        return json.loads(self.state_history)
+
+    def get_status(self):
+        return {
+            'transactionId': self.id,
+            'state': self.get_current_state(),
+            'stateHistory': self.get_state_history(),
+        }
+
+    @classmethod
+    def get_status_cache_key(cls, transaction_id):
+        return 'transaction-status:{}:{}'.format(
+            cls._meta.model_name,
+            transaction_id,
+        )
+
+    def cache_status(self):
+        """
+        Renders a status of the transaction to JSON and caches it with its
+        ETag. Returns a tuple `(etag, content)`.
+        """
+        content = json.dumps(self.get_status(), cls=DjangoJSONEncoder)
+        status = (
+            '"{}"'.format(hashlib.md5(content.encode('utf-8')).hexdigest()),
+            content,
+        )
+        cache.set(
+            self.get_status_cache_key(self.id),
+            status,
+            settings.STATUS_API_CACHE_TIMEOUT,
+        )
+        return status
+
 
-class BaseTransaction(models.Model, TransactionStates):
+class BaseTransaction(
+    TransactionStatusMixin,
+    models.Model,
+    TransactionStates,
+):
     timestamp = models.DateTimeField(auto_now_add=True)
 
     dash_address = models.CharField(
@@ -103,24 +308,97 @@ class BaseTransaction(models.Model, TransactionStates):
         validators=[dash_address_validator],
     )
 
+    # Formatted state changes in JSON, so statuses are read from one row.
+    state_history = models.TextField(default='[]', editable=False)
+
     class Meta:
         abstract = True
 
-    def get_overdue_datetime(self):
+    def save(self, *args, **kwargs):
+        # The history is appended only by `append_state_history`, so an
+        # update does not overwrite it with a stale copy of the instance.
+        if (
+            not self._state.adding and
+            not args and
+            not kwargs.get('force_insert') and
+            kwargs.get('update_fields') is None
+        ):
+            deferred_fields = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and
+                field.name != 'state_history' and
+                field.attname not in deferred_fields
+            ]
+        # A state change is appended to the history in the same DB
+        # transaction.
+        with db_transaction.atomic():
+            super(BaseTransaction, self).save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        transaction = super(BaseTransaction, cls).from_db(
+            db,
+            field_names,
+            values,
+        )
+        # Time in a state is measured when a transaction leaves it.
+        transaction.loaded_state = transaction.__dict__.get('state')
+        return transaction
+
+    def observe_state_duration(self):
+        """
+        Measures time the transaction spent in the loaded state if it is
+        changed. Should be called before a new state change is recorded.
+        """
+        loaded_state = getattr(self, 'loaded_state', None)
+        self.loaded_state = self.state
+        if loaded_state is None or loaded_state == self.state:
+            return
+        entered_at = self.state_changes.order_by('-datetime').values_list(
+            'datetime',
+            flat=True,
+        ).first()
+        if entered_at is not None:
+            observe_state_duration(type(self), loaded_state, entered_at)
+
+    def get_overdue_datetime(self, gateway_settings=None):
+        gateway_settings = gateway_settings or GatewaySettings.get_solo()
         return self.timestamp + timedelta(
-            minutes=GatewaySettings.get_solo().transaction_expiration_minutes,
+            minutes=gateway_settings.transaction_expiration_minutes,
         )
 
-    def get_state_history(self):
-        return [
+    def get_appended_state_history(self, state_change):
+        """
+        Returns the state history in JSON with a new state change appended.
+        """
+        state_history = self.get_state_history()
+        state_history.append(
             {
-                'state': state.current_state,
+                'state': state_change.current_state,
                 'timestamp': formats.date_format(
-                    state.datetime,
+                    state_change.datetime,
                     'DATETIME_FORMAT',
                 ),
-            } for state in self.state_changes.order_by('datetime').all()
-        ]
+            },
+        )
+        return json.dumps(state_history, separators=(',', ':'))
+
+    def append_state_history(self, state_change):
+        """
+        Appends a state change to the history stored in the transaction row.
+        The history is reloaded from the locked row, so changes appended
+        concurrently through other instances are not lost.
+        """
+        with db_transaction.atomic():
+            self.state_history = type(self).objects.select_for_update(
+            ).values_list('state_history', flat=True).get(id=self.id)
+            self.state_history = self.get_appended_state_history(
+                state_change,
+            )
+            type(self).objects.filter(id=self.id).update(
+                state_history=self.state_history,
+            )
 
     def get_normalized_dash_to_transfer(self):
         if not isinstance(self.dash_to_transfer, Decimal):
@@ -180,6 +458,12 @@ class DepositTransaction(BaseTransaction):
         default=TransactionStates.INITIATED,
         choices=STATE_CHOICES,
     )
+    # Every deposit gets a new address of the wallet.
+    dash_address = models.CharField(
+        max_length=35,
+        unique=True,
+        validators=[dash_address_validator],
+    )
     ripple_address = models.CharField(
         max_length=35,
         validators=[ripple_address_validator],
@@ -194,32 +478,50 @@ class DepositTransaction(BaseTransaction):
         return 'Deposit {}'.format(self.id)
 
     def save(self, *args, **kwargs):
-        dash_wallet = DashWallet()
-        if not self.dash_address:
-            self.dash_address = dash_wallet.get_new_address()
-        super(DepositTransaction, self).save(*args, **kwargs)
-
-    def get_current_state(self):
+        # A claimed address returns to the pool if the deposit is not
+        # inserted.
+        with db_transaction.atomic():
+            if not self.dash_address:
+                self.dash_address = DashAddressPool.claim_address()
+            if not self.dash_address:
+                logger.warning('Dash address pool is empty')
+                self.dash_address = DashWallet().get_new_address()
+            super(DepositTransaction, self).save(*args, **kwargs)
+
+    def get_current_state(
+        self,
+        gateway_settings=None,
+        ripple_wallet_credentials=None,
+    ):
+        gateway_settings = gateway_settings or GatewaySettings.get_solo()
+        ripple_wallet_credentials = (
+            ripple_wallet_credentials or RippleWalletCredentials.get_solo()
+        )
         values = self.__dict__
         values['dash_to_transfer'] = self.get_normalized_dash_to_transfer()
         values['overdue_datetime'] = formats.date_format(
-            self.get_overdue_datetime(),
+            self.get_overdue_datetime(gateway_settings),
             'DATETIME_FORMAT',
         )
         values['confirmations_number'] = (
-            GatewaySettings.get_solo().dash_required_confirmations
-        )
-        values['gateway_ripple_address'] = (
-            RippleWalletCredentials.get_solo().address
+            gateway_settings.dash_required_confirmations
         )
+        values['gateway_ripple_address'] = ripple_wallet_credentials.address
         return self.get_state_display().format(**values)
 
     @staticmethod
     def post_save_signal_handler(instance, **kwargs):
-        DepositTransactionStateChange.objects.create(
+        instance.observe_state_duration()
+        state_change = DepositTransactionStateChange.objects.create(
             transaction=instance,
             current_state=instance.get_current_state(),
         )
+        instance.append_state_history(state_change)
+        # The status is rendered once per state change.
+        events.publish_status(
+            instance.get_status_cache_key(instance.id),
+            instance.cache_status(),
+        )
 
 
 class WithdrawalTransaction(BaseTransaction):
@@ -272,6 +574,11 @@ class WithdrawalTransaction(BaseTransaction):
         max_length=64,
         blank=True,
     )
+    # Set before a Dash transaction is sent, so it is not sent again.
+    is_dash_payment_started = models.BooleanField(
+        default=False,
+        editable=False,
+    )
 
     def __str__(self):
         return 'Withdrawal {}'.format(self.id)
@@ -280,23 +587,37 @@ class WithdrawalTransaction(BaseTransaction):
     def destination_tag(self):
         return self.id
 
-    def get_current_state(self):
+    def get_current_state(
+        self,
+        gateway_settings=None,
+        ripple_wallet_credentials=None,
+    ):
+        ripple_wallet_credentials = (
+            ripple_wallet_credentials or RippleWalletCredentials.get_solo()
+        )
         values = self.__dict__
         values['dash_to_transfer'] = self.get_normalized_dash_to_transfer()
         values['overdue_datetime'] = formats.date_format(
-            self.get_overdue_datetime(),
+            self.get_overdue_datetime(gateway_settings),
             'DATETIME_FORMAT',
         )
         values['destination_tag'] = self.destination_tag
-        values['ripple_address'] = RippleWalletCredentials.get_solo().address
+        values['ripple_address'] = ripple_wallet_credentials.address
         return self.get_state_display().format(**values)
 
     @staticmethod
     def post_save_signal_handler(instance, **kwargs):
-        WithdrawalTransactionStateChange.objects.create(
+        instance.observe_state_duration()
+        state_change = WithdrawalTransactionStateChange.objects.create(
             transaction=instance,
             current_state=instance.get_current_state(),
         )
+        instance.append_state_history(state_change)
+        # The status is rendered once per state change.
+        events.publish_status(
+            instance.get_status_cache_key(instance.id),
+            instance.cache_status(),
+        )
 
 
 class BaseTransactionStateChange(models.Model):
@@ -321,6 +642,89 @@ class WithdrawalTransactionStateChange(BaseTransactionStateChange):
     )
 
 
+class BaseArchivedTransaction(TransactionStatusMixin, models.Model):
+    """
+    A finished transaction moved out of the table of active ones. Its
+    status is rendered once on archiving.
+    """
+    timestamp = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    dash_address = models.CharField(max_length=35)
+    dash_to_transfer = models.DecimalField(max_digits=16, decimal_places=8)
+    state = models.PositiveSmallIntegerField()
+    current_state = models.CharField(max_length=500)
+    state_history = models.TextField(default='[]')
+
+    # Fields of a transaction model, which are copied as they are.
+    copied_fields = ()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def get_status_cache_key(cls, transaction_id):
+        # Archived transactions are looked up by URLs of active ones.
+        return cls.transaction_model.get_status_cache_key(transaction_id)
+
+    @classmethod
+    def from_transaction(
+        cls,
+        transaction,
+        gateway_settings=None,
+        ripple_wallet_credentials=None,
+    ):
+        return cls(
+            id=transaction.id,
+            timestamp=transaction.timestamp,
+            dash_address=transaction.dash_address,
+            dash_to_transfer=transaction.dash_to_transfer,
+            state=transaction.state,
+            current_state=transaction.get_current_state(
+                gateway_settings,
+                ripple_wallet_credentials,
+            ),
+            state_history=transaction.state_history,
+            **{
+                field_name: getattr(transaction, field_name)
+                for field_name in cls.copied_fields
+            }
+        )
+
+    def get_current_state(self):
+        return self.current_state
+
+
+class ArchivedDepositTransaction(BaseArchivedTransaction):
+    transaction_model = DepositTransaction
+    copied_fields = ('ripple_address', 'outgoing_ripple_transaction_hash')
+
+    id = models.UUIDField(primary_key=True, editable=False)
+    ripple_address = models.CharField(max_length=35)
+    outgoing_ripple_transaction_hash = models.CharField(
+        max_length=64,
+        blank=True,
+    )
+
+    def __str__(self):
+        return 'Archived deposit {}'.format(self.id)
+
+
+class ArchivedWithdrawalTransaction(BaseArchivedTransaction):
+    transaction_model = WithdrawalTransaction
+    copied_fields = ('outgoing_dash_transaction_hash',)
+
+    # Destination tags are never reused, because IDs of withdrawals are not.
+    id = models.BigIntegerField(primary_key=True, editable=False)
+    outgoing_dash_transaction_hash = models.CharField(
+        max_length=64,
+        blank=True,
+    )
+
+    def __str__(self):
+        return 'Archived withdrawal {}'.format(self.id)
+
+
 post_save.connect(
     DepositTransaction.post_save_signal_handler,
     sender=DepositTransaction,
@@ -329,3 +733,7 @@ post_save.connect(
     WithdrawalTransaction.post_save_signal_handler,
     sender=WithdrawalTransaction,
 )
+post_save.connect(
+    RippleReceivedBalance.post_save_signal_handler,
+    sender=RippleTransaction,
+)
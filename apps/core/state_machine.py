@@ -0,0 +1,114 @@
+from django.db import models as db_models, transaction as db_transaction
+from django.db.models import Case, Max, Value, When
+
+from apps.core import events, models
+from apps.core.metrics import observe_state_duration
+
+
+class TransactionStateMachine(object):
+    """
+    Moves transactions to a new state in bulk.
+
+    Unlike `save`, it does not send `post_save` signals. States are updated
+    and state changes are inserted with a constant number of queries per
+    batch, messages of states are rendered with gateway settings loaded
+    once.
+
+    Rows are locked and moved only if they are still in `from_state`, so
+    concurrent moves of the same transactions move each of them once. All
+    transitions of monitoring tasks go through it; a caller acts only on
+    the returned transactions, e.g. sends payments of them.
+    """
+    batch_size = 500
+
+    def __init__(self, transaction_model):
+        self.transaction_model = transaction_model
+        self.state_change_model = transaction_model._meta.get_field(
+            'state_changes',
+        ).related_model
+
+    def move(self, transactions, from_state, to_state):
+        """
+        Moves transactions of a queryset, which are in `from_state`, to
+        `to_state`. Returns moved transactions.
+        """
+        gateway_settings = models.GatewaySettings.get_solo()
+        ripple_wallet_credentials = models.RippleWalletCredentials.get_solo()
+        moved_transactions = []
+        with db_transaction.atomic():
+            transactions = list(
+                transactions.filter(state=from_state).select_for_update(),
+            )
+            for start in range(0, len(transactions), self.batch_size):
+                moved_transactions += self._move_batch(
+                    transactions[start:start + self.batch_size],
+                    from_state,
+                    to_state,
+                    gateway_settings,
+                    ripple_wallet_credentials,
+                )
+
+        for transaction in moved_transactions:
+            events.publish_status(
+                transaction.get_status_cache_key(transaction.id),
+                transaction.cache_status(),
+            )
+        return moved_transactions
+
+    def _move_batch(
+        self,
+        transactions,
+        from_state,
+        to_state,
+        gateway_settings,
+        ripple_wallet_credentials,
+    ):
+        transaction_ids = [transaction.id for transaction in transactions]
+        self.transaction_model.objects.filter(
+            id__in=transaction_ids,
+            state=from_state,
+        ).update(state=to_state)
+
+        state_entered_at = dict(
+            self.state_change_model.objects.filter(
+                transaction_id__in=transaction_ids,
+            ).values_list('transaction_id').annotate(Max('datetime')),
+        )
+        for entered_at in state_entered_at.values():
+            observe_state_duration(
+                self.transaction_model,
+                from_state,
+                entered_at,
+            )
+
+        state_changes = []
+        for transaction in transactions:
+            transaction.state = transaction.loaded_state = to_state
+            state_changes.append(
+                self.state_change_model(
+                    transaction=transaction,
+                    current_state=transaction.get_current_state(
+                        gateway_settings,
+                        ripple_wallet_credentials,
+                    ),
+                ),
+            )
+        # Dates of state changes are set on insert.
+        self.state_change_model.objects.bulk_create(state_changes)
+
+        for transaction, state_change in zip(transactions, state_changes):
+            transaction.state_history = (
+                transaction.get_appended_state_history(state_change)
+            )
+        self.transaction_model.objects.filter(id__in=transaction_ids).update(
+            state_history=Case(
+                *[
+                    When(
+                        id=transaction.id,
+                        then=Value(transaction.state_history),
+                    ) for transaction in transactions
+                ],
+                output_field=db_models.TextField()
+            ),
+        )
+        return transactions
@@ -1,38 +1,169 @@
 import logging
+import random
 import socket
+import time
 
 import celery
+import requests
 import six
 from bitcoinrpc.authproxy import JSONRPCException
+from celery.signals import before_task_publish
 from ripple_api.management.transaction_processors import monitor_transactions
 from ripple_api.models import Transaction as RippleTransaction
-from ripple_api.ripple_api import balance as get_ripple_balance, is_trust_set
+from ripple_api.ripple_api import (
+    RippleApiError,
+    balance as get_ripple_balance,
+    is_trust_set,
+)
 from ripple_api.tasks import sign_task, submit_task
 
-from django.db.models import Sum, DecimalField
-from django.db.models.functions import Cast
-from django.db.utils import DatabaseError
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.db.utils import DatabaseError, IntegrityError
 from django.utils.timezone import now, timedelta
 
 from apps.core import models, utils, wallet
+from apps.core.circuit_breaker import CircuitBreaker
+from apps.core.metrics import monitor_transactions_duration
+from apps.core.state_machine import TransactionStateMachine
+from apps.core.tracing import get_trace_id, span
 from gateway import celery_app
 
 logger = logging.getLogger('gateway')
 
 
+def is_rippled_failure(exception):
+    # `ripple_api` reports timeouts of all servers as an API error.
+    return (
+        isinstance(exception, (requests.RequestException, socket.error)) or
+        isinstance(exception, RippleApiError) and exception.error == 'Timeout'
+    )
+
+
+rippled_circuit_breaker = CircuitBreaker('rippled', is_rippled_failure)
+
+
+def get_last_ripple_transaction_id():
+    return RippleTransaction.objects.order_by(
+        '-id',
+    ).values_list('id', flat=True).first() or 0
+
+
+def confirm_paid_withdrawals(ripple_address, last_ripple_transaction_id):
+    """
+    Confirms withdrawals which received Ripple payments stored after
+    the given transaction.
+    """
+    destination_tags = set(
+        RippleTransaction.objects.filter(
+            id__gt=last_ripple_transaction_id,
+            destination=ripple_address,
+            status=RippleTransaction.RECEIVED,
+            destination_tag__isnull=False,
+        ).values_list('destination_tag', flat=True),
+    )
+    if not destination_tags:
+        return
+    confirm_withdrawals(
+        models.WithdrawalTransaction.objects.filter(
+            id__in=destination_tags,
+            state=models.WithdrawalTransaction.INITIATED,
+        ),
+    )
+
+
 @celery_app.task
+@monitor_transactions_duration.time()
 def monitor_transactions_task():
     ripple_address = models.RippleWalletCredentials.get_solo().address
-    monitor_transactions(ripple_address)
+    last_ripple_transaction_id = get_last_ripple_transaction_id()
+    # `monitor_transactions` logs errors of rippled instead of raising them,
+    # so it is not guarded by the circuit breaker.
+    try:
+        monitor_transactions(ripple_address)
+    except IntegrityError:
+        # The Ripple listener stored a payment first. The rest is loaded
+        # by the next run.
+        logger.info('Ripple transactions. A payment is stored already')
+    # Withdrawals are advanced as soon as their payments are stored.
+    confirm_paid_withdrawals(ripple_address, last_ripple_transaction_id)
+
+
+@celery_app.task
+def refill_dash_address_pool():
+    missing_addresses_number = (
+        settings.DASH_ADDRESS_POOL_SIZE -
+        models.DashAddressPool.objects.count()
+    )
+    if missing_addresses_number <= 0:
+        return
+    dash_wallet = wallet.DashWallet()
+    models.DashAddressPool.objects.bulk_create(
+        models.DashAddressPool(address=address)
+        for address in dash_wallet.get_new_addresses(missing_addresses_number)
+    )
+    logger.info(
+        'Dash address pool. Added {} addresses'.format(
+            missing_addresses_number,
+        ),
+    )
+
+
+@before_task_publish.connect
+def add_published_at_header(headers=None, **kwargs):
+    # Lets tasks trace how long they waited in a queue.
+    if headers is not None:
+        headers['published_at'] = time.time()
 
 
 class CeleryTransactionBaseTask(celery.Task):
+    def __call__(self, transaction_id, *args, **kwargs):
+        transaction_model = self.get_transaction_model(transaction_id)
+        with span(
+            'task.{}'.format(self.name.rsplit('.', 1)[-1]),
+            trace_id=get_trace_id(transaction_model, transaction_id),
+            transaction_id=transaction_id,
+            retries=self.request.retries,
+        ) as attributes:
+            published_at = getattr(self.request, 'published_at', None)
+            if published_at is not None:
+                attributes['queue_wait'] = time.time() - published_at
+            return super(CeleryTransactionBaseTask, self).__call__(
+                transaction_id,
+                *args,
+                **kwargs
+            )
+
+    def retry(self, *args, **kwargs):
+        if kwargs.get('eta') is None and kwargs.get('countdown') is None:
+            kwargs['countdown'] = self.get_retry_countdown(
+                self.request.retries,
+            )
+        return super(CeleryTransactionBaseTask, self).retry(*args, **kwargs)
+
+    @staticmethod
+    def get_retry_countdown(retries):
+        """
+        Returns a delay (seconds) before the next retry. It grows
+        exponentially and is randomized ("full jitter"), so transactions
+        failed together are not retried together.
+        """
+        maximal_countdown = min(
+            settings.TASK_RETRY_BACKOFF_MAX,
+            settings.TASK_RETRY_BACKOFF * 2 ** retries,
+        )
+        return random.uniform(0, maximal_countdown)
+
+    @staticmethod
+    def get_transaction_model(transaction_id):
+        if isinstance(transaction_id, six.integer_types):
+            return models.WithdrawalTransaction
+        return models.DepositTransaction
+
     def on_failure(self, exc, task_id, args, kwargs, einfo):
         transaction_id = args[0]
-        if isinstance(transaction_id, six.integer_types):
-            transaction_model = models.WithdrawalTransaction
-        else:
-            transaction_model = models.DepositTransaction
+        transaction_model = self.get_transaction_model(transaction_id)
         transaction = transaction_model.objects.only('id').get(
             id=transaction_id,
         )
@@ -42,89 +173,170 @@ class CeleryTransactionBaseTask(celery.Task):
 
 celery_transaction_task = celery_app.task(
     base=CeleryTransactionBaseTask,
-    # Retry if the system cannot connect to a Dash or DB server.
-    autoretry_for=(socket.error, DatabaseError, JSONRPCException),
-    retry_kwargs={
-        'max_retries': None,
-        'countdown': 60,
-    },
+    # Retry if the system cannot connect to a Dash, Ripple or DB server.
+    # Connections to servers stopped by circuit breakers fail immediately.
+    autoretry_for=(
+        socket.error,
+        requests.RequestException,
+        DatabaseError,
+        JSONRPCException,
+    ),
+    retry_kwargs={'max_retries': None},
     max_retries=None,
 )
 
 
-@celery_transaction_task
-def monitor_dash_to_ripple_transaction(transaction_id):
-    logger.info('Deposit {}. Monitoring'.format(transaction_id))
-    transaction = models.DepositTransaction.objects.get(id=transaction_id)
+def mark_deposits_as_unconfirmed(transactions, balances):
+    """
+    Marks deposits, which addresses received enough Dash, as unconfirmed.
+    Returns deposits that are still waiting for Dash.
+    """
+    waiting_transactions = []
+    funded_transaction_ids = []
+    for transaction in transactions:
+        balance = balances.get(transaction.dash_address, 0)
+        if balance < transaction.dash_to_transfer:
+            waiting_transactions.append(transaction)
+        else:
+            funded_transaction_ids.append(transaction.id)
+    if not funded_transaction_ids:
+        return waiting_transactions
+
+    transaction_model = models.DepositTransaction
+    for transaction in TransactionStateMachine(transaction_model).move(
+        transaction_model.objects.filter(id__in=funded_transaction_ids),
+        transaction_model.INITIATED,
+        transaction_model.UNCONFIRMED,
+    ):
+        logger.info(
+            'Deposit {}. Received {} (unconfirmed) of {} DASH'.format(
+                transaction.id,
+                balances[transaction.dash_address],
+                transaction.get_normalized_dash_to_transfer(),
+            ),
+        )
+    return waiting_transactions
 
-    dash_wallet = wallet.DashWallet()
-    balance = dash_wallet.get_address_balance(transaction.dash_address, 0)
-    logger.info(
-        'Deposit {}. Received {} (unconfirmed) of {} DASH'.format(
-            transaction_id,
-            balance,
-            transaction.get_normalized_dash_to_transfer(),
+
+@celery_app.task
+def monitor_dash_to_ripple_transactions():
+    transactions = list(
+        models.DepositTransaction.objects.filter(
+            state=models.DepositTransaction.INITIATED,
         ),
     )
+    if not transactions:
+        return
+    logger.info('Deposits. Monitoring {} initiated'.format(len(transactions)))
+
+    dash_wallet = wallet.DashWallet()
+    # A single RPC call returns balances of all addresses of the wallet.
+    balances = dash_wallet.get_received_by_addresses(0)
+    mark_deposits_as_unconfirmed(transactions, balances)
+
 
-    if balance >= transaction.dash_to_transfer:
-        transaction.state = transaction.UNCONFIRMED
-        transaction.save(update_fields=('state',))
-        logger.info('Deposit {}. Became unconfirmed'.format(transaction_id))
-        monitor_transaction_confirmations_number.delay(transaction_id)
+def move_overdue_transactions(transaction_model, transactions):
+    if not transactions:
         return
+    for transaction in TransactionStateMachine(transaction_model).move(
+        transaction_model.objects.filter(
+            id__in=[transaction.id for transaction in transactions],
+        ),
+        transaction_model.INITIATED,
+        transaction_model.OVERDUE,
+    ):
+        logger.info('{}. Became overdue'.format(transaction))
 
+
+@celery_app.task
+def expire_overdue_transactions():
     expiration_minutes = (
         models.GatewaySettings.get_solo().transaction_expiration_minutes
     )
-    # If transaction is overdue.
-    if transaction.timestamp + timedelta(minutes=expiration_minutes) < now():
-        transaction.state = transaction.OVERDUE
-        transaction.save(update_fields=('state',))
-        logger.info('Deposit {}. Became overdue'.format(transaction_id))
-    else:
-        raise monitor_dash_to_ripple_transaction.retry(
-            (transaction_id,),
-            countdown=60,
+    overdue_timestamp = now() - timedelta(minutes=expiration_minutes)
+    deposits, withdrawals = (
+        list(
+            transaction_model.objects.filter(
+                state=transaction_model.INITIATED,
+                timestamp__lt=overdue_timestamp,
+            ),
+        ) for transaction_model in (
+            models.DepositTransaction,
+            models.WithdrawalTransaction,
         )
+    )
 
+    # Transactions, which are paid just before expiration, are advanced
+    # instead. Balances are checked with a single call or query.
+    if deposits:
+        deposits = mark_deposits_as_unconfirmed(
+            deposits,
+            wallet.DashWallet().get_received_by_addresses(0),
+        )
+    if withdrawals:
+        withdrawals = confirm_withdrawals(withdrawals)
 
-@celery_transaction_task
-def monitor_transaction_confirmations_number(transaction_id):
-    logger.info(
-        'Deposit {}. Monitoring number of confirmations'.format(
-            transaction_id,
-        ),
-    )
-    transaction = models.DepositTransaction.objects.get(id=transaction_id)
+    move_overdue_transactions(models.DepositTransaction, deposits)
+    move_overdue_transactions(models.WithdrawalTransaction, withdrawals)
 
-    gateway_settings = models.GatewaySettings.get_solo()
-    dash_wallet = wallet.DashWallet()
-    confirmed_balance = dash_wallet.get_address_balance(
-        transaction.dash_address,
-        gateway_settings.dash_required_confirmations,
-    )
 
-    logger.info(
-        'Deposit {}. Confirmed {} of {} DASH'.format(
-            transaction_id,
-            confirmed_balance,
-            transaction.get_normalized_dash_to_transfer(),
-        ),
+@celery_app.task
+def monitor_deposits_confirmations():
+    required_confirmations = (
+        models.GatewaySettings.get_solo().dash_required_confirmations
     )
-
-    if transaction.dash_to_transfer <= confirmed_balance:
-        transaction.state = transaction.CONFIRMED
-        transaction.save(update_fields=('state',))
-        logger.info('Deposit {}. Confirmed'.format(transaction_id))
-        send_ripple_transaction.delay(transaction_id)
+    dash_wallet = wallet.DashWallet()
+    # Numbers of confirmations change only when a new block arrives.
+    block_count = dash_wallet.get_block_count()
+    if (
+        required_confirmations and
+        cache.get('dash_evaluated_block_count') == block_count
+    ):
         return
 
-    raise monitor_transaction_confirmations_number.retry(
-        (transaction_id,),
-        countdown=60,
-        max_retries=60,
+    transactions = list(
+        models.DepositTransaction.objects.filter(
+            state=models.DepositTransaction.UNCONFIRMED,
+        ),
     )
+    if transactions:
+        logger.info(
+            'Deposits. Monitoring confirmations of {} unconfirmed '
+            '(block {})'.format(len(transactions), block_count),
+        )
+        # A single RPC call returns confirmed balances of all addresses.
+        confirmed_balances = dash_wallet.get_received_by_addresses(
+            required_confirmations,
+        )
+        confirmed_transaction_ids = [
+            transaction.id for transaction in transactions
+            if confirmed_balances.get(transaction.dash_address, 0) >=
+            transaction.dash_to_transfer
+        ]
+        if confirmed_transaction_ids:
+            confirm_deposits(confirmed_transaction_ids, confirmed_balances)
+    cache.set('dash_evaluated_block_count', block_count, None)
+
+
+def confirm_deposits(transaction_ids, confirmed_balances):
+    """
+    Marks unconfirmed deposits as confirmed and sends Ripple transactions
+    of them. A deposit, which is confirmed concurrently, is sent once.
+    """
+    transaction_model = models.DepositTransaction
+    for transaction in TransactionStateMachine(transaction_model).move(
+        transaction_model.objects.filter(id__in=transaction_ids),
+        transaction_model.UNCONFIRMED,
+        transaction_model.CONFIRMED,
+    ):
+        logger.info(
+            'Deposit {}. Confirmed {} of {} DASH'.format(
+                transaction.id,
+                confirmed_balances[transaction.dash_address],
+                transaction.get_normalized_dash_to_transfer(),
+            ),
+        )
+        send_ripple_transaction.delay(transaction.id)
 
 
 @celery_transaction_task
@@ -133,35 +345,86 @@ def send_ripple_transaction(transaction_id):
         'Deposit {}. Sending Ripple transaction'.format(transaction_id),
     )
 
-    dash_transaction = models.DepositTransaction.objects.get(id=transaction_id)
+    with db_transaction.atomic():
+        # A duplicate task waits for the lock and finds the deposit sent.
+        dash_transaction = (
+            models.DepositTransaction.objects.select_for_update().get(
+                id=transaction_id,
+            )
+        )
+        if dash_transaction.state not in (
+            dash_transaction.CONFIRMED,
+            dash_transaction.NO_RIPPLE_TRUST,
+        ):
+            logger.warning(
+                'Deposit {}. Not sent in state {}'.format(
+                    transaction_id,
+                    dash_transaction.state,
+                ),
+            )
+            return
+        trust_is_set = pay_deposit(dash_transaction)
+    if not trust_is_set:
+        raise send_ripple_transaction.retry(
+            (transaction_id,),
+            countdown=5 * 60,
+            max_retries=100,
+        )
+
 
+def check_ripple_trust(dash_transaction, ripple_credentials):
+    """
+    Returns a tuple `(trust_is_set, minimal_trust_limit)` of the Ripple
+    account of a deposit.
+    """
+    # Signing fails a transaction if rippled is down, so it is checked here.
+    try:
+        with rippled_circuit_breaker.guard():
+            with span('ripple.balance'):
+                minimal_trust_limit = (
+                    dash_transaction.dash_to_transfer +
+                    get_ripple_balance(
+                        dash_transaction.ripple_address,
+                        ripple_credentials.address,
+                        'DSH',
+                    )
+                )
+            with span('ripple.is_trust_set'):
+                trust_is_set = is_trust_set(
+                    trusts=dash_transaction.ripple_address,
+                    peer=ripple_credentials.address,
+                    currency='DSH',
+                    limit=minimal_trust_limit,
+                )
+    except RippleApiError as e:
+        if not is_rippled_failure(e):
+            raise
+        # Timeouts are retried like failed connections.
+        raise socket.timeout(str(e))
+    return trust_is_set, minimal_trust_limit
+
+
+def pay_deposit(dash_transaction):
+    """
+    Sends a Ripple transaction of a deposit. Returns False if the Ripple
+    account does not trust the gateway enough.
+    """
     ripple_credentials = models.RippleWalletCredentials.get_solo()
-
-    minimal_trust_limit = (
-        dash_transaction.dash_to_transfer +
-        get_ripple_balance(
-            dash_transaction.ripple_address,
-            ripple_credentials.address,
-            'DSH',
-        )
+    trust_is_set, minimal_trust_limit = check_ripple_trust(
+        dash_transaction,
+        ripple_credentials,
     )
-    if not is_trust_set(
-        trusts=dash_transaction.ripple_address,
-        peer=ripple_credentials.address,
-        currency='DSH',
-        limit=minimal_trust_limit,
-    ):
+    if not trust_is_set:
         logger.info(
             'Deposit {}. Ripple account does not trust '
-            '(should trust {})'.format(transaction_id, minimal_trust_limit),
+            '(should trust {})'.format(
+                dash_transaction.id,
+                minimal_trust_limit,
+            ),
         )
         dash_transaction.state = dash_transaction.NO_RIPPLE_TRUST
         dash_transaction.save()
-        raise send_ripple_transaction.retry(
-            (transaction_id,),
-            countdown=5 * 60,
-            max_retries=100,
-        )
+        return False
 
     new_ripple_transaction = RippleTransaction.objects.create(
         account=ripple_credentials.address,
@@ -175,35 +438,37 @@ def send_ripple_transaction(transaction_id):
         ),
     )
 
-    sign_task(new_ripple_transaction.pk, ripple_credentials.secret)
+    with span('ripple.sign'):
+        sign_task(new_ripple_transaction.pk, ripple_credentials.secret)
     new_ripple_transaction.refresh_from_db()
     if new_ripple_transaction.status != new_ripple_transaction.PENDING:
         logger.error(
             'Deposit {}. Signing Ripple transaction #{} failed'.format(
-                transaction_id,
+                dash_transaction.id,
                 new_ripple_transaction.id,
             ),
         )
         dash_transaction.state = dash_transaction.FAILED
         dash_transaction.save()
-        return
+        return True
 
-    submit_task(new_ripple_transaction.pk)
+    with span('ripple.submit'):
+        submit_task(new_ripple_transaction.pk)
     new_ripple_transaction.refresh_from_db()
     if new_ripple_transaction.status != new_ripple_transaction.SUBMITTED:
         logger.error(
             'Deposit {}. Submitting Ripple transaction #{} failed'.format(
-                transaction_id,
+                dash_transaction.id,
                 new_ripple_transaction.id,
             ),
         )
         dash_transaction.state = dash_transaction.FAILED
         dash_transaction.save()
-        return
+        return True
 
     logger.info(
         'Deposit {}. Processed. Ripple transaction {}'.format(
-            transaction_id,
+            dash_transaction.id,
             new_ripple_transaction.hash,
         ),
     )
@@ -212,58 +477,99 @@ def send_ripple_transaction(transaction_id):
         new_ripple_transaction.hash
     )
     dash_transaction.save()
+    return True
 
 
-@celery_transaction_task
-def monitor_ripple_to_dash_transaction(transaction_id):
-    logger.info('Withdrawal {}. Monitoring'.format(transaction_id))
-    transaction = models.WithdrawalTransaction.objects.get(id=transaction_id)
-
+def confirm_withdrawals(transactions):
+    """
+    Marks withdrawals, which destination tags received enough Dash tokens,
+    as confirmed. Returns withdrawals that are still waiting for tokens.
+    """
+    transactions = list(transactions)
     ripple_gateway_address = models.RippleWalletCredentials.get_solo().address
+    balances = models.RippleReceivedBalance.get_received_by_destination_tags(
+        [transaction.destination_tag for transaction in transactions],
+        'DSH',
+        ripple_gateway_address,
+    )
 
-    ripple_transactions_balance = RippleTransaction.objects.filter(
-        destination_tag=transaction.destination_tag,
-        currency='DSH',
-        issuer=ripple_gateway_address,
-        status=RippleTransaction.RECEIVED,
-    ).annotate(
-        value_decimal=Cast(
-            'value',
-            DecimalField(max_digits=182, decimal_places=96),
-        ),
-    ).aggregate(Sum('value_decimal'))['value_decimal__sum']
-
-    if ripple_transactions_balance is not None:
-        ripple_transactions_balance = ripple_transactions_balance.normalize()
+    waiting_transactions = []
+    received_transaction_ids = []
+    for transaction in transactions:
+        balance = balances.get(transaction.destination_tag, 0)
+        if balance < transaction.dash_to_transfer:
+            waiting_transactions.append(transaction)
+        else:
+            received_transaction_ids.append(transaction.id)
+    if not received_transaction_ids:
+        return waiting_transactions
+
+    transaction_model = models.WithdrawalTransaction
+    # Withdrawals, which are confirmed concurrently, are not moved again.
+    for transaction in TransactionStateMachine(transaction_model).move(
+        transaction_model.objects.filter(id__in=received_transaction_ids),
+        transaction_model.INITIATED,
+        transaction_model.CONFIRMED,
+    ):
         logger.info(
             'Withdrawal {}. Received {} of {} DSH'.format(
-                transaction_id,
-                ripple_transactions_balance,
+                transaction.id,
+                balances[transaction.destination_tag],
                 transaction.get_normalized_dash_to_transfer(),
             ),
         )
-        if ripple_transactions_balance >= transaction.dash_to_transfer:
-            transaction.state = transaction.CONFIRMED
-            transaction.save(update_fields=('state',))
-            send_dash_transaction.delay(transaction_id)
-            return
-    else:
-        logger.info(
-            'Withdrawal {}. No transaction found yet'.format(transaction_id),
-        )
+        send_dash_transaction.delay(transaction.id)
+    return waiting_transactions
 
-    expiration_minutes = (
-         models.GatewaySettings.get_solo().transaction_expiration_minutes
+
+@celery_app.task
+def monitor_ripple_to_dash_transactions():
+    transactions = list(
+        models.WithdrawalTransaction.objects.filter(
+            state=models.WithdrawalTransaction.INITIATED,
+        ),
     )
-    if transaction.timestamp + timedelta(minutes=expiration_minutes) < now():
-        transaction.state = transaction.OVERDUE
-        transaction.save(update_fields=('state',))
-        logger.info('Withdrawal {}. Became overdue'.format(transaction_id))
-    else:
-        raise monitor_ripple_to_dash_transaction.retry(
-            (transaction_id,),
-            countdown=60,
+    if not transactions:
+        return
+    logger.info(
+        'Withdrawals. Monitoring {} initiated'.format(len(transactions)),
+    )
+
+    confirm_withdrawals(transactions)
+
+
+def start_dash_payment(transaction_id):
+    """
+    Marks a confirmed withdrawal as being paid and commits it. Returns the
+    withdrawal or `None` if it should not be paid.
+    """
+    with db_transaction.atomic():
+        # A duplicate task waits for the lock and finds the withdrawal sent.
+        transaction = (
+            models.WithdrawalTransaction.objects.select_for_update().get(
+                id=transaction_id,
+            )
+        )
+        if transaction.state != transaction.CONFIRMED:
+            logger.warning(
+                'Withdrawal {}. Not sent in state {}'.format(
+                    transaction_id,
+                    transaction.state,
+                ),
+            )
+            return
+        if transaction.is_dash_payment_started:
+            logger.error(
+                'Withdrawal {}. Dash transaction may be sent already, it '
+                'should be checked in the wallet'.format(transaction_id),
+            )
+            return
+        transaction.is_dash_payment_started = True
+        # A state change is not recorded.
+        models.WithdrawalTransaction.objects.filter(id=transaction_id).update(
+            is_dash_payment_started=True,
         )
+    return transaction
 
 
 @celery_transaction_task
@@ -272,13 +578,27 @@ def send_dash_transaction(transaction_id):
         'Withdrawal {}. Sending Dash transaction'.format(transaction_id),
     )
 
-    transaction = models.WithdrawalTransaction.objects.get(id=transaction_id)
+    # The marker is committed before the payment, so a retry after a
+    # failure, which follows the payment, does not pay again.
+    transaction = start_dash_payment(transaction_id)
+    if transaction is None:
+        return
 
     dash_wallet = wallet.DashWallet()
-    dash_transaction_hash = dash_wallet.send_to_address(
-        transaction.dash_address,
-        utils.get_received_amount(transaction.dash_to_transfer, 'withdrawal'),
-    )
+    try:
+        dash_transaction_hash = dash_wallet.send_to_address(
+            transaction.dash_address,
+            utils.get_received_amount(
+                transaction.dash_to_transfer,
+                'withdrawal',
+            ),
+        )
+    except wallet.UNPROCESSED_CALL_ERRORS:
+        # The payment is not made, so it is retried.
+        models.WithdrawalTransaction.objects.filter(id=transaction_id).update(
+            is_dash_payment_started=False,
+        )
+        raise
 
     logger.info(
         'Withdrawal {}. Processed. Dash transaction {}'.format(
@@ -0,0 +1,141 @@
+import logging
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.six import StringIO
+from django.utils.timezone import now
+
+from apps.core import models
+from apps.core.archive import TransactionArchiver
+
+
+class TransactionArchiverTest(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        models.GatewaySettings.get_solo()
+        models.RippleWalletCredentials.get_solo()
+        self.transactions = [
+            models.WithdrawalTransaction.objects.create(
+                dash_address='yBVKPLuULvioorP8d1Zu8hpeYE7HzVUtB9',
+                dash_to_transfer=1,
+            ) for _ in range(3)
+        ]
+        for transaction in self.transactions[:2]:
+            transaction.state = transaction.PROCESSED
+            transaction.save()
+        self.archiver = TransactionArchiver(
+            models.ArchivedWithdrawalTransaction,
+        )
+
+    def make_old(self, transactions, finished_days_ago=31):
+        transaction_ids = [transaction.id for transaction in transactions]
+        models.WithdrawalTransaction.objects.filter(
+            id__in=transaction_ids,
+        ).update(timestamp=now() - timedelta(days=31))
+        models.WithdrawalTransactionStateChange.objects.filter(
+            transaction_id__in=transaction_ids,
+        ).update(datetime=now() - timedelta(days=finished_days_ago))
+
+    def test_archives_old_finished_transactions(self):
+        self.make_old(self.transactions)
+        archived_number = self.archiver.archive(now() - timedelta(days=30))
+        self.assertEqual(archived_number, 2)
+        self.assertEqual(
+            list(models.WithdrawalTransaction.objects.values_list('id')),
+            [(self.transactions[2].id,)],
+        )
+        self.assertEqual(
+            sorted(
+                models.ArchivedWithdrawalTransaction.objects.values_list(
+                    'id',
+                    flat=True,
+                ),
+            ),
+            [self.transactions[0].id, self.transactions[1].id],
+        )
+        self.assertFalse(
+            models.WithdrawalTransactionStateChange.objects.filter(
+                transaction_id=self.transactions[0].id,
+            ).exists(),
+        )
+
+    def test_not_archives_new_finished_transactions(self):
+        self.make_old(self.transactions[1:])
+        self.archiver.archive(now() - timedelta(days=30))
+        self.assertTrue(
+            models.WithdrawalTransaction.objects.filter(
+                id=self.transactions[0].id,
+            ).exists(),
+        )
+
+    def test_not_archives_recently_finished_transactions(self):
+        self.make_old(self.transactions, finished_days_ago=1)
+        archived_number = self.archiver.archive(now() - timedelta(days=30))
+        self.assertEqual(archived_number, 0)
+
+    def test_keeps_outgoing_transaction_hash(self):
+        self.transactions[0].outgoing_dash_transaction_hash = 'hash'
+        self.transactions[0].save()
+        self.make_old(self.transactions)
+        self.archiver.archive(now() - timedelta(days=30))
+        self.assertEqual(
+            models.ArchivedWithdrawalTransaction.objects.get(
+                id=self.transactions[0].id,
+            ).outgoing_dash_transaction_hash,
+            'hash',
+        )
+
+    def test_keeps_status_of_archived_transaction(self):
+        self.make_old(self.transactions)
+        transaction = models.WithdrawalTransaction.objects.get(
+            id=self.transactions[0].id,
+        )
+        self.archiver.archive(now() - timedelta(days=30))
+        archived_transaction = (
+            models.ArchivedWithdrawalTransaction.objects.get(
+                id=transaction.id,
+            )
+        )
+        self.assertEqual(
+            archived_transaction.get_status(),
+            transaction.get_status(),
+        )
+        self.assertEqual(
+            archived_transaction.get_status_cache_key(transaction.id),
+            transaction.get_status_cache_key(transaction.id),
+        )
+
+    def test_archives_transactions_in_batches(self):
+        self.make_old(self.transactions)
+        self.archiver.batch_size = 1
+        archived_number = self.archiver.archive(now() - timedelta(days=30))
+        self.assertEqual(archived_number, 2)
+        self.assertEqual(models.WithdrawalTransaction.objects.count(), 1)
+
+
+class ArchiveTransactionsCommandTest(TestCase):
+    def setUp(self):
+        models.RippleWalletCredentials.get_solo()
+        transaction = models.WithdrawalTransaction.objects.create(
+            dash_address='yBVKPLuULvioorP8d1Zu8hpeYE7HzVUtB9',
+            dash_to_transfer=1,
+        )
+        transaction.state = transaction.OVERDUE
+        transaction.save()
+        models.WithdrawalTransaction.objects.update(
+            timestamp=now() - timedelta(days=2),
+        )
+        models.WithdrawalTransactionStateChange.objects.update(
+            datetime=now() - timedelta(days=2),
+        )
+
+    def test_archives_transactions_older_than_days(self):
+        out = StringIO()
+        call_command('archive_transactions', days=1, stdout=out)
+        self.assertFalse(models.WithdrawalTransaction.objects.exists())
+        self.assertEqual(
+            models.ArchivedWithdrawalTransaction.objects.count(),
+            1,
+        )
+        self.assertIn('Archived 1 withdrawal transactions', out.getvalue())
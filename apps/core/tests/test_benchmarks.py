@@ -0,0 +1,49 @@
+from django.test import SimpleTestCase
+
+from apps.core.benchmarks import compare_results, get_median
+
+
+class CompareResultsTest(SimpleTestCase):
+    base_results = {'benchmark': {'seconds': [1.0, 1.2, 1.1]}}
+
+    def test_get_median(self):
+        self.assertEqual(get_median([3, 1, 2]), 2)
+        self.assertEqual(get_median([4, 1, 2, 3]), 2.5)
+
+    def test_finds_regression(self):
+        self.assertEqual(
+            len(
+                compare_results(
+                    self.base_results,
+                    {'benchmark': {'seconds': [1.5, 1.6, 1.4]}},
+                    0.25,
+                ),
+            ),
+            1,
+        )
+
+    def test_ignores_overlapping_samples(self):
+        self.assertEqual(
+            compare_results(
+                self.base_results,
+                {'benchmark': {'seconds': [1.5, 1.6, 1.1]}},
+                0.25,
+            ),
+            [],
+        )
+
+    def test_ignores_growth_below_threshold(self):
+        self.assertEqual(
+            compare_results(
+                self.base_results,
+                {'benchmark': {'seconds': [1.3, 1.3, 1.3]}},
+                0.25,
+            ),
+            [],
+        )
+
+    def test_ignores_benchmarks_without_base(self):
+        self.assertEqual(
+            compare_results({}, {'benchmark': {'seconds': [2.0]}}, 0.25),
+            [],
+        )
@@ -0,0 +1,74 @@
+import logging
+import socket
+
+from mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from apps.core.circuit_breaker import CircuitBreaker, CircuitBreakerOpenError
+
+
+class CircuitBreakerTest(SimpleTestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        cache.clear()
+        self.circuit_breaker = CircuitBreaker(
+            'server',
+            lambda exception: isinstance(exception, socket.error),
+            failure_threshold=2,
+            reset_timeout=30,
+        )
+
+    def call_failing_server(self):
+        with self.assertRaises(socket.error):
+            with self.circuit_breaker.guard():
+                raise socket.error
+
+    def test_opens_after_consecutive_failures(self):
+        self.call_failing_server()
+        self.call_failing_server()
+        with self.assertRaises(CircuitBreakerOpenError):
+            with self.circuit_breaker.guard():
+                self.fail('A server is called')
+
+    def test_success_resets_failures(self):
+        self.call_failing_server()
+        with self.circuit_breaker.guard():
+            pass
+        self.call_failing_server()
+        with self.circuit_breaker.guard():
+            pass
+
+    def test_not_counts_errors_of_working_server(self):
+        for _ in range(3):
+            with self.assertRaises(ValueError):
+                with self.circuit_breaker.guard():
+                    raise ValueError
+        with self.circuit_breaker.guard():
+            pass
+
+    @patch('apps.core.circuit_breaker.time.time')
+    def test_lets_one_probe_through_after_timeout(self, patched_time):
+        patched_time.return_value = 1000
+        self.call_failing_server()
+        self.call_failing_server()
+        patched_time.return_value = 1030
+        with self.circuit_breaker.guard():
+            # Other processes are stopped while the probe is in progress.
+            with self.assertRaises(CircuitBreakerOpenError):
+                with self.circuit_breaker.guard():
+                    pass
+        with self.circuit_breaker.guard():
+            pass
+
+    @patch('apps.core.circuit_breaker.time.time')
+    def test_failed_probe_opens_again(self, patched_time):
+        patched_time.return_value = 1000
+        self.call_failing_server()
+        self.call_failing_server()
+        patched_time.return_value = 1030
+        self.call_failing_server()
+        with self.assertRaises(CircuitBreakerOpenError):
+            with self.circuit_breaker.guard():
+                pass
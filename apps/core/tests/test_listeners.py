@@ -0,0 +1,372 @@
+import json
+import logging
+import struct
+
+import websocket
+import zmq
+from mock import patch
+from ripple_api.models import Transaction as RippleTransaction
+
+from django.db import DatabaseError, IntegrityError
+from django.test import TestCase
+
+from apps.core import listeners, models
+
+
+def create_raw_transaction(output_scripts):
+    raw_transaction = bytearray(struct.pack('<I', 1))
+    # One input with an empty script.
+    raw_transaction += bytearray(b'\x01') + bytearray(36)
+    raw_transaction += bytearray(b'\x00') + bytearray(b'\xff' * 4)
+    raw_transaction += bytearray([len(output_scripts)])
+    for output_script in output_scripts:
+        raw_transaction += bytearray(struct.pack('<Q', 100000000))
+        raw_transaction += bytearray([len(output_script)]) + output_script
+    # Lock time.
+    raw_transaction += bytearray(4)
+    return bytes(raw_transaction)
+
+
+def create_p2pkh_script(address):
+    return (
+        listeners.p2pkh_script_prefix +
+        bytearray(listeners.get_address_hash(address)) +
+        listeners.p2pkh_script_suffix
+    )
+
+
+class GetOutputScriptHashesTest(TestCase):
+    def test_returns_hashes_of_p2pkh_outputs(self):
+        address = 'XekiLaxnqpFb2m4NQAEcsKutZcZgcyfo6W'
+        raw_transaction = create_raw_transaction(
+            [create_p2pkh_script(address)],
+        )
+        self.assertEqual(
+            listeners.get_output_script_hashes(raw_transaction),
+            [listeners.get_address_hash(address)],
+        )
+
+    def test_returns_hashes_of_p2sh_outputs(self):
+        script_hash = bytearray(range(20))
+        raw_transaction = create_raw_transaction(
+            [
+                listeners.p2sh_script_prefix +
+                script_hash +
+                listeners.p2sh_script_suffix,
+            ],
+        )
+        self.assertEqual(
+            listeners.get_output_script_hashes(raw_transaction),
+            [bytes(script_hash)],
+        )
+
+    def test_skips_non_standard_outputs(self):
+        raw_transaction = create_raw_transaction(
+            [
+                # OP_RETURN with some data.
+                bytearray(b'\x6a\x04data'),
+                create_p2pkh_script('Xv4Wp2HNRzjt41X17ahxT3aFCwRseoGG39'),
+            ],
+        )
+        self.assertEqual(
+            listeners.get_output_script_hashes(raw_transaction),
+            [
+                listeners.get_address_hash(
+                    'Xv4Wp2HNRzjt41X17ahxT3aFCwRseoGG39',
+                ),
+            ],
+        )
+
+
+class DashListenerTest(TestCase):
+    url = 'inproc://dashd'
+
+    @patch('apps.core.models.DashWallet.get_new_address')
+    def setUp(self, patched_get_new_address):
+        logging.disable(logging.CRITICAL)
+        models.RippleWalletCredentials.get_solo()
+        patched_get_new_address.return_value = (
+            'XekiLaxnqpFb2m4NQAEcsKutZcZgcyfo6W'
+        )
+        self.transaction = models.DepositTransaction.objects.create(
+            ripple_address='rp2PaYDxVwDvaZVLEQv7bHhoFQEyX1mEx7',
+            dash_to_transfer=1,
+        )
+        # Connections of tests are in transactions, which are rolled back.
+        close_old_connections_patcher = patch(
+            'apps.core.listeners.close_old_connections',
+        )
+        close_old_connections_patcher.start()
+        self.addCleanup(close_old_connections_patcher.stop)
+        self.context = zmq.Context()
+        # Sockets are closed before the context. Otherwise collected
+        # sockets close their handles again, which can belong to sockets of
+        # later tests.
+        self.addCleanup(self.context.destroy, linger=0)
+        self.publisher = self.context.socket(zmq.PUB)
+        self.addCleanup(self.publisher.close, linger=0)
+        self.publisher.bind(self.url)
+
+    def create_listener(self):
+        listener = listeners.DashListener(self.url, self.context)
+        self.addCleanup(listener.socket.close, linger=0)
+        return listener
+
+    def publish(self, listener, topic, body):
+        # Subscriptions reach a publisher asynchronously, so notifications
+        # are repeated until the listener gets one.
+        for _ in range(50):
+            self.publisher.send_multipart([topic, body, b'\x00' * 4])
+            if listener.socket.poll(100):
+                break
+        listener.receive(timeout=0)
+
+    @patch('apps.core.models.DashWallet.get_address_balance')
+    def test_marks_deposit_as_unconfirmed_on_its_transaction(
+        self,
+        patched_get_address_balance,
+    ):
+        patched_get_address_balance.return_value = 1
+        listener = self.create_listener()
+        self.publish(
+            listener,
+            b'rawtx',
+            create_raw_transaction(
+                [create_p2pkh_script(self.transaction.dash_address)],
+            ),
+        )
+        patched_get_address_balance.assert_called_once_with(
+            self.transaction.dash_address,
+            0,
+        )
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.state, self.transaction.UNCONFIRMED)
+
+    @patch('apps.core.models.DashWallet.get_address_balance')
+    def test_not_calls_dash_server_on_unrelated_transaction(
+        self,
+        patched_get_address_balance,
+    ):
+        listener = self.create_listener()
+        self.publish(
+            listener,
+            b'rawtx',
+            create_raw_transaction(
+                [create_p2pkh_script('Xv4Wp2HNRzjt41X17ahxT3aFCwRseoGG39')],
+            ),
+        )
+        patched_get_address_balance.assert_not_called()
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.state, self.transaction.INITIATED)
+
+    @patch('apps.core.tasks.monitor_deposits_confirmations.delay')
+    @patch('apps.core.tasks.monitor_dash_to_ripple_transactions.delay')
+    def test_launches_monitoring_deposits_on_new_block(
+        self,
+        patched_monitor_deposits_task_delay,
+        patched_monitor_confirmations_task_delay,
+    ):
+        listener = self.create_listener()
+        self.publish(listener, b'hashblock', b'\x00' * 32)
+        patched_monitor_deposits_task_delay.assert_called_once()
+        patched_monitor_confirmations_task_delay.assert_called_once()
+
+    @patch('apps.core.models.DashWallet.get_address_balance')
+    def test_survives_malformed_notifications(
+        self,
+        patched_get_address_balance,
+    ):
+        listener = self.create_listener()
+        self.publish(listener, b'rawtx', b'\x01')
+        patched_get_address_balance.assert_not_called()
+
+    def test_retries_failed_index_update(self):
+        listener = self.create_listener()
+        with patch(
+            'apps.core.listeners.get_address_hash',
+            side_effect=DatabaseError,
+        ):
+            listener.receive(timeout=0)
+        self.assertEqual(listener.deposit_ids, {})
+        listener.receive(timeout=0)
+        address_hash = listeners.get_address_hash(
+            self.transaction.dash_address,
+        )
+        self.assertEqual(
+            listener.deposit_ids,
+            {address_hash: self.transaction.id},
+        )
+
+
+class FakeRippleConnection(object):
+    """
+    Plays messages of a WebSocket connection to rippled.
+    """
+    def __init__(self, messages):
+        self.messages = [json.dumps(message) for message in messages]
+        self.sent_messages = []
+
+    def send(self, message):
+        self.sent_messages.append(json.loads(message))
+
+    def recv(self):
+        if not self.messages:
+            raise websocket.WebSocketConnectionClosedException
+        return self.messages.pop(0)
+
+    def ping(self):
+        pass
+
+
+class RippleListenerTest(TestCase):
+    url = 'ws://127.0.0.1:5006'
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.ripple_credentials = models.RippleWalletCredentials.get_solo()
+        self.ripple_credentials.address = 'rp2PaYDxVwDvaZVLEQv7bHhoFQEyX1mEx7'
+        self.ripple_credentials.save()
+        self.transaction = models.WithdrawalTransaction.objects.create(
+            dash_address='yBVKPLuULvioorP8d1Zu8hpeYE7HzVUtB9',
+            dash_to_transfer=1,
+        )
+        # Connections of tests are in transactions, which are rolled back.
+        close_old_connections_patcher = patch(
+            'apps.core.listeners.close_old_connections',
+        )
+        self.patched_close_old_connections = (
+            close_old_connections_patcher.start()
+        )
+        self.addCleanup(close_old_connections_patcher.stop)
+
+    def create_payment_message(self, validated=True):
+        return {
+            'type': 'transaction',
+            'validated': validated,
+            'ledger_index': 100,
+            'engine_result': 'tesSUCCESS',
+            'transaction': {
+                'TransactionType': 'Payment',
+                'Account': 'rDarPNJEpCnpBZSfmcquydockkePkjPGA2',
+                'Destination': self.ripple_credentials.address,
+                'DestinationTag': self.transaction.destination_tag,
+                'Amount': {
+                    'currency': 'DSH',
+                    'issuer': self.ripple_credentials.address,
+                    'value': '1',
+                },
+                'hash': 'some_hash',
+            },
+            'meta': {'TransactionResult': 'tesSUCCESS'},
+        }
+
+    def listen(self, messages):
+        connection = FakeRippleConnection(messages)
+        listener = listeners.RippleListener(self.url)
+        with patch(
+            'apps.core.listeners.websocket.create_connection',
+            return_value=connection,
+        ):
+            listener.connect()
+        with self.assertRaises(websocket.WebSocketConnectionClosedException):
+            while True:
+                listener.receive()
+        return connection
+
+    @patch('apps.core.tasks.monitor_transactions')
+    def test_subscribes_to_gateway_account_and_loads_missed_payments(
+        self,
+        patched_monitor_transactions,
+    ):
+        connection = self.listen([])
+        self.assertEqual(
+            connection.sent_messages,
+            [
+                {
+                    'command': 'subscribe',
+                    'accounts': [self.ripple_credentials.address],
+                },
+            ],
+        )
+        patched_monitor_transactions.assert_called_once_with(
+            self.ripple_credentials.address,
+        )
+
+    @patch('apps.core.tasks.send_dash_transaction.delay')
+    @patch('apps.core.tasks.monitor_transactions')
+    def test_stores_validated_payment_and_confirms_withdrawal(
+        self,
+        patched_monitor_transactions,
+        patched_send_dash_transaction_task_delay,
+    ):
+        self.listen(
+            [
+                {'type': 'response', 'status': 'success', 'result': {}},
+                self.create_payment_message(),
+            ],
+        )
+        ripple_transaction = RippleTransaction.objects.get()
+        self.assertEqual(ripple_transaction.ledger_index, 100)
+        self.assertEqual(
+            ripple_transaction.destination_tag,
+            self.transaction.destination_tag,
+        )
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.state, self.transaction.CONFIRMED)
+        patched_send_dash_transaction_task_delay.assert_called_once_with(
+            self.transaction.id,
+        )
+
+    @patch('apps.core.tasks.monitor_transactions')
+    def test_ignores_not_validated_payments(
+        self,
+        patched_monitor_transactions,
+    ):
+        self.listen([self.create_payment_message(validated=False)])
+        self.assertFalse(RippleTransaction.objects.exists())
+
+    @patch('apps.core.tasks.monitor_transactions')
+    def test_reopens_old_db_connections_before_each_message(
+        self,
+        patched_monitor_transactions,
+    ):
+        self.listen([self.create_payment_message(validated=False)] * 2)
+        self.assertEqual(self.patched_close_old_connections.call_count, 2)
+
+    @patch('apps.core.tasks.send_dash_transaction.delay')
+    @patch('apps.core.tasks.monitor_transactions')
+    def test_counts_payment_stored_concurrently_once(
+        self,
+        patched_monitor_transactions,
+        patched_send_dash_transaction_task_delay,
+    ):
+        message = self.create_payment_message()
+        filter_transactions = RippleTransaction.objects.filter
+
+        def filter_not_stored_yet(*args, **kwargs):
+            # Both copies pass the check for stored payments.
+            if 'hash' in kwargs:
+                return []
+            return filter_transactions(*args, **kwargs)
+
+        with patch.object(
+            RippleTransaction.objects,
+            'filter',
+            side_effect=filter_not_stored_yet,
+        ):
+            self.listen([message, message])
+        self.assertEqual(RippleTransaction.objects.count(), 1)
+        self.assertEqual(
+            models.RippleReceivedBalance.objects.get().received,
+            1,
+        )
+
+    def test_rejects_payment_with_stored_hash(self):
+        payment_fields = {
+            'account': 'rDarPNJEpCnpBZSfmcquydockkePkjPGA2',
+            'hash': 'some_hash',
+            'value': '1',
+        }
+        RippleTransaction.objects.create(**payment_fields)
+        with self.assertRaises(IntegrityError):
+            RippleTransaction.objects.create(**payment_fields)
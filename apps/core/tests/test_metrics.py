@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+from functools import partial
+
+from mock import patch
+from prometheus_client import REGISTRY
+from prometheus_client.core import _MmapedDict
+
+from django.test import TestCase, override_settings
+
+from apps.core import metrics, models
+from apps.core.wallet import DashWallet, dashd_circuit_breaker
+
+
+def get_samples(metric):
+    return {
+        tuple(sorted(sample[1].items())): sample[2]
+        for sample in metric.samples
+    }
+
+
+class GatewayCollectorTest(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        models.RippleWalletCredentials.get_solo()
+        for _ in range(2):
+            models.WithdrawalTransaction.objects.create(
+                dash_address='yBVKPLuULvioorP8d1Zu8hpeYE7HzVUtB9',
+                dash_to_transfer=1,
+            )
+
+    def test_collects_active_transactions_by_state(self):
+        samples = get_samples(
+            metrics.GatewayCollector.collect_active_transactions(),
+        )
+        self.assertEqual(
+            samples[
+                (
+                    ('state', 'initiated'),
+                    ('transaction_type', 'withdrawaltransaction'),
+                )
+            ],
+            2,
+        )
+        self.assertEqual(
+            samples[
+                (
+                    ('state', 'unconfirmed'),
+                    ('transaction_type', 'deposittransaction'),
+                )
+            ],
+            0,
+        )
+
+    @patch('apps.core.metrics.celery_app.connection_or_acquire')
+    def test_collects_queue_messages(self, patched_connection_or_acquire):
+        connection = (
+            patched_connection_or_acquire.return_value.__enter__.return_value
+        )
+        channel = connection.default_channel
+        channel.queue_declare.return_value.message_count = 3
+        samples = get_samples(
+            metrics.GatewayCollector.collect_queue_messages(),
+        )
+        self.assertEqual(samples[(('queue', 'payments'),)], 3)
+
+    @patch('apps.core.metrics.celery_app.connection_or_acquire')
+    def test_skips_queue_messages_if_broker_is_down(
+        self,
+        patched_connection_or_acquire,
+    ):
+        patched_connection_or_acquire.side_effect = IOError
+        self.assertEqual(
+            metrics.GatewayCollector.collect_queue_messages().samples,
+            [],
+        )
+
+    @override_settings(METRICS_DIR=None)
+    @patch('apps.core.metrics.celery_app.connection_or_acquire')
+    def test_renders_metrics(self, patched_connection_or_acquire):
+        patched_connection_or_acquire.side_effect = IOError
+        content = metrics.render_metrics()
+        self.assertIn(b'gateway_active_transactions{', content)
+        self.assertIn(b'gateway_dashd_rpc_duration_seconds', content)
+
+    @patch('apps.core.metrics.celery_app.connection_or_acquire')
+    def test_renders_metrics_of_all_containers(
+        self,
+        patched_connection_or_acquire,
+    ):
+        patched_connection_or_acquire.side_effect = IOError
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir)
+        key = json.dumps(['gateway_tests', 'gateway_tests', [], []])
+        for container, value in (('web', 1), ('worker', 2)):
+            os.mkdir(os.path.join(metrics_dir, container))
+            metric_file = _MmapedDict(
+                os.path.join(metrics_dir, container, 'counter_10.db'),
+            )
+            metric_file.write_value(key, value)
+            metric_file.close()
+
+        with self.settings(METRICS_DIR=metrics_dir):
+            content = metrics.render_metrics()
+        self.assertIn(b'gateway_tests 3.0', content)
+        self.assertIn(b'gateway_active_transactions{', content)
+
+
+class ProcessMetricsTest(TestCase):
+    def setUp(self):
+        self.metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.metrics_dir)
+        environ_patcher = patch.dict(
+            os.environ,
+            {'prometheus_multiproc_dir': self.metrics_dir},
+        )
+        environ_patcher.start()
+        self.addCleanup(environ_patcher.stop)
+
+    def create_file(self, name):
+        open(os.path.join(self.metrics_dir, name), 'w').close()
+
+    @override_settings(METRICS_DIR='/var/lib/gateway-metrics')
+    def test_clears_metrics_of_previous_processes(self):
+        self.create_file('histogram_10.db')
+        self.create_file('gauge_livesum_10.db')
+        metrics.clear_process_metrics()
+        self.assertEqual(os.listdir(self.metrics_dir), [])
+
+    @override_settings(METRICS_DIR='/var/lib/gateway-metrics')
+    def test_removes_live_gauges_of_finished_process(self):
+        self.create_file('histogram_10.db')
+        self.create_file('gauge_livesum_10.db')
+        metrics.remove_process_metrics(10)
+        self.assertEqual(os.listdir(self.metrics_dir), ['histogram_10.db'])
+
+
+class MetricsInstrumentationTest(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        models.RippleWalletCredentials.get_solo()
+        dashd_circuit_breaker.reset()
+
+    @staticmethod
+    def get_count(name, labels):
+        return REGISTRY.get_sample_value('{}_count'.format(name), labels) or 0
+
+    @patch('apps.core.wallet.rpc_connection_pool.connection')
+    def test_measures_dashd_rpc_duration(self, patched_connection):
+        get_count = partial(
+            self.get_count,
+            'gateway_dashd_rpc_duration_seconds',
+            {'method': 'getblockcount'},
+        )
+        count = get_count()
+        DashWallet().get_block_count()
+        self.assertEqual(get_count(), count + 1)
+
+    def test_measures_time_in_state_on_state_change(self):
+        get_count = partial(
+            self.get_count,
+            'gateway_transaction_state_duration_seconds',
+            {
+                'transaction_type': 'withdrawaltransaction',
+                'state': 'initiated',
+            },
+        )
+        count = get_count()
+        transaction = models.WithdrawalTransaction.objects.create(
+            dash_address='yBVKPLuULvioorP8d1Zu8hpeYE7HzVUtB9',
+            dash_to_transfer=1,
+        )
+        transaction.save()
+        self.assertEqual(get_count(), count)
+        transaction = models.WithdrawalTransaction.objects.get(
+            id=transaction.id,
+        )
+        transaction.state = transaction.CONFIRMED
+        transaction.save()
+        self.assertEqual(get_count(), count + 1)
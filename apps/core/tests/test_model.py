@@ -3,20 +3,27 @@ from __future__ import unicode_literals
 
 import uuid
 from datetime import timedelta
+from decimal import Decimal
 
 import six
 from encrypted_fields import EncryptedCharField
 from mock import patch
+from ripple_api.models import Transaction as RippleTransaction
 from solo.models import SingletonModel
 
-from django.test import TestCase
-from django.db import IntegrityError
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.db import IntegrityError, connection
 from django.utils import formats
+from django.utils.timezone import now
 
 from apps.core.models import (
+    DashAddressPool,
     DepositTransaction,
     DepositTransactionStateChange,
     GatewaySettings,
+    LocallyCachedSingletonModel,
+    RippleReceivedBalance,
     RippleWalletCredentials,
     Page,
     BaseTransaction,
@@ -52,6 +59,137 @@ class PageModelTest(TestCase):
             )
 
 
+class DashAddressPoolModelTest(TestCase):
+    def test_claim_address_returns_oldest_address(self):
+        DashAddressPool.objects.create(
+            address='XekiLaxnqpFb2m4NQAEcsKutZcZgcyfo6W',
+        )
+        DashAddressPool.objects.create(
+            address='Xv4Wp2HNRzjt41X17ahxT3aFCwRseoGG39',
+        )
+        self.assertEqual(
+            DashAddressPool.claim_address(),
+            'XekiLaxnqpFb2m4NQAEcsKutZcZgcyfo6W',
+        )
+
+    def test_claimed_address_is_removed_from_pool(self):
+        DashAddressPool.objects.create(
+            address='XekiLaxnqpFb2m4NQAEcsKutZcZgcyfo6W',
+        )
+        DashAddressPool.claim_address()
+        self.assertFalse(DashAddressPool.objects.exists())
+
+    def test_claim_address_from_empty_pool(self):
+        self.assertIsNone(DashAddressPool.claim_address())
+
+
+class LocallyCachedSingletonModelTest(TestCase):
+    def setUp(self):
+        LocallyCachedSingletonModel._local_copies.clear()
+
+    @override_settings(SOLO_LOCAL_CACHE_TIMEOUT=60)
+    def test_get_solo_uses_local_copy_without_lookups(self):
+        gateway_settings = GatewaySettings.get_solo()
+        with self.assertNumQueries(0):
+            with patch('apps.core.models.caches') as patched_caches:
+                self.assertIs(GatewaySettings.get_solo(), gateway_settings)
+        patched_caches.__getitem__.assert_not_called()
+
+    @override_settings(SOLO_LOCAL_CACHE_TIMEOUT=60)
+    def test_saving_replaces_local_copy(self):
+        GatewaySettings.get_solo()
+        GatewaySettings(transaction_expiration_minutes=10).save()
+        self.assertEqual(
+            GatewaySettings.get_solo().transaction_expiration_minutes,
+            10,
+        )
+
+    @override_settings(SOLO_LOCAL_CACHE_TIMEOUT=0)
+    def test_local_copy_is_reloaded_if_version_changes(self):
+        gateway_settings = GatewaySettings.get_solo()
+        self.assertIs(GatewaySettings.get_solo(), gateway_settings)
+        caches['default'].set(
+            GatewaySettings.get_version_cache_key(),
+            'new-version',
+            None,
+        )
+        self.assertIsNot(GatewaySettings.get_solo(), gateway_settings)
+
+
+class RippleReceivedBalanceModelTest(TestCase):
+    @staticmethod
+    def create_ripple_transaction(value, **kwargs):
+        ripple_transaction_fields = {
+            'destination_tag': 1,
+            'currency': 'DSH',
+            'issuer': 'rp2PaYDxVwDvaZVLEQv7bHhoFQEyX1mEx7',
+            'status': RippleTransaction.RECEIVED,
+        }
+        ripple_transaction_fields.update(kwargs)
+        return RippleTransaction.objects.create(
+            value=value,
+            **ripple_transaction_fields
+        )
+
+    def test_sums_received_ripple_transactions(self):
+        self.create_ripple_transaction('1.5')
+        self.create_ripple_transaction('0.25')
+        self.assertEqual(
+            RippleReceivedBalance.get_received_by_destination_tags(
+                [1],
+                'DSH',
+                'rp2PaYDxVwDvaZVLEQv7bHhoFQEyX1mEx7',
+            ),
+            {1: Decimal('1.75')},
+        )
+
+    def test_separates_destination_tags_and_issuers(self):
+        self.create_ripple_transaction('1')
+        self.create_ripple_transaction('2', destination_tag=2)
+        self.create_ripple_transaction(
+            '3',
+            issuer='rDarPNJEpCnpBZSfmcquydockkePkjPGA2',
+        )
+        self.assertEqual(
+            RippleReceivedBalance.get_received_by_destination_tags(
+                [1, 2],
+                'DSH',
+                'rp2PaYDxVwDvaZVLEQv7bHhoFQEyX1mEx7',
+            ),
+            {1: 1, 2: 2},
+        )
+
+    def test_ignores_not_received_ripple_transactions(self):
+        self.create_ripple_transaction(
+            '1',
+            status=RippleTransaction.SUBMITTED,
+        )
+        self.create_ripple_transaction('1', destination_tag=None)
+        self.assertFalse(RippleReceivedBalance.objects.exists())
+
+    def test_not_counts_ripple_transaction_twice_on_update(self):
+        ripple_transaction = self.create_ripple_transaction('1')
+        ripple_transaction.save()
+        self.assertEqual(
+            RippleReceivedBalance.get_received_by_destination_tags(
+                [1],
+                'DSH',
+                'rp2PaYDxVwDvaZVLEQv7bHhoFQEyX1mEx7',
+            ),
+            {1: 1},
+        )
+
+    def test_get_received_by_destination_tags_without_payments(self):
+        self.assertEqual(
+            RippleReceivedBalance.get_received_by_destination_tags(
+                [1],
+                'DSH',
+                'rp2PaYDxVwDvaZVLEQv7bHhoFQEyX1mEx7',
+            ),
+            {},
+        )
+
+
 class BaseTransactionModelTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -109,6 +247,21 @@ class DepositModelTest(TestCase):
         self.assertEqual(self.transaction.dash_address, self.dash_address)
         patched_get_new_address.assert_not_called()
 
+    @patch('apps.core.models.DashWallet.get_new_address')
+    def test_dash_address_is_taken_from_pool(self, patched_get_new_address):
+        DashAddressPool.objects.create(
+            address='Xv4Wp2HNRzjt41X17ahxT3aFCwRseoGG39',
+        )
+        transaction = DepositTransaction.objects.create(
+            ripple_address='rp2PaYDxVwDvaZVLEQv7bHhoFQEyX1mEx7',
+            dash_to_transfer=1,
+        )
+        self.assertEqual(
+            transaction.dash_address,
+            'Xv4Wp2HNRzjt41X17ahxT3aFCwRseoGG39',
+        )
+        patched_get_new_address.assert_not_called()
+
     def test_state_change_instance_is_created_after_save(self):
         last_state_change = DepositTransactionStateChange.objects.last()
         self.assertIsNotNone(last_state_change)
@@ -129,6 +282,7 @@ class DepositModelTest(TestCase):
 
     def test_get_state_history(self):
         self.transaction.save()
+        self.transaction.refresh_from_db()
         state_changes = DepositTransactionStateChange.objects.order_by(
             'datetime',
         ).filter(transaction=self.transaction)
@@ -146,6 +300,54 @@ class DepositModelTest(TestCase):
             expected_history,
         )
 
+    def test_get_state_history_without_queries(self):
+        self.transaction.save()
+        transaction = DepositTransaction.objects.get(id=self.transaction.id)
+        with self.assertNumQueries(0):
+            state_history = transaction.get_state_history()
+        self.assertEqual(len(state_history), 2)
+
+    def test_state_history_keeps_changes_of_other_instances(self):
+        transaction = DepositTransaction.objects.get(id=self.transaction.id)
+        stale_transaction = DepositTransaction.objects.get(
+            id=self.transaction.id,
+        )
+        transaction.state = transaction.UNCONFIRMED
+        transaction.save()
+        stale_transaction.state = stale_transaction.CONFIRMED
+        stale_transaction.save()
+        transaction.refresh_from_db()
+        self.assertEqual(len(transaction.get_state_history()), 3)
+
+    def test_claimed_address_returns_to_pool_if_deposit_is_not_saved(self):
+        # The address is used by the existing deposit.
+        DashAddressPool.objects.create(address=self.dash_address)
+        with self.assertRaises(IntegrityError):
+            DepositTransaction.objects.create(
+                ripple_address='rp2PaYDxVwDvaZVLEQv7bHhoFQEyX1mEx7',
+                dash_to_transfer=1,
+            )
+        self.assertTrue(
+            DashAddressPool.objects.filter(address=self.dash_address).exists(),
+        )
+
+    def test_dash_address_has_unique_index(self):
+        self.assertTrue(
+            DepositTransaction._meta.get_field('dash_address').unique,
+        )
+        self.assertFalse(
+            WithdrawalTransaction._meta.get_field('dash_address').unique,
+        )
+
+    @patch('apps.core.models.DashWallet.get_new_address')
+    def test_dash_address_is_unique(self, patched_get_new_address):
+        patched_get_new_address.return_value = self.dash_address
+        with self.assertRaises(IntegrityError):
+            DepositTransaction.objects.create(
+                ripple_address='rp2PaYDxVwDvaZVLEQv7bHhoFQEyX1mEx7',
+                dash_to_transfer=1,
+            )
+
 
 class WithdrawalModelTest(TestCase):
     def test_inherits_base_transaction_model(self):
@@ -186,6 +388,69 @@ class WithdrawalModelTest(TestCase):
         )
 
 
+class TransactionIndexesTest(TestCase):
+    """ Tests that monitoring queries use indexes of active states """
+
+    def get_query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                # Tests run on SQLite, where the indexes are full.
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            else:
+                # Tables of tests are too small to prefer an index.
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql, params)
+            return ' '.join(
+                six.text_type(column)
+                for row in cursor.fetchall() for column in row
+            )
+
+    def assertUsesIndex(self, queryset, index_name):
+        self.assertIn(index_name, self.get_query_plan(queryset))
+
+    def test_deposits_monitoring_queries_use_index(self):
+        for state in (
+            DepositTransaction.INITIATED,
+            DepositTransaction.UNCONFIRMED,
+        ):
+            self.assertUsesIndex(
+                DepositTransaction.objects.filter(state=state),
+                'core_deposit_active_state_idx',
+            )
+
+    def test_deposits_range_queries_use_index(self):
+        self.assertUsesIndex(
+            DepositTransaction.objects.filter(
+                state=DepositTransaction.INITIATED,
+                timestamp__lt=now(),
+            ),
+            'core_deposit_active_state_idx',
+        )
+        self.assertUsesIndex(
+            DepositTransaction.objects.filter(
+                state=DepositTransaction.INITIATED,
+                timestamp__gte=now(),
+            ).values_list('id', 'dash_address'),
+            'core_deposit_active_state_idx',
+        )
+
+    def test_withdrawals_monitoring_queries_use_index(self):
+        self.assertUsesIndex(
+            WithdrawalTransaction.objects.filter(
+                state=WithdrawalTransaction.INITIATED,
+            ),
+            'core_withdrawal_active_state_idx',
+        )
+        self.assertUsesIndex(
+            WithdrawalTransaction.objects.filter(
+                state=WithdrawalTransaction.INITIATED,
+                timestamp__lt=now(),
+            ),
+            'core_withdrawal_active_state_idx',
+        )
+
+
 class RippleWalletCredentialsModelTest(TestCase):
     def setUp(self):
         RippleWalletCredentials.get_solo()
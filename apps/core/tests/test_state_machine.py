@@ -0,0 +1,101 @@
+import logging
+
+from mock import Mock
+
+from django.db import connection
+from django.db.models.signals import post_save
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.core import models
+from apps.core.state_machine import TransactionStateMachine
+
+
+class TransactionStateMachineTest(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        models.GatewaySettings.get_solo()
+        models.RippleWalletCredentials.get_solo()
+        self.transactions = self.create_transactions(3)
+        self.state_machine = TransactionStateMachine(
+            models.WithdrawalTransaction,
+        )
+
+    @staticmethod
+    def create_transactions(number):
+        return [
+            models.WithdrawalTransaction.objects.create(
+                dash_address='yBVKPLuULvioorP8d1Zu8hpeYE7HzVUtB9',
+                dash_to_transfer=1,
+            ) for _ in range(number)
+        ]
+
+    def move(self):
+        return self.state_machine.move(
+            models.WithdrawalTransaction.objects.all(),
+            models.WithdrawalTransaction.INITIATED,
+            models.WithdrawalTransaction.OVERDUE,
+        )
+
+    def test_moves_transactions_in_from_state(self):
+        self.transactions[0].state = models.WithdrawalTransaction.PROCESSED
+        self.transactions[0].save()
+        moved_transactions = self.move()
+        self.assertEqual(
+            sorted(transaction.id for transaction in moved_transactions),
+            [self.transactions[1].id, self.transactions[2].id],
+        )
+        self.assertEqual(
+            set(
+                models.WithdrawalTransaction.objects.values_list(
+                    'state',
+                    flat=True,
+                ),
+            ),
+            {
+                models.WithdrawalTransaction.PROCESSED,
+                models.WithdrawalTransaction.OVERDUE,
+            },
+        )
+
+    def test_moves_transactions_once(self):
+        self.move()
+        self.assertEqual(self.move(), [])
+        for transaction in self.transactions:
+            self.assertEqual(transaction.state_changes.count(), 2)
+
+    def test_records_state_changes(self):
+        self.move()
+        for transaction in self.transactions:
+            transaction.refresh_from_db()
+            self.assertEqual(
+                transaction.state_changes.last().current_state,
+                transaction.get_current_state(),
+            )
+            state_history = transaction.get_state_history()
+            self.assertEqual(len(state_history), 2)
+            self.assertEqual(
+                state_history[-1]['state'],
+                transaction.get_current_state(),
+            )
+
+    def test_does_not_send_post_save_signals(self):
+        receiver = Mock()
+        post_save.connect(
+            receiver,
+            sender=models.WithdrawalTransaction,
+            weak=False,
+        )
+        try:
+            self.move()
+        finally:
+            post_save.disconnect(receiver, sender=models.WithdrawalTransaction)
+        receiver.assert_not_called()
+
+    def test_number_of_queries_does_not_depend_on_transactions_number(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.move()
+        self.create_transactions(10)
+        with CaptureQueriesContext(connection) as more_queries:
+            self.move()
+        self.assertEqual(len(more_queries), len(queries))
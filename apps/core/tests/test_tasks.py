@@ -2,16 +2,72 @@ import logging
 import socket
 from datetime import timedelta
 
+from bitcoinrpc.authproxy import JSONRPCException
+from celery.exceptions import Retry
 from mock import patch
 from ripple_api.models import Transaction as RippleTransaction
 
-from django.db.utils import OperationalError
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
 
 from apps.core import models, tasks, utils
 from gateway import celery_app
 
 
+class CeleryRoutesTest(TestCase):
+    def test_routes_tasks_to_declared_queues(self):
+        queue_names = {queue.name for queue in settings.CELERY_QUEUES}
+        for task_name, route in settings.CELERY_ROUTES.items():
+            self.assertIn(task_name, celery_app.tasks)
+            self.assertIn(route['queue'], queue_names)
+
+    def test_routes_payments_apart_from_monitoring(self):
+        self.assertEqual(
+            settings.CELERY_ROUTES[tasks.send_dash_transaction.name],
+            {'queue': 'payments'},
+        )
+        self.assertEqual(
+            settings.CELERY_ROUTES[tasks.send_ripple_transaction.name],
+            {'queue': 'payments'},
+        )
+        self.assertNotEqual(
+            settings.CELERY_ROUTES[tasks.monitor_deposits_confirmations.name],
+            {'queue': 'payments'},
+        )
+
+
+@override_settings(DASH_ADDRESS_POOL_SIZE=3)
+class RefillDashAddressPoolTaskTest(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    @patch('apps.core.models.DashWallet.get_new_addresses')
+    def test_fills_pool_up_to_its_size(self, patched_get_new_addresses):
+        patched_get_new_addresses.return_value = [
+            'Xv4Wp2HNRzjt41X17ahxT3aFCwRseoGG39',
+            'XekiLaxnqpFb2m4NQAEcsKutZcZgcyfo6W',
+        ]
+        models.DashAddressPool.objects.create(
+            address='XwSLvHCVqVtpfvZ7X9HjXgjMeSs8Hsx3WV',
+        )
+        tasks.refill_dash_address_pool.apply()
+        patched_get_new_addresses.assert_called_once_with(2)
+        self.assertEqual(models.DashAddressPool.objects.count(), 3)
+
+    @patch('apps.core.models.DashWallet.get_new_addresses')
+    def test_does_nothing_if_pool_is_full(self, patched_get_new_addresses):
+        for address in (
+            'Xv4Wp2HNRzjt41X17ahxT3aFCwRseoGG39',
+            'XekiLaxnqpFb2m4NQAEcsKutZcZgcyfo6W',
+            'XwSLvHCVqVtpfvZ7X9HjXgjMeSs8Hsx3WV',
+        ):
+            models.DashAddressPool.objects.create(address=address)
+        tasks.refill_dash_address_pool.apply()
+        patched_get_new_addresses.assert_not_called()
+
+
 class CeleryTransactionBaseTaskTest(TestCase):
     def setUp(self):
         logging.disable(logging.CRITICAL)
@@ -31,6 +87,17 @@ class CeleryTransactionBaseTaskTest(TestCase):
         transaction.refresh_from_db()
         self.assertEqual(transaction.state, transaction.FAILED)
 
+    @override_settings(TASK_RETRY_BACKOFF=10, TASK_RETRY_BACKOFF_MAX=600)
+    def test_retry_countdown_grows_exponentially_with_jitter(self):
+        for retries, maximal_countdown in ((0, 10), (3, 80), (10, 600)):
+            countdowns = [
+                tasks.CeleryTransactionBaseTask.get_retry_countdown(retries)
+                for _ in range(20)
+            ]
+            self.assertGreaterEqual(min(countdowns), 0)
+            self.assertLessEqual(max(countdowns), maximal_countdown)
+            self.assertGreater(len(set(countdowns)), 1)
+
     def test_task_on_failure_with_withdrawal(self):
         transaction = models.WithdrawalTransaction.objects.create(
             dash_address='yBVKPLuULvioorP8d1Zu8hpeYE7HzVUtB9',
@@ -42,7 +109,7 @@ class CeleryTransactionBaseTaskTest(TestCase):
         self.assertEqual(transaction.state, transaction.FAILED)
 
 
-class MonitorDashToRippleTransactionTaskTest(TestCase):
+class MonitorDashToRippleTransactionsTaskTest(TestCase):
     @patch('apps.core.models.DashWallet.get_new_address')
     def setUp(self, patched_get_new_address):
         logging.disable(logging.CRITICAL)
@@ -56,99 +123,185 @@ class MonitorDashToRippleTransactionTaskTest(TestCase):
             dash_to_transfer=1,
         )
 
-    @patch('apps.core.tasks.monitor_transaction_confirmations_number.delay')
-    @patch('apps.core.models.DashWallet.get_address_balance')
+    @patch('apps.core.models.DashWallet.get_received_by_addresses')
     def test_marks_transaction_as_unconfirmed_if_balance_positive(
         self,
-        patched_get_address_balance,
-        patched_monitor_confirmations_number_task_delay,
+        patched_get_received_by_addresses,
     ):
-        patched_get_address_balance.return_value = 1
-        tasks.monitor_dash_to_ripple_transaction.apply((self.transaction.id,))
+        patched_get_received_by_addresses.return_value = {
+            self.transaction.dash_address: 1,
+        }
+        tasks.monitor_dash_to_ripple_transactions.apply()
         self.transaction.refresh_from_db()
         self.assertEqual(self.transaction.state, self.transaction.UNCONFIRMED)
 
-    @patch('apps.core.tasks.monitor_transaction_confirmations_number.delay')
-    @patch('apps.core.models.DashWallet.get_address_balance')
-    def test_launches_monitoring_confirmations_number_if_balance_positive(
+    def test_marks_transaction_as_unconfirmed_once(self):
+        balances = {self.transaction.dash_address: 1}
+        state_changes_number = self.transaction.state_changes.count()
+        # Both runs see the transaction initiated, like concurrent ones.
+        tasks.mark_deposits_as_unconfirmed([self.transaction], balances)
+        tasks.mark_deposits_as_unconfirmed([self.transaction], balances)
+        self.assertEqual(
+            self.transaction.state_changes.count(),
+            state_changes_number + 1,
+        )
+
+    @patch('apps.core.models.DashWallet.get_received_by_addresses')
+    def test_not_changes_transaction_if_balance_is_not_enough(
+        self,
+        patched_get_received_by_addresses,
+    ):
+        patched_get_received_by_addresses.return_value = {
+            self.transaction.dash_address: 0.5,
+        }
+        tasks.monitor_dash_to_ripple_transactions.apply()
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.state, self.transaction.INITIATED)
+
+    @patch('apps.core.models.DashWallet.get_new_address')
+    @patch('apps.core.models.DashWallet.get_received_by_addresses')
+    def test_checks_balances_of_all_transactions_with_one_rpc_call(
         self,
-        patched_get_address_balance,
-        patched_monitor_confirmations_number_task_delay,
+        patched_get_received_by_addresses,
+        patched_get_new_address,
     ):
-        patched_get_address_balance.return_value = 1
-        tasks.monitor_dash_to_ripple_transaction.apply((self.transaction.id,))
-        patched_monitor_confirmations_number_task_delay.assert_called_once()
+        patched_get_new_address.return_value = (
+            'Xv4Wp2HNRzjt41X17ahxT3aFCwRseoGG39'
+        )
+        another_transaction = models.DepositTransaction.objects.create(
+            ripple_address='rp2PaYDxVwDvaZVLEQv7bHhoFQEyX1mEx7',
+            dash_to_transfer=2,
+        )
+        patched_get_received_by_addresses.return_value = {
+            self.transaction.dash_address: 1,
+            another_transaction.dash_address: 2,
+        }
+        tasks.monitor_dash_to_ripple_transactions.apply()
+        patched_get_received_by_addresses.assert_called_once_with(0)
+        another_transaction.refresh_from_db()
+        self.assertEqual(
+            another_transaction.state,
+            another_transaction.UNCONFIRMED,
+        )
 
-    @patch('apps.core.models.DashWallet.get_address_balance')
-    def test_marks_transaction_as_overdue_if_time_exceeded(
+    @patch('apps.core.models.DashWallet.get_received_by_addresses')
+    def test_not_calls_dash_server_if_no_transaction_is_initiated(
         self,
-        patched_get_address_balance,
+        patched_get_received_by_addresses,
     ):
-        patched_get_address_balance.return_value = 0
+        self.transaction.state = self.transaction.OVERDUE
+        self.transaction.save()
+        tasks.monitor_dash_to_ripple_transactions.apply()
+        patched_get_received_by_addresses.assert_not_called()
+
+
+class ExpireOverdueTransactionsTaskTest(TestCase):
+    @patch('apps.core.models.DashWallet.get_new_address')
+    def setUp(self, patched_get_new_address):
+        logging.disable(logging.CRITICAL)
+        celery_app.conf.update(CELERY_ALWAYS_EAGER=True)
+        models.RippleWalletCredentials.get_solo()
+        patched_get_new_address.return_value = (
+            'XekiLaxnqpFb2m4NQAEcsKutZcZgcyfo6W'
+        )
+        self.deposit = models.DepositTransaction.objects.create(
+            ripple_address='rp2PaYDxVwDvaZVLEQv7bHhoFQEyX1mEx7',
+            dash_to_transfer=1,
+        )
+        self.withdrawal = models.WithdrawalTransaction.objects.create(
+            dash_address='yBVKPLuULvioorP8d1Zu8hpeYE7HzVUtB9',
+            dash_to_transfer=1,
+        )
+
+    def make_overdue(self, transaction):
         gateway_settings = models.GatewaySettings.get_solo()
-        self.transaction.timestamp = (
-            self.transaction.timestamp -
+        transaction.timestamp = (
+            transaction.timestamp -
             timedelta(
                 minutes=gateway_settings.transaction_expiration_minutes + 1,
             )
         )
-        self.transaction.save()
-        tasks.monitor_dash_to_ripple_transaction.apply((self.transaction.id,))
-        self.transaction.refresh_from_db()
-        self.assertEqual(self.transaction.state, self.transaction.OVERDUE)
+        transaction.save()
 
-    @patch('apps.core.models.DashWallet.get_address_balance')
-    def test_not_marks_transaction_as_overdue_if_time_not_exceeded(
+    @patch('apps.core.models.DashWallet.get_received_by_addresses')
+    def test_marks_transactions_as_overdue_if_time_exceeded(
         self,
-        patched_get_address_balance,
+        patched_get_received_by_addresses,
     ):
-        patched_get_address_balance.return_value = 0
-        tasks.monitor_dash_to_ripple_transaction.apply((self.transaction.id,))
-        self.transaction.refresh_from_db()
-        self.assertNotEqual(self.transaction.state, self.transaction.OVERDUE)
-
-    @patch('apps.core.tasks.monitor_dash_to_ripple_transaction.retry')
-    @patch('apps.core.models.DashWallet.get_address_balance')
-    def test_retries_if_balance_is_not_positive(
+        patched_get_received_by_addresses.return_value = {}
+        self.make_overdue(self.deposit)
+        self.make_overdue(self.withdrawal)
+        tasks.expire_overdue_transactions.apply()
+        self.deposit.refresh_from_db()
+        self.assertEqual(self.deposit.state, self.deposit.OVERDUE)
+        self.withdrawal.refresh_from_db()
+        self.assertEqual(self.withdrawal.state, self.withdrawal.OVERDUE)
+
+    def test_not_marks_transactions_as_overdue_if_time_not_exceeded(self):
+        tasks.expire_overdue_transactions.apply()
+        self.deposit.refresh_from_db()
+        self.assertEqual(self.deposit.state, self.deposit.INITIATED)
+        self.withdrawal.refresh_from_db()
+        self.assertEqual(self.withdrawal.state, self.withdrawal.INITIATED)
+
+    def test_not_marks_advanced_transactions_as_overdue(self):
+        self.deposit.state = self.deposit.UNCONFIRMED
+        self.make_overdue(self.deposit)
+        tasks.expire_overdue_transactions.apply()
+        self.deposit.refresh_from_db()
+        self.assertEqual(self.deposit.state, self.deposit.UNCONFIRMED)
+
+    @patch('apps.core.models.DashWallet.get_received_by_addresses')
+    def test_marks_paid_deposit_as_unconfirmed(
         self,
-        patched_get_address_balance,
-        patched_retry,
+        patched_get_received_by_addresses,
     ):
-        patched_get_address_balance.return_value = 0
-        tasks.monitor_dash_to_ripple_transaction.apply((self.transaction.id,))
-        patched_retry.assert_called_once()
+        patched_get_received_by_addresses.return_value = {
+            self.deposit.dash_address: 1,
+        }
+        self.make_overdue(self.deposit)
+        tasks.expire_overdue_transactions.apply()
+        patched_get_received_by_addresses.assert_called_once_with(0)
+        self.deposit.refresh_from_db()
+        self.assertEqual(self.deposit.state, self.deposit.UNCONFIRMED)
 
-    @patch('apps.core.models.DashWallet')
-    @patch('apps.core.tasks.monitor_dash_to_ripple_transaction.retry')
-    @patch('apps.core.models.DashWallet.get_address_balance')
-    def test_retries_if_cannot_connect_to_db(
+    @patch('apps.core.tasks.send_dash_transaction.delay')
+    def test_confirms_paid_withdrawal(
         self,
-        patched_get_address_balance,
-        patched_retry,
-        patched_model,
+        patched_send_dash_transaction_task_delay,
     ):
-        patched_get_address_balance.return_value = 0
-        patched_model.objects.get.side_effect = OperationalError
-        tasks.monitor_dash_to_ripple_transaction.apply((self.transaction.id,))
-        patched_retry.assert_called_once()
+        RippleTransaction.objects.create(
+            destination_tag=self.withdrawal.destination_tag,
+            issuer=models.RippleWalletCredentials.get_solo().address,
+            currency='DSH',
+            status=RippleTransaction.RECEIVED,
+            hash='some_hash',
+            value='1',
+        )
+        self.make_overdue(self.withdrawal)
+        tasks.expire_overdue_transactions.apply()
+        self.withdrawal.refresh_from_db()
+        self.assertEqual(self.withdrawal.state, self.withdrawal.CONFIRMED)
+        patched_send_dash_transaction_task_delay.assert_called_once_with(
+            self.withdrawal.id,
+        )
 
-    @patch('apps.core.tasks.monitor_dash_to_ripple_transaction.retry')
-    @patch('apps.core.models.DashWallet.get_address_balance')
-    def test_retries_if_cannot_connect_to_dash_server(
+    @patch('apps.core.models.DashWallet.get_received_by_addresses')
+    def test_not_calls_dash_server_if_no_deposit_is_overdue(
         self,
-        patched_get_address_balance,
-        patched_retry,
+        patched_get_received_by_addresses,
     ):
-        patched_get_address_balance.side_effect = socket.error
-        tasks.monitor_dash_to_ripple_transaction.apply((self.transaction.id,))
-        patched_retry.assert_called_once()
+        self.make_overdue(self.withdrawal)
+        tasks.expire_overdue_transactions.apply()
+        patched_get_received_by_addresses.assert_not_called()
 
 
-class MonitorTransactionConfirmationsNumberTaskTest(TestCase):
+class MonitorDepositsConfirmationsTaskTest(TestCase):
     @patch('apps.core.models.DashWallet.get_new_address')
     def setUp(self, patched_get_new_address):
         logging.disable(logging.CRITICAL)
         celery_app.conf.update(CELERY_ALWAYS_EAGER=True)
+        cache.clear()
         models.RippleWalletCredentials.get_solo()
         patched_get_new_address.return_value = (
             'XekiLaxnqpFb2m4NQAEcsKutZcZgcyfo6W'
@@ -156,49 +309,79 @@ class MonitorTransactionConfirmationsNumberTaskTest(TestCase):
         self.transaction = models.DepositTransaction.objects.create(
             ripple_address='rp2PaYDxVwDvaZVLEQv7bHhoFQEyX1mEx7',
             dash_to_transfer=1,
+            state=models.DepositTransaction.UNCONFIRMED,
         )
 
     @patch('apps.core.tasks.send_ripple_transaction.delay')
-    @patch('apps.core.models.DashWallet.get_address_balance')
-    def test_marks_transaction_as_confirmed_if_confirmed_balance_positive(
+    @patch('apps.core.models.DashWallet.get_received_by_addresses')
+    @patch('apps.core.models.DashWallet.get_block_count')
+    def test_marks_transaction_as_confirmed_if_confirmed_balance_enough(
         self,
-        patched_get_address_balance,
+        patched_get_block_count,
+        patched_get_received_by_addresses,
         patched_send_ripple_transaction_task_delay,
     ):
-        patched_get_address_balance.return_value = 1
-        tasks.monitor_transaction_confirmations_number.apply(
-            (self.transaction.id,),
+        patched_get_block_count.return_value = 100
+        patched_get_received_by_addresses.return_value = {
+            self.transaction.dash_address: 1,
+        }
+        tasks.monitor_deposits_confirmations.apply()
+        patched_get_received_by_addresses.assert_called_once_with(
+            models.GatewaySettings.get_solo().dash_required_confirmations,
         )
         self.transaction.refresh_from_db()
         self.assertEqual(self.transaction.state, self.transaction.CONFIRMED)
+        patched_send_ripple_transaction_task_delay.assert_called_once_with(
+            self.transaction.id,
+        )
 
     @patch('apps.core.tasks.send_ripple_transaction.delay')
-    @patch('apps.core.models.DashWallet.get_address_balance')
-    def test_launches_send_ripple_transaction_if_confirmed_balance_positive(
+    @patch('apps.core.models.DashWallet.get_received_by_addresses')
+    @patch('apps.core.models.DashWallet.get_block_count')
+    def test_not_changes_transaction_if_confirmed_balance_is_not_enough(
         self,
-        patched_get_address_balance,
+        patched_get_block_count,
+        patched_get_received_by_addresses,
         patched_send_ripple_transaction_task_delay,
     ):
-        patched_get_address_balance.return_value = 1
-        tasks.monitor_transaction_confirmations_number.apply(
-            (self.transaction.id,),
-        )
-        patched_send_ripple_transaction_task_delay.assert_called_once()
+        patched_get_block_count.return_value = 100
+        patched_get_received_by_addresses.return_value = {
+            self.transaction.dash_address: 0.5,
+        }
+        tasks.monitor_deposits_confirmations.apply()
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.state, self.transaction.UNCONFIRMED)
+        patched_send_ripple_transaction_task_delay.assert_not_called()
 
-    @patch('apps.core.tasks.monitor_transaction_confirmations_number.retry')
-    @patch('apps.core.models.DashWallet.get_address_balance')
-    def test_retries_if_confirmed_balance_is_not_positive(
+    @patch('apps.core.tasks.send_ripple_transaction.delay')
+    def test_sends_ripple_transaction_once_if_runs_overlap(
         self,
-        patched_get_address_balance,
-        patched_retry,
+        patched_send_ripple_transaction_task_delay,
     ):
-        self.transaction.dash_to_transfer = 1
-        self.transaction.save()
-        patched_get_address_balance.return_value = 0
-        tasks.monitor_transaction_confirmations_number.apply(
-            (self.transaction.id,),
+        confirmed_balances = {self.transaction.dash_address: 1}
+        # Both runs see the deposit unconfirmed.
+        tasks.confirm_deposits([self.transaction.id], confirmed_balances)
+        tasks.confirm_deposits([self.transaction.id], confirmed_balances)
+        patched_send_ripple_transaction_task_delay.assert_called_once_with(
+            self.transaction.id,
         )
-        patched_retry.assert_called_once()
+
+    @patch('apps.core.models.DashWallet.get_received_by_addresses')
+    @patch('apps.core.models.DashWallet.get_block_count')
+    def test_checks_confirmations_once_per_block(
+        self,
+        patched_get_block_count,
+        patched_get_received_by_addresses,
+    ):
+        patched_get_block_count.return_value = 100
+        patched_get_received_by_addresses.return_value = {}
+        tasks.monitor_deposits_confirmations.apply()
+        tasks.monitor_deposits_confirmations.apply()
+        patched_get_received_by_addresses.assert_called_once()
+
+        patched_get_block_count.return_value = 101
+        tasks.monitor_deposits_confirmations.apply()
+        self.assertEqual(patched_get_received_by_addresses.call_count, 2)
 
 
 class SendRippleTransactionTaskTest(TestCase):
@@ -215,6 +398,7 @@ class SendRippleTransactionTaskTest(TestCase):
         self.transaction = models.DepositTransaction.objects.create(
             ripple_address='rp2PaYDxVwDvaZVLEQv7bHhoFQEyX1mEx7',
             dash_to_transfer=1,
+            state=models.DepositTransaction.CONFIRMED,
         )
 
     @staticmethod
@@ -268,6 +452,44 @@ class SendRippleTransactionTaskTest(TestCase):
         tasks.send_ripple_transaction.apply((self.transaction.id,))
         patched_retry.assert_called_once()
 
+    @patch('apps.core.tasks.send_ripple_transaction.retry')
+    @patch('apps.core.tasks.get_ripple_balance')
+    def test_retries_if_rippled_times_out(
+        self,
+        patched_get_ripple_balance,
+        patched_retry,
+    ):
+        self.addCleanup(tasks.rippled_circuit_breaker.reset)
+        patched_get_ripple_balance.side_effect = tasks.RippleApiError(
+            'Timeout',
+            '',
+            'rippled timed out',
+        )
+        patched_retry.side_effect = RuntimeError
+        tasks.send_ripple_transaction.apply((self.transaction.id,))
+        patched_retry.assert_called_once()
+        self.assertIsInstance(
+            patched_retry.call_args[1]['exc'],
+            socket.timeout,
+        )
+
+    @patch('apps.core.tasks.is_trust_set')
+    @patch('apps.core.tasks.get_ripple_balance')
+    @patch('apps.core.tasks.sign_task')
+    def test_not_sends_ripple_tokens_if_transaction_is_not_confirmed(
+        self,
+        patched_sign_task,
+        patched_get_ripple_balance,
+        patched_is_trust_set,
+    ):
+        self.transaction.state = self.transaction.PROCESSED
+        self.transaction.save()
+        tasks.send_ripple_transaction.apply((self.transaction.id,))
+        patched_is_trust_set.assert_not_called()
+        patched_sign_task.assert_not_called()
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.state, self.transaction.PROCESSED)
+
     @patch('apps.core.tasks.is_trust_set')
     @patch('apps.core.tasks.get_ripple_balance')
     @patch('apps.core.tasks.sign_task')
@@ -316,7 +538,7 @@ class SendRippleTransactionTaskTest(TestCase):
         self.assertEqual(self.transaction.state, self.transaction.FAILED)
 
 
-class MonitorRippleToDashTransactionTaskTest(TestCase):
+class MonitorRippleToDashTransactionsTaskTest(TestCase):
     def setUp(self):
         logging.disable(logging.CRITICAL)
         celery_app.conf.update(CELERY_ALWAYS_EAGER=True)
@@ -332,7 +554,7 @@ class MonitorRippleToDashTransactionTaskTest(TestCase):
             issuer=self.ripple_credentials.address,
             currency='DSH',
             status=RippleTransaction.RECEIVED,
-            hash='some_hash',
+            hash='hash{}'.format(RippleTransaction.objects.count()),
             value='1',
         )
 
@@ -342,7 +564,7 @@ class MonitorRippleToDashTransactionTaskTest(TestCase):
         patched_send_dash_transaction_task_delay,
     ):
         self.create_ripple_transaction()
-        tasks.monitor_ripple_to_dash_transaction.apply((self.transaction.id,))
+        tasks.monitor_ripple_to_dash_transactions.apply()
         self.transaction.refresh_from_db()
         self.assertEqual(self.transaction.state, self.transaction.CONFIRMED)
 
@@ -355,7 +577,7 @@ class MonitorRippleToDashTransactionTaskTest(TestCase):
         self.transaction.save()
         self.create_ripple_transaction()
         self.create_ripple_transaction()
-        tasks.monitor_ripple_to_dash_transaction.apply((self.transaction.id,))
+        tasks.monitor_ripple_to_dash_transactions.apply()
         self.transaction.refresh_from_db()
         self.assertEqual(self.transaction.state, self.transaction.CONFIRMED)
 
@@ -365,38 +587,79 @@ class MonitorRippleToDashTransactionTaskTest(TestCase):
         patched_send_dash_transaction_task_delay,
     ):
         self.create_ripple_transaction()
-        tasks.monitor_ripple_to_dash_transaction.apply(
-            (self.transaction.id,),
-        )
+        tasks.monitor_ripple_to_dash_transactions.apply()
         patched_send_dash_transaction_task_delay.assert_called_once()
 
-    def test_marks_transaction_as_overdue_if_time_exceeded(self):
-        gateway_settings = models.GatewaySettings.get_solo()
-        self.transaction.timestamp = (
-            self.transaction.timestamp -
-            timedelta(
-                minutes=gateway_settings.transaction_expiration_minutes + 1,
-            )
+    @patch('apps.core.tasks.send_dash_transaction.delay')
+    def test_launches_send_dash_transaction_once_if_runs_overlap(
+        self,
+        patched_send_dash_transaction_task_delay,
+    ):
+        self.create_ripple_transaction()
+        # Both runs see the withdrawal initiated.
+        tasks.confirm_withdrawals([self.transaction])
+        tasks.confirm_withdrawals([self.transaction])
+        patched_send_dash_transaction_task_delay.assert_called_once_with(
+            self.transaction.id,
         )
+
+    def test_not_changes_transaction_if_balance_is_not_enough(self):
+        self.transaction.dash_to_transfer = 2
         self.transaction.save()
-        tasks.monitor_ripple_to_dash_transaction.apply((self.transaction.id,))
+        self.create_ripple_transaction()
+        tasks.monitor_ripple_to_dash_transactions.apply()
         self.transaction.refresh_from_db()
-        self.assertEqual(self.transaction.state, self.transaction.OVERDUE)
+        self.assertEqual(self.transaction.state, self.transaction.INITIATED)
+
+
+class MonitorTransactionsTaskTest(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        celery_app.conf.update(CELERY_ALWAYS_EAGER=True)
+        self.ripple_credentials = models.RippleWalletCredentials.get_solo()
+        self.transaction = models.WithdrawalTransaction.objects.create(
+            dash_address='yBVKPLuULvioorP8d1Zu8hpeYE7HzVUtB9',
+            dash_to_transfer=1,
+        )
 
-    def test_not_marks_transaction_as_overdue_if_time_not_exceeded(
+    def create_ripple_transaction(self, *args):
+        return RippleTransaction.objects.create(
+            destination=self.ripple_credentials.address,
+            destination_tag=self.transaction.destination_tag,
+            issuer=self.ripple_credentials.address,
+            currency='DSH',
+            status=RippleTransaction.RECEIVED,
+            hash='some_hash',
+            value='1',
+        )
+
+    @patch('apps.core.tasks.send_dash_transaction.delay')
+    @patch('apps.core.tasks.monitor_transactions')
+    def test_confirms_withdrawal_when_its_payment_is_stored(
         self,
+        patched_monitor_transactions,
+        patched_send_dash_transaction_task_delay,
     ):
-        tasks.monitor_ripple_to_dash_transaction.apply((self.transaction.id,))
+        patched_monitor_transactions.side_effect = (
+            self.create_ripple_transaction
+        )
+        tasks.monitor_transactions_task.apply()
         self.transaction.refresh_from_db()
-        self.assertNotEqual(self.transaction.state, self.transaction.OVERDUE)
+        self.assertEqual(self.transaction.state, self.transaction.CONFIRMED)
+        patched_send_dash_transaction_task_delay.assert_called_once_with(
+            self.transaction.id,
+        )
 
-    @patch('apps.core.tasks.monitor_ripple_to_dash_transaction.retry')
-    def test_retries_if_no_ripple_transaction_is_found(
+    @patch('apps.core.tasks.send_dash_transaction.delay')
+    @patch('apps.core.tasks.monitor_transactions')
+    def test_not_checks_payments_stored_before(
         self,
-        patched_retry,
+        patched_monitor_transactions,
+        patched_send_dash_transaction_task_delay,
     ):
-        tasks.monitor_ripple_to_dash_transaction.apply((self.transaction.id,))
-        patched_retry.assert_called_once()
+        self.create_ripple_transaction()
+        tasks.monitor_transactions_task.apply()
+        patched_send_dash_transaction_task_delay.assert_not_called()
 
 
 class SendDashTransactionTaskTest(TestCase):
@@ -406,8 +669,19 @@ class SendDashTransactionTaskTest(TestCase):
         self.transaction = models.WithdrawalTransaction.objects.create(
             dash_address='yBVKPLuULvioorP8d1Zu8hpeYE7HzVUtB9',
             dash_to_transfer=1,
+            state=models.WithdrawalTransaction.CONFIRMED,
         )
 
+    @patch('apps.core.tasks.wallet.DashWallet.send_to_address')
+    def test_not_sends_dash_if_transaction_is_not_confirmed(
+        self,
+        patched_send_to_address,
+    ):
+        self.transaction.state = self.transaction.PROCESSED
+        self.transaction.save()
+        tasks.send_dash_transaction.apply((self.transaction.id,))
+        patched_send_to_address.assert_not_called()
+
     @patch('apps.core.tasks.wallet.DashWallet.send_to_address')
     def test_sends_dash_and_marks_transaction_as_processed(
         self,
@@ -428,3 +702,44 @@ class SendDashTransactionTaskTest(TestCase):
             self.transaction.outgoing_dash_transaction_hash,
             patched_send_to_address.return_value,
         )
+
+    @patch('apps.core.tasks.send_dash_transaction.retry')
+    @patch('apps.core.tasks.wallet.DashWallet.send_to_address')
+    def test_not_sends_dash_again_if_payment_is_not_saved(
+        self,
+        patched_send_to_address,
+        patched_retry,
+    ):
+        patched_send_to_address.return_value = 'hash'
+        patched_retry.side_effect = Retry
+        with patch.object(
+            models.WithdrawalTransaction,
+            'save',
+            side_effect=DatabaseError,
+        ):
+            tasks.send_dash_transaction.apply((self.transaction.id,))
+        patched_retry.assert_called_once()
+        tasks.send_dash_transaction.apply((self.transaction.id,))
+        patched_send_to_address.assert_called_once()
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.state, self.transaction.CONFIRMED)
+        self.assertTrue(self.transaction.is_dash_payment_started)
+
+    @patch('apps.core.tasks.send_dash_transaction.retry')
+    @patch('apps.core.tasks.wallet.DashWallet.send_to_address')
+    def test_retries_dash_payment_rejected_by_dashd(
+        self,
+        patched_send_to_address,
+        patched_retry,
+    ):
+        patched_send_to_address.side_effect = [
+            JSONRPCException({'code': -6, 'message': 'Insufficient funds'}),
+            'hash',
+        ]
+        patched_retry.side_effect = Retry
+        tasks.send_dash_transaction.apply((self.transaction.id,))
+        patched_retry.assert_called_once()
+        tasks.send_dash_transaction.apply((self.transaction.id,))
+        self.assertEqual(patched_send_to_address.call_count, 2)
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.state, self.transaction.PROCESSED)
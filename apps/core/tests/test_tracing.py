@@ -0,0 +1,141 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+from mock import patch
+
+from django.test import TestCase, override_settings
+
+from apps.core import models, tasks, tracing
+from gateway import celery_app
+
+
+def get_attributes(recorded_span):
+    return {
+        attribute['key']: list(attribute['value'].values())[0]
+        for attribute in recorded_span['attributes']
+    }
+
+
+@override_settings(
+    TRACING_EXPORT_URL='file:///dev/null',
+    TRACING_SAMPLE_RATE=1,
+    TRACING_SLOW_SPAN_SECONDS=5,
+)
+@patch('apps.core.tracing._get_exporter')
+class SpanTest(TestCase):
+    def get_spans(self, patched_get_exporter):
+        return [
+            call[0][0]
+            for call in patched_get_exporter.return_value.export.call_args_list
+        ]
+
+    def test_children_share_trace_of_parent(self, patched_get_exporter):
+        with tracing.span('parent', trace_id='a' * 32):
+            with tracing.span('child', attempt=1):
+                pass
+        child, parent = self.get_spans(patched_get_exporter)
+        self.assertEqual(parent['traceId'], 'a' * 32)
+        self.assertNotIn('parentSpanId', parent)
+        self.assertEqual(child['traceId'], 'a' * 32)
+        self.assertEqual(child['parentSpanId'], parent['spanId'])
+        self.assertEqual(get_attributes(child), {'attempt': '1'})
+
+    def test_records_errors(self, patched_get_exporter):
+        with self.assertRaises(ValueError):
+            with tracing.span('failing'):
+                raise ValueError
+        recorded_span, = self.get_spans(patched_get_exporter)
+        self.assertEqual(recorded_span['status']['code'], 2)
+
+    @override_settings(TRACING_SAMPLE_RATE=0)
+    def test_exports_only_slow_spans_of_not_sampled_traces(
+        self,
+        patched_get_exporter,
+    ):
+        with tracing.span('fast'):
+            pass
+        self.assertEqual(self.get_spans(patched_get_exporter), [])
+
+        with override_settings(TRACING_SLOW_SPAN_SECONDS=0):
+            with tracing.span('slow'):
+                pass
+        recorded_span, = self.get_spans(patched_get_exporter)
+        self.assertEqual(recorded_span['name'], 'slow')
+
+    @override_settings(TRACING_EXPORT_URL=None)
+    def test_is_disabled_without_export_url(self, patched_get_exporter):
+        with tracing.span('disabled'):
+            pass
+        patched_get_exporter.assert_not_called()
+
+    def test_traces_transaction_tasks(self, patched_get_exporter):
+        logging.disable(logging.CRITICAL)
+        celery_app.conf.update(CELERY_ALWAYS_EAGER=True)
+        transaction = models.WithdrawalTransaction.objects.create(
+            dash_address='yBVKPLuULvioorP8d1Zu8hpeYE7HzVUtB9',
+            dash_to_transfer=1,
+            state=models.WithdrawalTransaction.CONFIRMED,
+        )
+        with patch('apps.core.wallet.rpc_connection_pool.connection'):
+            tasks.send_dash_transaction.apply((transaction.id,))
+        dashd_span, task_span = self.get_spans(patched_get_exporter)
+        trace_id = tracing.get_trace_id(
+            models.WithdrawalTransaction,
+            transaction.id,
+        )
+        self.assertEqual(task_span['name'], 'task.send_dash_transaction')
+        self.assertEqual(task_span['traceId'], trace_id)
+        self.assertEqual(dashd_span['name'], 'dashd.sendtoaddress')
+        self.assertEqual(dashd_span['parentSpanId'], task_span['spanId'])
+
+
+class GetTraceIdTest(TestCase):
+    def test_depends_on_model_and_id(self):
+        trace_id = tracing.get_trace_id(models.WithdrawalTransaction, 1)
+        self.assertEqual(len(trace_id), 32)
+        self.assertEqual(
+            tracing.get_trace_id(models.WithdrawalTransaction, '1'),
+            trace_id,
+        )
+        self.assertNotEqual(
+            tracing.get_trace_id(models.DepositTransaction, 1),
+            trace_id,
+        )
+
+
+class SpanExporterTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_appends_spans_to_file(self):
+        path = os.path.join(self.directory, 'traces.jsonl')
+        exporter = tracing.SpanExporter('file://{}'.format(path))
+        exporter.write([{'name': 'first'}])
+        exporter.write([{'name': 'second'}])
+        with open(path) as traces_file:
+            requests = [json.loads(line) for line in traces_file]
+        self.assertEqual(
+            [
+                request['resourceSpans'][0]['scopeSpans'][0]['spans']
+                for request in requests
+            ],
+            [[{'name': 'first'}], [{'name': 'second'}]],
+        )
+
+    @patch('apps.core.tracing.requests.post')
+    def test_posts_spans_to_collector(self, patched_post):
+        exporter = tracing.SpanExporter('http://collector:4318/v1/traces')
+        exporter.write([{'name': 'first'}])
+        self.assertEqual(
+            patched_post.call_args[0][0],
+            'http://collector:4318/v1/traces',
+        )
+        request = json.loads(patched_post.call_args[1]['data'])
+        self.assertEqual(
+            request['resourceSpans'][0]['scopeSpans'][0]['spans'],
+            [{'name': 'first'}],
+        )
@@ -4,8 +4,11 @@ from django.test import TestCase
 
 from apps.core.models import GatewaySettings
 from apps.core.utils import (
+    base58check_decode,
+    get_fee_schedule,
     get_minimal_transaction_amount,
     get_received_amount,
+    is_dash_address_valid,
 )
 
 
@@ -69,3 +72,75 @@ class UtilsTest(TestCase):
             get_minimal_transaction_amount('withdrawal'),
             Decimal('0.00100504'),
         )
+
+    def test_fee_schedule_is_built_once_per_settings_version(self):
+        fee_schedule = get_fee_schedule()
+        self.assertIs(get_fee_schedule(), fee_schedule)
+
+        GatewaySettings(
+            gateway_fee_percent=Decimal('1'),
+            max_dash_miner_fee=Decimal('0.001'),
+        ).save()
+        self.assertIsNot(get_fee_schedule(), fee_schedule)
+        self.assertEqual(
+            get_received_amount('1', 'deposit'),
+            Decimal('0.99'),
+        )
+
+    def test_fee_schedule_memoizes_rounded_amounts(self):
+        received_amount = get_received_amount('1.123456789', 'deposit')
+        self.assertIs(
+            get_received_amount('1.123456781', 'deposit'),
+            received_amount,
+        )
+
+
+class DashAddressTest(TestCase):
+    def test_base58check_decode(self):
+        self.assertEqual(
+            base58check_decode('XpfDswbtmibY3xfLaBnBvG8r96BJZh1aPJ')[0],
+            76,
+        )
+
+    def test_base58check_decode_with_invalid_checksum(self):
+        with self.assertRaises(ValueError):
+            base58check_decode('XpfDswbtmibY3xfLaBnBvG8r96BJZh1aPK')
+
+    def test_base58check_decode_with_invalid_character(self):
+        with self.assertRaises(ValueError):
+            base58check_decode('XpfDswbtmibY3xfLaBnBvG8r96BJZh1aP0')
+
+    def test_is_dash_address_valid(self):
+        networks = ('mainnet', 'testnet')
+        for address in (
+            'XpfDswbtmibY3xfLaBnBvG8r96BJZh1aPJ',
+            '7gP2oRicAtnxyxJ971o4pjoeNpihtzVSA5',
+            'yaHpttgLDGFcPhat936axHZCRNfg5DEMby',
+            '8tPqkkcUJSBbSFiQBGo2H7d1GLVXzTsuoL',
+        ):
+            self.assertTrue(is_dash_address_valid(address, networks))
+
+    def test_is_dash_address_valid_checks_network(self):
+        self.assertFalse(
+            is_dash_address_valid(
+                'yaHpttgLDGFcPhat936axHZCRNfg5DEMby',
+                ('mainnet',),
+            ),
+        )
+        self.assertFalse(
+            is_dash_address_valid(
+                'XpfDswbtmibY3xfLaBnBvG8r96BJZh1aPJ',
+                ('testnet',),
+            ),
+        )
+
+    def test_is_dash_address_valid_with_invalid_address(self):
+        networks = ('mainnet', 'testnet')
+        for address in (
+            'Invalid address',
+            'XpfDswbtmibY3xfLaBnBvG8r96BJZh1aPK',
+            'rp2PaYDxVwDvaZVLEQv7bHhoFQEyX1mEx7',
+            '1' * 34,
+            'X' * 1000,
+        ):
+            self.assertFalse(is_dash_address_valid(address, networks))
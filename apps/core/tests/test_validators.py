@@ -0,0 +1,43 @@
+from mock import patch
+
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, override_settings
+
+from apps.core.validators import dash_address_validator
+
+
+class DashAddressValidatorTest(SimpleTestCase):
+    @patch('apps.core.validators.DashWallet.check_address_valid')
+    def test_validates_address_without_dash_server(
+        self,
+        patched_check_address_valid,
+    ):
+        dash_address_validator('yaHpttgLDGFcPhat936axHZCRNfg5DEMby')
+        with self.assertRaises(ValidationError):
+            dash_address_validator('Invalid address')
+        patched_check_address_valid.assert_not_called()
+
+    @override_settings(DASH_ADDRESS_NETWORK='testnet')
+    def test_rejects_address_of_another_network(self):
+        with self.assertRaises(ValidationError):
+            dash_address_validator('XpfDswbtmibY3xfLaBnBvG8r96BJZh1aPJ')
+
+    @override_settings(DASHD_STRICT_ADDRESS_VALIDATION=True)
+    @patch('apps.core.validators.DashWallet.check_address_valid')
+    def test_strict_validation(self, patched_check_address_valid):
+        patched_check_address_valid.return_value = False
+        with self.assertRaises(ValidationError):
+            dash_address_validator('yaHpttgLDGFcPhat936axHZCRNfg5DEMby')
+        patched_check_address_valid.assert_called_once_with(
+            'yaHpttgLDGFcPhat936axHZCRNfg5DEMby',
+        )
+
+    @override_settings(DASHD_STRICT_ADDRESS_VALIDATION=True)
+    @patch('apps.core.validators.DashWallet.check_address_valid')
+    def test_strict_validation_skips_dash_server_for_invalid_address(
+        self,
+        patched_check_address_valid,
+    ):
+        with self.assertRaises(ValidationError):
+            dash_address_validator('Invalid address')
+        patched_check_address_valid.assert_not_called()
@@ -1,18 +1,22 @@
 from __future__ import unicode_literals
 
 import json
+import time
 from decimal import Decimal
 
 from mock import patch
 
+from django.core.cache import cache
 from django.core.serializers.json import DjangoJSONEncoder
 from django.core.urlresolvers import reverse
 from django.http.response import JsonResponse
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.test.client import Client, RequestFactory
 
 from apps.core.models import (
+    ArchivedWithdrawalTransaction,
     DepositTransaction,
+    GatewaySettings,
     Page,
     RippleWalletCredentials,
     WithdrawalTransaction,
@@ -23,6 +27,7 @@ from apps.core.views import (
     WithdrawalSubmitApiView,
     DepositStatusApiView,
     WithdrawalStatusApiView,
+    WithdrawalStatusEventsApiView,
 )
 
 
@@ -75,13 +80,8 @@ class DepositSubmitApiViewTest(TestCase):
     def setUp(self):
         RippleWalletCredentials.get_solo()
 
-    @patch('apps.core.views.monitor_dash_to_ripple_transaction.apply_async')
     @patch('apps.core.models.DashWallet.get_new_address')
-    def test_view_with_valid_form(
-            self,
-            patched_get_new_address,
-            patched_monitor_task,
-    ):
+    def test_view_with_valid_form(self, patched_get_new_address):
         patched_get_new_address.return_value = ''
         request = self.factory.post(
             '',
@@ -91,7 +91,6 @@ class DepositSubmitApiViewTest(TestCase):
             },
         )
         response = DepositSubmitApiView.as_view()(request)
-        patched_monitor_task.assert_called_once()
         self.assertIsInstance(response, JsonResponse)
         self.assertEqual(response.status_code, 200)
         response_content = json.loads(response.content)
@@ -121,31 +120,21 @@ class WithdrawalSubmitApiViewTest(TestCase):
     def setUp(self):
         RippleWalletCredentials.get_solo()
 
-    @patch('apps.core.views.monitor_ripple_to_dash_transaction.apply_async')
-    @patch('apps.core.models.DashWallet.check_address_valid')
-    def test_view_with_valid_form(
-        self,
-        patched_check_address_valid,
-        patched_monitor_task,
-    ):
-        patched_check_address_valid.return_value = True
+    def test_view_with_valid_form(self):
         request = self.factory.post(
             '',
             {
-                'dash_address': 'yBVKPLuULvioorP8d1Zu8hpeYE7HzVUtB9',
+                'dash_address': 'yaHpttgLDGFcPhat936axHZCRNfg5DEMby',
                 'dash_to_transfer': 1,
             },
         )
         response = WithdrawalSubmitApiView.as_view()(request)
-        patched_monitor_task.assert_called_once()
         self.assertIsInstance(response, JsonResponse)
         self.assertEqual(response.status_code, 200)
         response_content = json.loads(response.content)
         self.assertIn('status_url', response_content)
 
-    @patch('apps.core.models.DashWallet.check_address_valid')
-    def test_view_with_invalid_form(self, patched_check_address_valid):
-        patched_check_address_valid.return_value = False
+    def test_view_with_invalid_form(self):
         request = self.factory.post('', {'dash_address': 'Invalid address'})
         response = WithdrawalSubmitApiView.as_view()(request)
         self.assertIsInstance(response, JsonResponse)
@@ -217,6 +206,144 @@ class WithdrawalStatusApiViewTest(TestCase):
         )
         self.assertEqual(response.content, expected_response_content)
 
+    def test_view_returns_cached_status_without_queries(self):
+        transaction = WithdrawalTransaction.objects.create(
+            dash_address='yBVKPLuULvioorP8d1Zu8hpeYE7HzVUtB9',
+            dash_to_transfer=1,
+        )
+        request = self.factory.get('')
+        with self.assertNumQueries(0):
+            response = WithdrawalStatusApiView.as_view()(
+                request,
+                transaction.id,
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_view_returns_304_if_status_is_not_changed(self):
+        transaction = WithdrawalTransaction.objects.create(
+            dash_address='yBVKPLuULvioorP8d1Zu8hpeYE7HzVUtB9',
+            dash_to_transfer=1,
+        )
+        response = WithdrawalStatusApiView.as_view()(
+            self.factory.get(''),
+            transaction.id,
+        )
+        request = self.factory.get('', HTTP_IF_NONE_MATCH=response['ETag'])
+        response = WithdrawalStatusApiView.as_view()(request, transaction.id)
+        self.assertEqual(response.status_code, 304)
+
+    def test_view_changes_etag_on_state_change(self):
+        transaction = WithdrawalTransaction.objects.create(
+            dash_address='yBVKPLuULvioorP8d1Zu8hpeYE7HzVUtB9',
+            dash_to_transfer=1,
+        )
+        response = WithdrawalStatusApiView.as_view()(
+            self.factory.get(''),
+            transaction.id,
+        )
+        transaction.state = transaction.CONFIRMED
+        transaction.save()
+        request = self.factory.get('', HTTP_IF_NONE_MATCH=response['ETag'])
+        response = WithdrawalStatusApiView.as_view()(request, transaction.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            json.loads(response.content)['state'],
+            transaction.get_current_state(),
+        )
+
+    def test_view_returns_status_of_archived_transaction(self):
+        transaction = WithdrawalTransaction.objects.create(
+            dash_address='yBVKPLuULvioorP8d1Zu8hpeYE7HzVUtB9',
+            dash_to_transfer=1,
+        )
+        transaction.state = transaction.PROCESSED
+        transaction.save()
+        transaction.refresh_from_db()
+        ArchivedWithdrawalTransaction.from_transaction(transaction).save()
+        expected_response_content = json.dumps(
+            transaction.get_status(),
+            cls=DjangoJSONEncoder,
+        )
+        transaction_id = transaction.id
+        transaction.delete()
+        cache.clear()
+        response = WithdrawalStatusApiView.as_view()(
+            self.factory.get(''),
+            transaction_id,
+        )
+        self.assertEqual(response.content, expected_response_content)
+
+
+class FakePubSub(object):
+    def __init__(self, messages):
+        self.messages = messages
+        self.is_closed = False
+
+    def get_message(self, timeout):
+        if self.messages:
+            return self.messages.pop(0)
+        time.sleep(0.01)
+
+    def close(self):
+        self.is_closed = True
+
+
+@override_settings(STATUS_EVENTS_TIMEOUT=0.1)
+class WithdrawalStatusEventsApiViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.factory = RequestFactory()
+
+    def setUp(self):
+        self.transaction = WithdrawalTransaction.objects.create(
+            dash_address='yBVKPLuULvioorP8d1Zu8hpeYE7HzVUtB9',
+            dash_to_transfer=1,
+        )
+
+    @override_settings(STATUS_EVENTS_REDIS_URL=None)
+    def test_view_streams_current_status(self):
+        response = WithdrawalStatusEventsApiView.as_view()(
+            self.factory.get(''),
+            self.transaction.id,
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        etag, content = self.transaction.cache_status()
+        self.assertEqual(
+            b''.join(response.streaming_content).decode('utf-8'),
+            'id: {}\nretry: 10000\ndata: {}\n\n'.format(etag, content),
+        )
+
+    @override_settings(STATUS_EVENTS_REDIS_URL=None)
+    def test_view_skips_status_known_by_browser(self):
+        etag, _ = self.transaction.cache_status()
+        response = WithdrawalStatusEventsApiView.as_view()(
+            self.factory.get('', HTTP_LAST_EVENT_ID=etag),
+            self.transaction.id,
+        )
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+    @patch('apps.core.views.events.subscribe')
+    def test_view_streams_published_statuses(self, patched_subscribe):
+        pubsub = FakePubSub(
+            [None, {'data': '"new-etag" {"state": "New state"}'}],
+        )
+        patched_subscribe.return_value = pubsub
+        etag, _ = self.transaction.cache_status()
+        response = WithdrawalStatusEventsApiView.as_view()(
+            self.factory.get('', HTTP_LAST_EVENT_ID=etag),
+            self.transaction.id,
+        )
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(
+            content.startswith(
+                ':\n\n'
+                'id: "new-etag"\nretry: 10000\n'
+                'data: {"state": "New state"}\n\n',
+            ),
+        )
+        self.assertTrue(pubsub.is_closed)
+
 
 class GetReceivedAmountApiViewTest(TestCase):
     @classmethod
@@ -258,3 +385,72 @@ class GetReceivedAmountApiViewTest(TestCase):
             )
             self.assertEqual(response.status_code, 200)
             self.assertEqual(response.content, '{"received_amount": "99"}')
+            self.assertIn('public', response['Cache-Control'])
+            self.assertIn('max-age=60', response['Cache-Control'])
+
+
+class GetReceivedAmountsApiViewTest(TestCase):
+    def setUp(self):
+        GatewaySettings(
+            gateway_fee_percent=Decimal('0.5'),
+            max_dash_miner_fee=Decimal('0.001'),
+        ).save()
+
+    def post(self, items):
+        return self.client.post(
+            reverse('get-received-amounts'),
+            json.dumps(items),
+            content_type='application/json',
+        )
+
+    def test_view_quotes_all_amounts(self):
+        response = self.post(
+            [
+                {'amount': '1', 'transaction_type': 'deposit'},
+                {'amount': 1.1, 'transaction_type': 'withdrawal'},
+            ],
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            json.loads(response.content),
+            {
+                'quotes': [
+                    {
+                        'received_amount': '0.99500000',
+                        'minimal_amount': '0.00000002',
+                    },
+                    {
+                        'received_amount': '1.09350000',
+                        'minimal_amount': '0.00100504',
+                    },
+                ],
+            },
+        )
+
+    def test_view_returns_400_with_invalid_item(self):
+        for item in (
+            {'amount': '1'},
+            {'amount': '9.9.9', 'transaction_type': 'deposit'},
+            {'amount': '1', 'transaction_type': 'undefined'},
+            {'amount': True, 'transaction_type': 'deposit'},
+            '1',
+        ):
+            response = self.post(
+                [{'amount': '1', 'transaction_type': 'deposit'}, item],
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(
+                json.loads(response.content),
+                {'error': 'Item 1 is not valid'},
+            )
+
+    def test_view_returns_400_without_array(self):
+        response = self.post({'amount': '1', 'transaction_type': 'deposit'})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(RECEIVED_AMOUNTS_MAX_ITEMS=1)
+    def test_view_limits_number_of_items(self):
+        response = self.post(
+            [{'amount': '1', 'transaction_type': 'deposit'}] * 2,
+        )
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,221 @@
+"""
+Spans of the deposit and withdrawal pipelines in the OpenTelemetry (OTLP)
+JSON format.
+
+All spans of a transaction share a trace ID derived from the transaction ID,
+so spans recorded by web servers, Celery workers and listeners are joined
+without passing a context between them. Traces are sampled by their IDs, so
+a transaction is traced completely or not at all. Spans slower than
+`TRACING_SLOW_SPAN_SECONDS` are exported even if their traces are not
+sampled.
+"""
+import binascii
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+import requests
+import six
+from six.moves import queue
+
+from django.conf import settings
+
+logger = logging.getLogger('gateway')
+
+_local = threading.local()
+
+
+def get_trace_id(transaction_model, transaction_id):
+    return hashlib.md5(
+        '{}:{}'.format(
+            transaction_model._meta.model_name,
+            transaction_id,
+        ).encode('utf-8'),
+    ).hexdigest()
+
+
+def _generate_id(size):
+    return binascii.hexlify(os.urandom(size)).decode('ascii')
+
+
+def _is_sampled(trace_id):
+    return int(trace_id[:8], 16) < settings.TRACING_SAMPLE_RATE * 0x100000000
+
+
+def _format_attribute(key, value):
+    if isinstance(value, bool):
+        formatted_value = {'boolValue': value}
+    elif isinstance(value, six.integer_types):
+        formatted_value = {'intValue': str(value)}
+    elif isinstance(value, float):
+        formatted_value = {'doubleValue': value}
+    else:
+        formatted_value = {'stringValue': six.text_type(value)}
+    return {'key': key, 'value': formatted_value}
+
+
+class SpanExporter(object):
+    """
+    Exports spans in batches from a background thread, so recording a span
+    does not wait for I/O. Spans are written as lines of OTLP JSON to a file
+    (`file://` URLs) or posted to an OTLP/HTTP collector. uWSGI runs the
+    thread only with `enable-threads`.
+    """
+    flush_interval = 1
+    max_queue_size = 10000
+
+    def __init__(self, url):
+        self.url = url
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+
+    def export(self, span):
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            # Spans are dropped rather than slowing down the pipelines.
+            pass
+
+    def _start(self):
+        with self._lock:
+            # A forked process starts its own thread.
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(self.max_queue_size)
+            thread = threading.Thread(target=self._run)
+            thread.daemon = True
+            thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            spans = [self._queue.get()]
+            time.sleep(self.flush_interval)
+            while not self._queue.empty():
+                spans.append(self._queue.get_nowait())
+            try:
+                self.write(spans)
+            except Exception:
+                logger.exception('Tracing. Cannot export spans')
+
+    @staticmethod
+    def format_request(spans):
+        return json.dumps(
+            {
+                'resourceSpans': [
+                    {
+                        'resource': {
+                            'attributes': [
+                                _format_attribute('service.name', 'gateway'),
+                            ],
+                        },
+                        'scopeSpans': [
+                            {'scope': {'name': 'gateway'}, 'spans': spans},
+                        ],
+                    },
+                ],
+            },
+            separators=(',', ':'),
+        )
+
+    def write(self, spans):
+        request = self.format_request(spans)
+        if self.url.startswith('file://'):
+            with open(self.url[len('file://'):], 'a') as traces_file:
+                traces_file.write(request + '\n')
+        else:
+            requests.post(
+                self.url,
+                data=request,
+                headers={'Content-Type': 'application/json'},
+                timeout=5,
+            ).raise_for_status()
+
+
+_exporters = {}
+
+
+def _get_exporter():
+    url = settings.TRACING_EXPORT_URL
+    if url not in _exporters:
+        _exporters[url] = SpanExporter(url)
+    return _exporters[url]
+
+
+@contextmanager
+def span(name, trace_id=None, **attributes):
+    """
+    Records a span of the code in the block. It is a child of the current
+    span unless `trace_id` is given. Yields a dict of attributes, which can
+    be extended in the block.
+    """
+    if not settings.TRACING_EXPORT_URL:
+        yield attributes
+        return
+
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    parent_trace_id, parent_span_id = stack[-1] if stack else (None, None)
+    if trace_id is None or trace_id == parent_trace_id:
+        trace_id = parent_trace_id or _generate_id(16)
+    else:
+        parent_span_id = None
+    span_id = _generate_id(8)
+
+    stack.append((trace_id, span_id))
+    start_time = time.time()
+    error = None
+    try:
+        yield attributes
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        end_time = time.time()
+        stack.pop()
+        if (
+            _is_sampled(trace_id) or
+            end_time - start_time >= settings.TRACING_SLOW_SPAN_SECONDS
+        ):
+            recorded_span = {
+                'traceId': trace_id,
+                'spanId': span_id,
+                'name': name,
+                'kind': 1,
+                'startTimeUnixNano': str(int(start_time * 1e9)),
+                'endTimeUnixNano': str(int(end_time * 1e9)),
+                'attributes': [
+                    _format_attribute(key, value)
+                    for key, value in sorted(attributes.items())
+                ],
+            }
+            if parent_span_id is not None:
+                recorded_span['parentSpanId'] = parent_span_id
+            if error is not None:
+                recorded_span['status'] = {
+                    'code': 2,
+                    'message': repr(error),
+                }
+            _get_exporter().export(recorded_span)
+
+
+def traced(name):
+    """
+    Records spans of calls of the decorated function.
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,48 +1,126 @@
+import hashlib
 from decimal import Decimal, ROUND_DOWN, ROUND_UP
 
 from django.apps import apps
+from django.utils.lru_cache import lru_cache
 
 dash_minimal = Decimal('0.00000001')
 
+base58_alphabet = (
+    '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+)
+# Version bytes of P2PKH and P2SH addresses.
+dash_address_versions = {
+    'mainnet': (76, 16),
+    'testnet': (140, 19),
+}
 
-def get_minimal_transaction_amount(transaction_type):
+
+class FeeSchedule(object):
+    """
+    Fees of a version of gateway settings. Received amounts are memoized,
+    because the same amounts are quoted again while users type them.
+    """
+
+    def __init__(self, gateway_settings):
+        self.fee_factor = 1 - gateway_settings.gateway_fee_percent / 100
+        self.miner_fees = {
+            'deposit': 0,
+            'withdrawal': gateway_settings.max_dash_miner_fee,
+        }
+        # Round minimal amounts to 8 decimal places.
+        self.minimal_amounts = {
+            transaction_type: (
+                (dash_minimal + miner_fee) / self.fee_factor
+            ).quantize(dash_minimal, rounding=ROUND_UP)
+            for transaction_type, miner_fee in self.miner_fees.items()
+        }
+        self._get_received_amount = lru_cache(maxsize=1024)(
+            self._get_received_amount,
+        )
+
+    def get_minimal_transaction_amount(self, transaction_type):
+        return self.minimal_amounts[transaction_type]
+
+    def get_received_amount(self, amount, transaction_type):
+        # Round amount to 8 decimal places.
+        amount = Decimal(amount).quantize(dash_minimal, rounding=ROUND_DOWN)
+        return self._get_received_amount(amount, transaction_type)
+
+    def _get_received_amount(self, amount, transaction_type):
+        # Subtract fees.
+        received_amount = (
+            amount * self.fee_factor - self.miner_fees[transaction_type]
+        )
+        # Round received amount to 8 decimal places.
+        received_amount = received_amount.quantize(
+            dash_minimal,
+            rounding=ROUND_DOWN,
+        )
+        return max(received_amount, 0)
+
+
+# A tuple `(gateway_settings, fee_schedule)`.
+_fee_schedule = (None, None)
+
+
+def get_fee_schedule():
+    """
+    Returns fees of the current gateway settings. A schedule is built once
+    per version of the settings, since `get_solo` returns the same instance
+    until the settings are changed.
+    """
+    global _fee_schedule
     gateway_settings = apps.get_model('core', 'GatewaySettings').get_solo()
-    gateway_fee = gateway_settings.gateway_fee_percent / 100
-
-    minimal_amount = dash_minimal
-    # Add fees.
-    if transaction_type == 'withdrawal':
-        minimal_amount += gateway_settings.max_dash_miner_fee
-    minimal_amount /= (1 - gateway_fee)
-
-    # Round minimal amount to 8 decimal places.
-    minimal_amount = minimal_amount.quantize(
-        dash_minimal,
-        rounding=ROUND_UP,
-    )
+    scheduled_gateway_settings, fee_schedule = _fee_schedule
+    if scheduled_gateway_settings is not gateway_settings:
+        fee_schedule = FeeSchedule(gateway_settings)
+        _fee_schedule = (gateway_settings, fee_schedule)
+    return fee_schedule
+
 
-    return minimal_amount
+def get_minimal_transaction_amount(transaction_type):
+    return get_fee_schedule().get_minimal_transaction_amount(transaction_type)
 
 
 def get_received_amount(amount, transaction_type):
-    # Round amount to 8 decimal places.
-    amount = Decimal(amount).quantize(
-        dash_minimal,
-        rounding=ROUND_DOWN,
-    )
+    return get_fee_schedule().get_received_amount(amount, transaction_type)
 
-    gateway_settings = apps.get_model('core', 'GatewaySettings').get_solo()
-    gateway_fee = gateway_settings.gateway_fee_percent / 100
 
-    # Subtract fees.
-    received_amount = amount * (1 - gateway_fee)
-    if transaction_type == 'withdrawal':
-        received_amount -= gateway_settings.max_dash_miner_fee
+def base58check_decode(value):
+    """
+    Decodes a Base58Check string and returns its payload. Raises
+    `ValueError` if the string is not valid.
+    """
+    number = 0
+    for character in value:
+        number = number * 58 + base58_alphabet.index(character)
 
-    # Round received amount to 8 decimal places.
-    received_amount = received_amount.quantize(
-        dash_minimal,
-        rounding=ROUND_DOWN,
-    )
+    data = bytearray()
+    while number:
+        number, remainder = divmod(number, 256)
+        data.insert(0, remainder)
+    # Leading ones encode leading zero bytes.
+    data[0:0] = bytearray(len(value) - len(value.lstrip('1')))
+
+    payload, checksum = bytes(data[:-4]), bytes(data[-4:])
+    expected_checksum = hashlib.sha256(
+        hashlib.sha256(payload).digest(),
+    ).digest()[:4]
+    if len(data) < 5 or checksum != expected_checksum:
+        raise ValueError('Invalid Base58Check checksum')
+    return bytearray(payload)
 
-    return max(received_amount, 0)
+
+@lru_cache(maxsize=1024)
+def is_dash_address_valid(address, networks):
+    # Dash addresses are 34 characters long, longer strings are not decoded.
+    if not 25 <= len(address) <= 35:
+        return False
+    try:
+        payload = base58check_decode(address)
+    except ValueError:
+        return False
+    return len(payload) == 21 and any(
+        payload[0] in dash_address_versions[network] for network in networks
+    )
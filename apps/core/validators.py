@@ -1,17 +1,25 @@
 # -*- coding: utf-8 -*-
 
+from django.conf import settings
 from django.core.exceptions import ValidationError
 
 from ripple_api import utils as ripple_api_utils
 
 from apps.core.utils import (
     get_minimal_transaction_amount,
+    is_dash_address_valid,
 )
 from apps.core.wallet import DashWallet
 
 
 def dash_address_validator(address):
-    if not DashWallet().check_address_valid(address):
+    is_valid = is_dash_address_valid(
+        address,
+        (settings.DASH_ADDRESS_NETWORK,),
+    )
+    if is_valid and settings.DASHD_STRICT_ADDRESS_VALIDATION:
+        is_valid = DashWallet().check_address_valid(address)
+    if not is_valid:
         raise ValidationError(
             'The Dash address is not valid.',
             code='invalid',
@@ -1,29 +1,44 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import json
+import time
+from decimal import Decimal
+
+import six
+
+from django.conf import settings
+from django.db import connection
 from django.views.generic import TemplateView, View
 from django.views.generic.detail import BaseDetailView
 from django.views.generic.edit import BaseFormView
-from django.http import HttpResponseBadRequest, JsonResponse
+from django.core.cache import cache
+from django.http import (
+    HttpResponse,
+    HttpResponseBadRequest,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.decorators import method_decorator
-from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
 from django.views.decorators.vary import vary_on_headers
 
-from .utils import get_received_amount
+from . import events
+from .tracing import get_trace_id, span
+from .utils import get_fee_schedule, get_received_amount
 from .forms import DepositTransactionModelForm, WithdrawalTransactionModelForm
 from .models import (
+    ArchivedDepositTransaction,
+    ArchivedWithdrawalTransaction,
     DepositTransaction,
     GatewaySettings,
     Page,
     RippleWalletCredentials,
     WithdrawalTransaction,
 )
-from .tasks import (
-    monitor_dash_to_ripple_transaction,
-    monitor_ripple_to_dash_transaction,
-)
 
 
 class IndexView(TemplateView):
@@ -72,8 +87,14 @@ class BaseSubmitApiView(BaseFormView):
     http_method_names = ('post', 'put')
 
     def form_valid(self, form):
-        transaction = form.save()
-        self.monitor_task.apply_async((transaction.id,), countdown=30)
+        # IDs of withdrawals are unknown before they are saved, so submits
+        # are not joined with traces of transactions.
+        with span(
+            'api.submit',
+            transaction_type=form._meta.model._meta.model_name,
+        ) as attributes:
+            transaction = form.save()
+            attributes['transaction_id'] = transaction.id
         return JsonResponse(
             {
                 'status_url': reverse(
@@ -89,34 +110,123 @@ class BaseSubmitApiView(BaseFormView):
 
 class DepositSubmitApiView(BaseSubmitApiView):
     form_class = DepositTransactionModelForm
-    monitor_task = monitor_dash_to_ripple_transaction
     status_urlpattern_name = 'deposit-status'
 
 
 class WithdrawalSubmitApiView(BaseSubmitApiView):
     form_class = WithdrawalTransactionModelForm
-    monitor_task = monitor_ripple_to_dash_transaction
     status_urlpattern_name = 'withdrawal-status'
 
 
 class BaseStatusApiView(View):
+    def get_transaction(self, transaction_id):
+        try:
+            return self.model.objects.get(id=transaction_id)
+        except self.model.DoesNotExist:
+            # Finished transactions are moved to the archive over time.
+            return get_object_or_404(self.archive_model, id=transaction_id)
+
+    def get_status(self, transaction_id):
+        status = cache.get(self.model.get_status_cache_key(transaction_id))
+        if status is None:
+            status = self.get_transaction(transaction_id).cache_status()
+        return status
+
     def get(self, request, transaction_id):
-        transaction = get_object_or_404(self.model, id=transaction_id)
-        return JsonResponse(
-            {
-                'transactionId': transaction.id,
-                'state': transaction.get_current_state(),
-                'stateHistory': transaction.get_state_history(),
-            }
-        )
+        with span(
+            'api.status',
+            trace_id=get_trace_id(self.model, transaction_id),
+            transaction_id=transaction_id,
+        ):
+            etag, content = self.get_status(transaction_id)
+
+        response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        # Browsers revalidate the status with `If-None-Match` every time.
+        patch_cache_control(response, no_cache=True)
+        return get_conditional_response(request, etag=etag, response=response)
 
 
 class DepositStatusApiView(BaseStatusApiView):
     model = DepositTransaction
+    archive_model = ArchivedDepositTransaction
 
 
 class WithdrawalStatusApiView(BaseStatusApiView):
     model = WithdrawalTransaction
+    archive_model = ArchivedWithdrawalTransaction
+
+
+class BaseStatusEventsApiView(BaseStatusApiView):
+    """
+    Streams statuses of a transaction as Server-Sent Events. A connection is
+    held for `STATUS_EVENTS_TIMEOUT` seconds, then browsers reconnect. It
+    should be served by an asynchronous (gevent) worker.
+    """
+
+    def get(self, request, transaction_id):
+        # Subscribe first, so no status is missed.
+        pubsub = events.subscribe(
+            self.model.get_status_cache_key(transaction_id),
+        )
+        try:
+            status = self.get_status(transaction_id)
+        except Exception:
+            if pubsub is not None:
+                pubsub.close()
+            raise
+        response = StreamingHttpResponse(
+            self.stream(
+                pubsub,
+                status,
+                request.META.get('HTTP_LAST_EVENT_ID'),
+            ),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Disable buffering of nginx.
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @staticmethod
+    def format_event(status):
+        return 'id: {}\nretry: {}\ndata: {}\n\n'.format(
+            status[0],
+            settings.STATUS_EVENTS_RETRY_MILLISECONDS,
+            status[1],
+        )
+
+    def stream(self, pubsub, status, last_event_id):
+        if status[0] != last_event_id:
+            yield self.format_event(status)
+        if pubsub is None:
+            return
+        # Idle streams should not hold DB connections.
+        if not connection.in_atomic_block:
+            connection.close()
+        finish_time = time.time() + settings.STATUS_EVENTS_TIMEOUT
+        try:
+            while time.time() < finish_time:
+                message = pubsub.get_message(
+                    timeout=settings.STATUS_EVENTS_HEARTBEAT_INTERVAL,
+                )
+                if message is None:
+                    # A comment keeps the connection open through proxies.
+                    yield ':\n\n'
+                    continue
+                yield self.format_event(events.get_status(message))
+        finally:
+            pubsub.close()
+
+
+class DepositStatusEventsApiView(BaseStatusEventsApiView):
+    model = DepositTransaction
+    archive_model = ArchivedDepositTransaction
+
+
+class WithdrawalStatusEventsApiView(BaseStatusEventsApiView):
+    model = WithdrawalTransaction
+    archive_model = ArchivedWithdrawalTransaction
 
 
 class GetReceivedAmountApiView(View):
@@ -137,4 +247,89 @@ class GetReceivedAmountApiView(View):
         except ArithmeticError:
             return HttpResponseBadRequest()
 
-        return JsonResponse({'received_amount': received_amount})
+        response = JsonResponse({'received_amount': received_amount})
+        # Quotes change only with gateway settings.
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=settings.RECEIVED_AMOUNT_CACHE_TIMEOUT,
+        )
+        return response
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class GetReceivedAmountsApiView(View):
+    """
+    Quotes many amounts in one request. Takes a JSON array of objects
+    `{"amount": "1.5", "transaction_type": "deposit"}` and returns received
+    and minimal amounts in the same order. All amounts are quoted with the
+    same gateway settings.
+    """
+
+    @staticmethod
+    def get_quote(fee_schedule, item):
+        """
+        Returns received and minimal amounts of an item. Raises an error if
+        the item is not valid.
+        """
+        transaction_type = item['transaction_type']
+        if transaction_type not in ('deposit', 'withdrawal'):
+            raise ValueError
+        # `Decimal(True)` is 1, so booleans are not taken for amounts.
+        if isinstance(item['amount'], bool):
+            raise TypeError
+        # Amounts are formatted in fixed-point notation, e.g. "0.00000002"
+        # rather than "2E-8".
+        return {
+            'received_amount': '{:f}'.format(
+                fee_schedule.get_received_amount(
+                    item['amount'],
+                    transaction_type,
+                ),
+            ),
+            'minimal_amount': '{:f}'.format(
+                fee_schedule.get_minimal_transaction_amount(transaction_type),
+            ),
+        }
+
+    @staticmethod
+    def load_items(request):
+        """
+        Returns items of a request. Raises `ValueError` with a description
+        if they are not an array of allowed size.
+        """
+        try:
+            # Amounts in JSON numbers are not rounded to floats.
+            items = json.loads(
+                request.body.decode('utf-8'),
+                parse_float=Decimal,
+            )
+        except ValueError:
+            raise ValueError('Invalid JSON')
+        if not isinstance(items, list):
+            raise ValueError('Expected an array')
+        if len(items) > settings.RECEIVED_AMOUNTS_MAX_ITEMS:
+            raise ValueError(
+                'Expected at most {} items'.format(
+                    settings.RECEIVED_AMOUNTS_MAX_ITEMS,
+                ),
+            )
+        return items
+
+    def post(self, request):
+        try:
+            items = self.load_items(request)
+        except ValueError as e:
+            return JsonResponse({'error': six.text_type(e)}, status=400)
+
+        fee_schedule = get_fee_schedule()
+        quotes = []
+        for index, item in enumerate(items):
+            try:
+                quotes.append(self.get_quote(fee_schedule, item))
+            except (ArithmeticError, KeyError, TypeError, ValueError):
+                return JsonResponse(
+                    {'error': 'Item {} is not valid'.format(index)},
+                    status=400,
+                )
+        return JsonResponse({'quotes': quotes})
@@ -1,28 +1,185 @@
-from bitcoinrpc.authproxy import AuthServiceProxy
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from bitcoinrpc.authproxy import AuthServiceProxy, JSONRPCException
+from six.moves import http_client, queue
 
 from django.conf import settings
 
+from apps.core.circuit_breaker import CircuitBreaker, CircuitBreakerOpenError
+from apps.core.metrics import dashd_rpc_duration
+from apps.core.tracing import span
+
+
+class NoConnectionError(socket.error):
+    """
+    Raised if all connections of a pool stay in use for a timeout. A Dash
+    server is not called.
+    """
+
+
+class RPCConnectionPool(object):
+    """
+    Thread-safe pool of persistent (keep-alive) connections to a Dash server.
+
+    Connections are created lazily, at most `size` per process. A process
+    that is forked (e.g. by uWSGI or Celery) starts with an empty pool, so
+    sockets are never shared between processes.
+    """
+
+    def __init__(self, url, size, timeout, idle_timeout):
+        self.url = url
+        self.size = size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._connections = queue.LifoQueue()
+        self._connections_number = 0
+
+    def _connect(self):
+        return AuthServiceProxy(self.url, timeout=self.timeout)
+
+    def _get_released_connection(self):
+        while not self._connections.empty():
+            connection, released_at = self._connections.get_nowait()
+            # Dash server closes connections which are idle for too long.
+            if time.time() - released_at < self.idle_timeout:
+                return connection
+            self._connections_number -= 1
+
+    def _acquire(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            connection = self._get_released_connection()
+            if connection is not None:
+                return connection
+            if self._connections_number < self.size:
+                self._connections_number += 1
+                return self._connect()
+        try:
+            connection, _ = self._connections.get(timeout=self.timeout)
+        except queue.Empty:
+            raise NoConnectionError(
+                'No connection to a Dash server is available',
+            )
+        return connection
+
+    def _release(self, connection):
+        self._connections.put((connection, time.time()))
+
+    def _discard(self):
+        with self._lock:
+            self._connections_number -= 1
+
+    @contextmanager
+    def connection(self):
+        connection = self._acquire()
+        try:
+            yield connection
+        except (CircuitBreakerOpenError, JSONRPCException):
+            # The server was not called or responded with an error, the
+            # connection is healthy.
+            self._release(connection)
+            raise
+        except Exception:
+            # State of the connection is unknown, so it is not reused.
+            self._discard()
+            raise
+        self._release(connection)
+
+
+rpc_connection_pool = RPCConnectionPool(
+    settings.DASHD_URL,
+    size=settings.DASHD_RPC_POOL_SIZE,
+    timeout=settings.DASHD_RPC_TIMEOUT,
+    idle_timeout=settings.DASHD_RPC_IDLE_TIMEOUT,
+)
+
+
+def is_dashd_failure(exception):
+    # JSON-RPC errors are responses of a working server.
+    return isinstance(exception, (socket.error, http_client.HTTPException))
+
+
+dashd_circuit_breaker = CircuitBreaker('dashd', is_dashd_failure)
+
+# Errors of calls which certainly had no effect: a Dash server was not
+# called or it rejected a call.
+UNPROCESSED_CALL_ERRORS = (
+    CircuitBreakerOpenError,
+    JSONRPCException,
+    NoConnectionError,
+)
+
 
 class DashWallet(object):
     rpcuser = settings.DASHD_RPCUSER
     rpcpassword = settings.DASHD_RPCPASSWORD
     account_name = settings.DASHD_ACCOUNT_NAME
 
-    @property
-    def _rpc_connection(self):
-        return AuthServiceProxy(settings.DASHD_URL)
+    @staticmethod
+    def _call(method, *params):
+        # A busy pool of the process is not a failure of the server, so
+        # a connection is acquired outside of the circuit breaker.
+        with span('dashd.{}'.format(method)):
+            with rpc_connection_pool.connection() as rpc_connection:
+                with dashd_circuit_breaker.guard():
+                    with dashd_rpc_duration.labels(method).time():
+                        return getattr(rpc_connection, method)(*params)
+
+    @staticmethod
+    def batch(calls):
+        """
+        Sends many calls in one JSON-RPC batch request.
+
+        `calls` is an iterable of tuples `(method, param1, param2, ...)`.
+        Results are returned in the same order as calls.
+        """
+        calls = [list(call) for call in calls]
+        if not calls:
+            return []
+        with span('dashd.batch', calls=len(calls)):
+            with rpc_connection_pool.connection() as rpc_connection:
+                with dashd_circuit_breaker.guard():
+                    with dashd_rpc_duration.labels('batch').time():
+                        return rpc_connection.batch_(calls)
 
     def get_address_balance(self, address, min_confirmations):
-        return self._rpc_connection.getreceivedbyaddress(
-            address,
-            min_confirmations,
-        )
+        return self._call('getreceivedbyaddress', address, min_confirmations)
+
+    def get_received_by_addresses(self, min_confirmations):
+        return {
+            received['address']: received['amount']
+            for received in self._call(
+                'listreceivedbyaddress',
+                min_confirmations,
+            )
+        }
+
+    def get_block_count(self):
+        return self._call('getblockcount')
 
     def get_new_address(self):
-        return self._rpc_connection.getnewaddress(self.account_name)
+        return self._call('getnewaddress', self.account_name)
+
+    def get_new_addresses(self, number):
+        # Fill the key pool up to (not by) the number of addresses first,
+        # so all addresses are derived from already generated keys.
+        return self.batch(
+            [('keypoolrefill', number)] +
+            [('getnewaddress', self.account_name)] * number,
+        )[1:]
 
     def send_to_address(self, address, amount):
-        return self._rpc_connection.sendtoaddress(address, amount)
+        return self._call('sendtoaddress', address, amount)
 
     def check_address_valid(self, address):
-        return self._rpc_connection.validateaddress(address)['isvalid']
+        return self._call('validateaddress', address)['isvalid']
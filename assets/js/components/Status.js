@@ -55,17 +55,46 @@ export default class Status extends React.Component {
         );
     }
 
+    componentWillUnmount() {
+        if (this.eventSource) {
+            this.eventSource.close();
+        }
+        clearTimeout(this.timeout);
+    }
+
     getTransactionData() {
         let transactionType = this.props.transactionType.toLowerCase();
         if (transactionType === 'withdrawal') {
             transactionType = 'withdraw';
         }
-        $.getJSON(
-            `/${transactionType}/${this.props.match.params.transactionId}/status-api/`,
-        )
+        const statusUrl = `/${transactionType}/${this.props.match.params.transactionId}/`;
+        if (window.EventSource) {
+            this.listenTransactionData(statusUrl);
+            return;
+        }
+        $.getJSON(`${statusUrl}status-api/`)
           .done(data => { this.setState({transactionData: data}); })
           .fail(() => { this.setState({transactionDoesNotExists: true}); });
         // Update data every 10 seconds.
-        setTimeout(this.getTransactionData.bind(this), 10000);
+        this.timeout = setTimeout(this.getTransactionData.bind(this), 10000);
+    }
+
+    listenTransactionData(statusUrl) {
+        if (this.eventSource) {
+            return;
+        }
+        // A server pushes every new state. Browsers reconnect automatically.
+        this.eventSource = new EventSource(`${statusUrl}status-events/`);
+        this.eventSource.onmessage = event => {
+            this.setState({transactionData: JSON.parse(event.data)});
+        };
+        this.eventSource.onerror = () => {
+            if (
+                this.eventSource.readyState === EventSource.CLOSED &&
+                $.isEmptyObject(this.state.transactionData)
+            ) {
+                this.setState({transactionDoesNotExists: true});
+            }
+        };
     }
 }
@@ -3,6 +3,7 @@ from __future__ import absolute_import
 import os
 
 from celery import Celery
+from celery.signals import worker_init, worker_process_shutdown
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gateway.settings')
 
@@ -12,9 +13,53 @@ app.config_from_object('django.conf:settings')
 
 app.autodiscover_tasks()
 
+
+@worker_init.connect
+def clear_worker_metrics(**kwargs):
+    # Apps are loaded when a worker starts.
+    from apps.core.metrics import clear_process_metrics
+
+    clear_process_metrics()
+
+
+@worker_process_shutdown.connect
+def remove_worker_process_metrics(pid=None, **kwargs):
+    from apps.core.metrics import remove_process_metrics
+
+    remove_process_metrics(pid or os.getpid())
+
+
 app.conf.beat_schedule = {
     'monitor_transactions': {
         'task': 'apps.core.tasks.monitor_transactions_task',
-        'schedule': 5,
+        # Payments are stored by the `listen_rippled` command as soon as they
+        # are validated, this is a safety net.
+        'schedule': 5 * 60,
+    },
+    'monitor_dash_to_ripple_transactions': {
+        'task': 'apps.core.tasks.monitor_dash_to_ripple_transactions',
+        # Deposits are advanced by the `listen_dashd` command as soon as
+        # their transactions appear, this is a safety net.
+        'schedule': 5 * 60,
+    },
+    'monitor_deposits_confirmations': {
+        'task': 'apps.core.tasks.monitor_deposits_confirmations',
+        # The task checks confirmations only if a new block is found. The
+        # `listen_dashd` command launches it as soon as a block arrives.
+        'schedule': 30,
+    },
+    'monitor_ripple_to_dash_transactions': {
+        'task': 'apps.core.tasks.monitor_ripple_to_dash_transactions',
+        # Withdrawals are advanced by `monitor_transactions_task` as soon as
+        # their payments are stored, this is a safety net.
+        'schedule': 5 * 60,
+    },
+    'expire_overdue_transactions': {
+        'task': 'apps.core.tasks.expire_overdue_transactions',
+        'schedule': 60,
+    },
+    'refill_dash_address_pool': {
+        'task': 'apps.core.tasks.refill_dash_address_pool',
+        'schedule': 60,
     },
 }
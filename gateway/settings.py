@@ -11,10 +11,12 @@ https://docs.djangoproject.com/en/1.11/ref/settings/
 """
 
 import os
+import socket
 import sys
 import dj_database_url
 import django_cache_url
 from kombu import Exchange, Queue
+from six.moves.urllib.parse import urlparse
 
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
@@ -33,6 +35,27 @@ DASHD_URL = os.environ.get(
     'DASHD_URL',
     'http://{}:{}@127.0.0.1:19998'.format(DASHD_RPCUSER, DASHD_RPCPASSWORD),
 )
+# ZeroMQ publisher of dashd (`zmqpubrawtx` and `zmqpubhashblock` options).
+DASHD_ZMQ_URL = os.environ.get('DASHD_ZMQ_URL', 'tcp://127.0.0.1:28332')
+# Maximal number of persistent connections to dashd per process. It should
+# not exceed `rpcthreads` of your Dash node.
+DASHD_RPC_POOL_SIZE = 4
+DASHD_RPC_TIMEOUT = 30
+# Idle connections are reopened before dashd closes them
+# (see `rpcservertimeout` of your Dash node).
+DASHD_RPC_IDLE_TIMEOUT = 15
+# Number of addresses generated in advance for new deposits. It should cover
+# deposits created between runs of `refill_dash_address_pool`.
+DASH_ADDRESS_POOL_SIZE = 100
+# Network ('mainnet' or 'testnet') which addresses are accepted. It must be
+# the network of your Dash node, by default the one of its RPC port (9998 on
+# mainnet), otherwise withdrawals to other addresses fail.
+DASH_ADDRESS_NETWORK = os.environ.get(
+    'DASH_ADDRESS_NETWORK',
+    'mainnet' if urlparse(DASHD_URL).port == 9998 else 'testnet',
+)
+# Validate Dash addresses with dashd after local validation.
+DASHD_STRICT_ADDRESS_VALIDATION = False
 
 RIPPLE_API_DATA = [
     {
@@ -42,6 +65,11 @@ RIPPLE_API_DATA = [
         ),
     },
 ]
+# Used by the `listen_rippled` command to stream transactions.
+RIPPLED_WEBSOCKET_URL = os.environ.get(
+    'RIPPLED_WEBSOCKET_URL',
+    'wss://s1.ripple.com:443',
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = False
@@ -265,6 +293,21 @@ LOGGING = {
 ENCRYPTED_FIELDS_KEYDIR = os.path.join(BASE_DIR, 'fieldkeys')
 
 SOLO_CACHE = 'default'
+# Singletons are kept in memory of processes for this time (seconds) before
+# their versions in `SOLO_CACHE` are checked.
+SOLO_LOCAL_CACHE_TIMEOUT = 5
+# Statuses of transactions are rendered on state changes. They are rendered
+# again after this time (seconds) to reflect changes of gateway settings.
+STATUS_API_CACHE_TIMEOUT = 60
+# Browsers and CDNs reuse received amounts for this time (seconds), so
+# changes of fees are shown to users with this delay.
+RECEIVED_AMOUNT_CACHE_TIMEOUT = 60
+# Maximal number of amounts quoted by one request to
+# `/get-received-amounts/`.
+RECEIVED_AMOUNTS_MAX_ITEMS = 1000
+# Transactions are moved to archive tables by the `archive_transactions`
+# command after this time (days) since they were finished.
+TRANSACTION_ARCHIVE_DAYS = 30
 
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL')
 
@@ -273,6 +316,37 @@ REDIS_PORT = 6379
 REDIS_DB = 0
 REDIS_HOST = os.environ.get('REDIS_PORT_6379_TCP_ADDR', 'redis')
 
+# Statuses of transactions are published to Redis to be streamed to
+# browsers. Browsers poll statuses if it is not set.
+STATUS_EVENTS_REDIS_URL = os.environ.get('REDIS_URL')
+STATUS_EVENTS_TIMEOUT = 5 * 60
+STATUS_EVENTS_HEARTBEAT_INTERVAL = 15
+# Browsers reconnect to a stream after this time.
+STATUS_EVENTS_RETRY_MILLISECONDS = 10000
+
+# Metrics of processes are shared through files in a directory (volume)
+# mounted by every container. Each container writes to its own
+# subdirectory, `/metrics/` reads all of them. Without it, `/metrics/`
+# shows metrics of a process that serves the request.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+if METRICS_DIR:
+    # `prometheus_client` reads the variable on import.
+    os.environ.setdefault(
+        'prometheus_multiproc_dir',
+        os.path.join(METRICS_DIR, socket.gethostname()),
+    )
+    if not os.path.isdir(os.environ['prometheus_multiproc_dir']):
+        os.makedirs(os.environ['prometheus_multiproc_dir'])
+
+# Spans are exported in the OTLP JSON format to a file
+# (`file:///path/to/traces.jsonl`) or to an OTLP/HTTP collector
+# (`http://collector:4318/v1/traces`). Tracing is disabled without it.
+TRACING_EXPORT_URL = os.environ.get('TRACING_EXPORT_URL')
+# Share of transactions which are traced.
+TRACING_SAMPLE_RATE = float(os.environ.get('TRACING_SAMPLE_RATE', 0.01))
+# Spans longer than this (seconds) are exported even if not sampled.
+TRACING_SLOW_SPAN_SECONDS = 5
+
 RABBIT_HOSTNAME = os.environ.get('RABBIT_PORT_5672_TCP', 'rabbit')
 
 if RABBIT_HOSTNAME.startswith('tcp://'):
@@ -297,11 +371,30 @@ BROKER_CONNECTION_TIMEOUT = 10
 
 # Celery configuration
 
-# configure queues, currently we have only one
+# Tasks which call different servers are consumed by separate workers (see
+# the Makefile), so a stall of one server does not delay the rest.
 CELERY_DEFAULT_QUEUE = 'default'
 CELERY_QUEUES = (
+    # Bookkeeping which touches only the DB.
     Queue('default', Exchange('default'), routing_key='default'),
+    # Monitoring and expiration of transactions which call a Dash server.
+    Queue('dash', Exchange('dash'), routing_key='dash'),
+    # Ingestion of Ripple payments and monitoring of withdrawals.
+    Queue('ripple', Exchange('ripple'), routing_key='ripple'),
+    # Outgoing Dash and Ripple payments.
+    Queue('payments', Exchange('payments'), routing_key='payments'),
 )
+CELERY_ROUTES = {
+    'apps.core.tasks.monitor_dash_to_ripple_transactions': {'queue': 'dash'},
+    'apps.core.tasks.monitor_deposits_confirmations': {'queue': 'dash'},
+    # Balances of overdue deposits are checked before they expire.
+    'apps.core.tasks.expire_overdue_transactions': {'queue': 'dash'},
+    'apps.core.tasks.refill_dash_address_pool': {'queue': 'dash'},
+    'apps.core.tasks.monitor_transactions_task': {'queue': 'ripple'},
+    'apps.core.tasks.monitor_ripple_to_dash_transactions': {'queue': 'ripple'},
+    'apps.core.tasks.send_ripple_transaction': {'queue': 'payments'},
+    'apps.core.tasks.send_dash_transaction': {'queue': 'payments'},
+}
 
 # Sensible settings for celery
 CELERY_ALWAYS_EAGER = False
@@ -329,6 +422,18 @@ CELERYD_HIJACK_ROOT_LOGGER = False
 CELERYD_PREFETCH_MULTIPLIER = 1
 CELERYD_MAX_TASKS_PER_CHILD = 1000
 
+# Transaction tasks which cannot connect to a server are retried after a
+# random delay up to `TASK_RETRY_BACKOFF * 2 ** retries` seconds, but not
+# longer than `TASK_RETRY_BACKOFF_MAX` seconds.
+TASK_RETRY_BACKOFF = 10
+TASK_RETRY_BACKOFF_MAX = 10 * 60
+
+# Calls to dashd or rippled are stopped after this number of consecutive
+# connection failures. One call is let through after
+# `CIRCUIT_BREAKER_RESET_TIMEOUT` seconds to check if the server is back.
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5
+CIRCUIT_BREAKER_RESET_TIMEOUT = 30
+
 # Try to load settings from ``settings_local.py`` file
 try:
     from settings_local import *  # NOQA
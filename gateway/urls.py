@@ -2,12 +2,15 @@ from django.conf.urls import url
 from django.contrib import admin
 from apps.core.views import (
     GetReceivedAmountApiView,
+    GetReceivedAmountsApiView,
     DepositSubmitApiView,
     DepositStatusApiView,
+    DepositStatusEventsApiView,
     GetPageDetailsView,
     IndexView,
     WithdrawalSubmitApiView,
     WithdrawalStatusApiView,
+    WithdrawalStatusEventsApiView,
 )
 
 
@@ -27,6 +30,14 @@ urlpatterns = [
         DepositStatusApiView.as_view(),
         name='deposit-status-api',
     ),
+    url(
+        r'^deposit/'
+        r'(?P<transaction_id>'
+        r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})/'
+        r'status-events/$',
+        DepositStatusEventsApiView.as_view(),
+        name='deposit-status-events',
+    ),
     url(
         r'^deposit/'
         r'(?P<transaction_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-'
@@ -39,6 +50,11 @@ urlpatterns = [
         WithdrawalStatusApiView.as_view(),
         name='withdrawal-status-api',
     ),
+    url(
+        r'^withdraw/(?P<transaction_id>[0-9]+)/status-events/$',
+        WithdrawalStatusEventsApiView.as_view(),
+        name='withdrawal-status-events',
+    ),
     url(
         r'^withdraw/(?P<transaction_id>[0-9]+)/$',
         IndexView.as_view(),
@@ -49,6 +65,11 @@ urlpatterns = [
         GetReceivedAmountApiView.as_view(),
         name='get-received-amount',
     ),
+    url(
+        r'^get-received-amounts/$',
+        GetReceivedAmountsApiView.as_view(),
+        name='get-received-amounts',
+    ),
     url(r'^(?P<slug>[a-z0-9-]+?)/$',
         GetPageDetailsView.as_view(), name='page'),
     url(r'^(?P<slug>[a-z0-9-]+?)/how-to/$',
@@ -9,9 +9,29 @@ https://docs.djangoproject.com/en/1.11/howto/deployment/wsgi/
 
 import os
 from django.core.wsgi import get_wsgi_application
+try:
+    import uwsgi
+except ImportError:
+    # Not running under uWSGI.
+    uwsgi = None
 from .health_check import health_check
+from .metrics import metrics
 
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "gateway.settings")
 application = get_wsgi_application()
+if uwsgi is not None:
+    # uWSGI loads the application in the master process before forking
+    # workers.
+    from apps.core.metrics import (
+        clear_process_metrics,
+        remove_process_metrics,
+    )
+
+    def remove_worker_metrics():
+        remove_process_metrics(os.getpid())
+
+    clear_process_metrics()
+    uwsgi.atexit = remove_worker_metrics
 application = health_check(application, '/health/')
+application = metrics(application, '/metrics/')
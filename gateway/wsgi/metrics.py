@@ -0,0 +1,13 @@
+def metrics(application, metrics_url):
+    def metrics_wrapper(environ, start_response):
+        if environ.get('PATH_INFO') == metrics_url:
+            # Apps and `prometheus_client` are loaded when the wrapper is
+            # called, after settings enable the multiprocess mode of it.
+            from prometheus_client import CONTENT_TYPE_LATEST
+
+            from apps.core.metrics import render_metrics
+
+            start_response('200 OK', [('Content-Type', CONTENT_TYPE_LATEST)])
+            return [render_metrics()]
+        return application(environ, start_response)
+    return metrics_wrapper
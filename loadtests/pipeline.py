@@ -0,0 +1,331 @@
+"""
+Load test of deposit and withdrawal pipelines.
+
+Submits concurrent deposits and withdrawals, pays them through fake servers
+(see `loadtests/fake_servers.py`) and polls their statuses until they are
+finished. Reports throughput, latencies of API calls and state transitions
+and numbers of calls to the fake servers. Run it against a gateway with
+Celery workers and listeners connected to the fake servers, e.g.:
+
+    python loadtests/pipeline.py http://127.0.0.1:8000 \\
+        --deposits 200 --withdrawals 200 --output after.json \\
+        --baseline before.json
+"""
+from gevent import monkey
+
+monkey.patch_all()
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import re  # noqa: E402
+import time  # noqa: E402
+
+import gevent  # noqa: E402
+import requests  # noqa: E402
+
+# Substrings of state descriptions, checked in order.
+STATES = (
+    ('Waiting for', 'unconfirmed'),
+    ('Initiated.', 'initiated'),
+    ('Initiated an outgoing', 'confirmed'),
+    ('Confirmed', 'confirmed'),
+    ('is processed', 'processed'),
+    ('Time expired', 'overdue'),
+    ('failed', 'failed'),
+    ('does not trust', 'no_ripple_trust'),
+)
+FINISHED_STATES = ('processed', 'overdue', 'failed')
+deposit_address_pattern = re.compile(r' DASH to (\w+) before ')
+
+
+def get_state(description):
+    for substring, state in STATES:
+        if substring in description:
+            return state
+
+
+def get_percentile(values, percentile):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percentile / 100))]
+
+
+class Transaction(object):
+    def __init__(self, transaction_type, args):
+        self.transaction_type = transaction_type
+        self.args = args
+        self.latencies = {}
+        self.state = None
+        self.error = None
+
+    def record(self, name, latency):
+        self.latencies.setdefault(name, []).append(latency)
+
+    def run(self):
+        session = requests.Session()
+        try:
+            # Get a CSRF token.
+            session.get(self.args.url, timeout=self.args.timeout)
+            started_at = time.time()
+            response = session.post(
+                '{}/submit-{}/'.format(self.args.url, self.transaction_type),
+                self.get_form_data(),
+                headers={'X-CSRFToken': session.cookies['csrftoken']},
+                timeout=self.args.timeout,
+            )
+            self.record('api.submit', time.time() - started_at)
+            response.raise_for_status()
+            self.poll(
+                session,
+                '{}{}status-api/'.format(
+                    self.args.url,
+                    response.json()['status_url'],
+                ),
+                started_at,
+            )
+        except (requests.RequestException, ValueError, KeyError) as e:
+            self.error = repr(e)
+
+    def get_form_data(self):
+        if self.transaction_type == 'deposit':
+            return {
+                'ripple_address': self.args.ripple_address,
+                'dash_to_transfer': self.args.amount,
+            }
+        return {
+            'dash_address': self.args.dash_address,
+            'dash_to_transfer': self.args.amount,
+        }
+
+    def poll(self, session, status_url, started_at):
+        state_changed_at = started_at
+        etag = None
+        finish_time = started_at + self.args.duration
+        while time.time() < finish_time:
+            requested_at = time.time()
+            response = session.get(
+                status_url,
+                headers={'If-None-Match': etag} if etag else {},
+                timeout=self.args.timeout,
+            )
+            self.record('api.status', time.time() - requested_at)
+            if response.status_code != 304:
+                response.raise_for_status()
+                etag = response.headers.get('ETag')
+                status = response.json()
+                state = get_state(status['state'])
+                if state != self.state:
+                    if self.state is not None:
+                        self.record(
+                            '{} -> {}'.format(self.state, state),
+                            requested_at - state_changed_at,
+                        )
+                    state_changed_at = requested_at
+                    if state == 'initiated':
+                        self.pay(status)
+                    self.state = state
+                if state in FINISHED_STATES:
+                    self.record('end-to-end', requested_at - started_at)
+                    return
+            gevent.sleep(self.args.poll_interval)
+
+    def pay(self, status):
+        if self.transaction_type == 'deposit':
+            url = self.args.dashd_control_url
+            payment = {
+                'address': deposit_address_pattern.search(
+                    status['state'],
+                ).group(1),
+            }
+        else:
+            url = self.args.rippled_control_url
+            payment = {'destination_tag': status['transactionId']}
+        payment['amount'] = self.args.amount
+        requests.post(
+            '{}/pay/'.format(url),
+            json.dumps(payment),
+            timeout=self.args.timeout,
+        ).raise_for_status()
+
+
+def get_stats(url):
+    return requests.get('{}/stats/'.format(url)).json()
+
+
+def get_stats_difference(stats, initial_stats):
+    return {
+        key: {
+            method: number - initial_stats[key].get(method, 0)
+            for method, number in stats[key].items()
+        } for key in ('calls', 'failures')
+    }
+
+
+def get_report(transactions, duration, initial_stats, stats):
+    latencies = {}
+    for transaction in transactions:
+        for name, values in transaction.latencies.items():
+            latencies.setdefault(
+                '{} {}'.format(transaction.transaction_type, name),
+                [],
+            ).extend(values)
+    states = {}
+    errors = {}
+    for transaction in transactions:
+        state = transaction.state or 'unknown'
+        states[state] = states.get(state, 0) + 1
+        if transaction.error is not None:
+            errors[transaction.error] = errors.get(transaction.error, 0) + 1
+    return {
+        'duration': duration,
+        'throughput': states.get('processed', 0) / duration,
+        'states': states,
+        'errors': errors,
+        'latencies': {
+            name: {
+                'count': len(values),
+                'p50': get_percentile(values, 50),
+                'p99': get_percentile(values, 99),
+            } for name, values in latencies.items()
+        },
+        'rpc': {
+            server_name: get_stats_difference(
+                stats[server_name],
+                initial_stats[server_name],
+            ) for server_name in stats
+        },
+    }
+
+
+def print_report(report, baseline=None):
+    def format_change(value, baseline_value):
+        if not baseline_value:
+            return ''
+        return ' ({:+.0%})'.format(value / baseline_value - 1)
+
+    baseline = baseline or {'latencies': {}}
+    print('Processed {:.2f} transactions per second{}'.format(
+        report['throughput'],
+        format_change(report['throughput'], baseline.get('throughput')),
+    ))
+    print('Final states: {}'.format(
+        ', '.join(
+            '{} x {}'.format(number, state)
+            for state, number in sorted(report['states'].items())
+        ),
+    ))
+    for error, number in sorted(report['errors'].items()):
+        print('{} x {}'.format(number, error))
+    print('{:<45} {:>7} {:>16} {:>16}'.format('', 'count', 'p50', 'p99'))
+    for name, latency in sorted(report['latencies'].items()):
+        baseline_latency = baseline['latencies'].get(name, {})
+        print('{:<45} {:>7} {:>16} {:>16}'.format(
+            name,
+            latency['count'],
+            '{:.3f}{}'.format(
+                latency['p50'],
+                format_change(latency['p50'], baseline_latency.get('p50')),
+            ),
+            '{:.3f}{}'.format(
+                latency['p99'],
+                format_change(latency['p99'], baseline_latency.get('p99')),
+            ),
+        ))
+    for server_name, stats in sorted(report['rpc'].items()):
+        for method, number in sorted(stats['calls'].items()):
+            print('{}.{}: {} calls, {} failed'.format(
+                server_name,
+                method,
+                number,
+                stats['failures'].get(method, 0),
+            ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('url', help='URL of the gateway')
+    parser.add_argument('--deposits', type=int, default=100)
+    parser.add_argument('--withdrawals', type=int, default=100)
+    parser.add_argument('--amount', default='1')
+    parser.add_argument(
+        '--ripple-address',
+        default='rHb9CJAWyB4rj91VRWn96DkukG4bwdtyTh',
+    )
+    parser.add_argument(
+        '--dash-address',
+        default='yBVKPLuULvioorP8d1Zu8hpeYE7HzVUtB9',
+    )
+    parser.add_argument(
+        '--dashd-control-url',
+        default='http://127.0.0.1:19998',
+    )
+    parser.add_argument(
+        '--rippled-control-url',
+        default='http://127.0.0.1:51234',
+    )
+    parser.add_argument(
+        '--duration',
+        type=int,
+        default=10 * 60,
+        help='Seconds to wait for a transaction to finish',
+    )
+    parser.add_argument(
+        '--ramp-up',
+        type=float,
+        default=10,
+        help='Seconds to submit all transactions',
+    )
+    parser.add_argument(
+        '--poll-interval',
+        type=float,
+        default=0.5,
+        help='Seconds between status requests, precision of transitions',
+    )
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--output', help='File to save the report to')
+    parser.add_argument('--baseline', help='Report to compare with')
+    args = parser.parse_args()
+    args.url = args.url.rstrip('/')
+
+    control_urls = {
+        'dashd': args.dashd_control_url,
+        'rippled': args.rippled_control_url,
+    }
+    initial_stats = {
+        server_name: get_stats(url)
+        for server_name, url in control_urls.items()
+    }
+
+    transaction_types = (
+        ['deposit'] * args.deposits + ['withdrawal'] * args.withdrawals
+    )
+    transactions = []
+    greenlets = []
+    started_at = time.time()
+    for transaction_type in transaction_types:
+        transaction = Transaction(transaction_type, args)
+        transactions.append(transaction)
+        greenlets.append(gevent.spawn(transaction.run))
+        gevent.sleep(args.ramp_up / len(transaction_types))
+    gevent.joinall(greenlets)
+
+    report = get_report(
+        transactions,
+        time.time() - started_at,
+        initial_stats,
+        {
+            server_name: get_stats(url)
+            for server_name, url in control_urls.items()
+        },
+    )
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
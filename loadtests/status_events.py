@@ -0,0 +1,108 @@
+"""
+Load test of streams of transaction statuses.
+
+Opens many concurrent Server-Sent Events connections to a status stream and
+reports how many of them are held open by the server. Run it against the
+`events` service, e.g.:
+
+    python loadtests/status_events.py \
+        http://127.0.0.1:8001/withdraw/1/status-events/ --connections 5000
+"""
+from gevent import monkey
+
+monkey.patch_all()
+
+import argparse  # noqa: E402
+import socket  # noqa: E402
+import time  # noqa: E402
+
+import gevent  # noqa: E402
+from six.moves.urllib.parse import urlparse  # noqa: E402
+
+
+class Stream(object):
+    def __init__(self, url, timeout):
+        self.url = urlparse(url)
+        self.timeout = timeout
+        self.is_open = False
+        self.events_number = 0
+        self.error = None
+
+    def run(self, duration):
+        try:
+            connection = socket.create_connection(
+                (self.url.hostname, self.url.port or 80),
+                timeout=self.timeout,
+            )
+            connection.sendall(
+                'GET {} HTTP/1.1\r\nHost: {}\r\n'
+                'Accept: text/event-stream\r\n\r\n'.format(
+                    self.url.path,
+                    self.url.netloc,
+                ).encode('ascii'),
+            )
+            response = connection.recv(4096)
+            if not response.startswith(b'HTTP/1.1 200'):
+                raise ValueError(response.split(b'\r\n', 1)[0])
+            self.is_open = True
+            self.events_number = response.count(b'\ndata: ')
+            finish_time = time.time() + duration
+            while time.time() < finish_time:
+                data = connection.recv(4096)
+                if not data:
+                    raise ValueError('Closed by the server')
+                self.events_number += data.count(b'data: ')
+        except (socket.error, ValueError) as e:
+            self.is_open = False
+            self.error = str(e)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('url')
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument(
+        '--duration',
+        type=int,
+        default=60,
+        help='Seconds to hold connections',
+    )
+    parser.add_argument(
+        '--ramp-up',
+        type=float,
+        default=10,
+        help='Seconds to open all connections',
+    )
+    parser.add_argument('--timeout', type=float, default=30)
+    args = parser.parse_args()
+
+    streams = []
+    greenlets = []
+    for i in range(args.connections):
+        stream = Stream(args.url, args.timeout)
+        streams.append(stream)
+        greenlets.append(gevent.spawn(stream.run, args.duration))
+        gevent.sleep(args.ramp_up / args.connections)
+    gevent.joinall(greenlets)
+
+    held_streams = [
+        opened_stream for opened_stream in streams if opened_stream.is_open
+    ]
+    errors = {}
+    for stream in streams:
+        if stream.error is not None:
+            errors[stream.error] = errors.get(stream.error, 0) + 1
+    print('Held {} of {} connections for {} seconds'.format(
+        len(held_streams),
+        args.connections,
+        args.duration,
+    ))
+    print('Received {} events'.format(
+        sum(stream.events_number for stream in streams),
+    ))
+    for error, number in sorted(errors.items(), key=lambda item: -item[1]):
+        print('{} x {}'.format(number, error))
+
+
+if __name__ == '__main__':
+    main()